@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+'''
+Created on Oct 18, 2026
+
+Compares the throughput of PdocPrep's parsing engines
+on a generated module, and checks that they agree:
+
+    ```
+    shell> benchmarks/bench_engines.py --functions 1000 10000
+    ```
+
+@author: Andreas Paepcke
+'''
+import argparse
+from io import StringIO
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pdoc_prep.pdoc_prep import PdocPrep
+
+
+#-------------------------
+# make_module
+#--------------
+
+def make_module(num_functions):
+    '''
+    Create module text with num_functions functions. Their
+    docstrings mix prose, directives, multiline descriptions, 
+    and Google style sections, and are followed by code lines.
+
+    @param num_functions: number of functions
+    @type num_functions: int
+    @return: module text
+    @rtype str
+    '''
+    function = "def foo_%s(bar, baz):\n" +\
+               "    '''\n" +\
+               "    Foo is bar, and then some.\n" +\
+               "    \n" +\
+               "    @param bar: first line of the description\n" +\
+               "        which continues here\n" +\
+               "    @type bar: int\n" +\
+               "    @param baz: the baz\n" +\
+               "    @type baz: str\n" +\
+               "    @return: the result\n" +\
+               "    @rtype: int\n" +\
+               "    @raises ValueError\n" +\
+               "    \n" +\
+               "    Args:\n" +\
+               "        fum (int): the fum\n" +\
+               "    '''\n" +\
+               "    result = bar + len(baz)\n" +\
+               "    if result > 10:\n" +\
+               "        result -= 10\n" +\
+               "    return result\n\n"
+    return ''.join(function % i for i in range(num_functions))
+
+#-------------------------
+# time_engine
+#--------------
+
+def time_engine(text, engine, repeats):
+    '''
+    Run PdocPrep with the given engine over text
+    repeats times, and return the best time and 
+    the output.
+
+    @param text: module text
+    @type text: str
+    @param engine: one of PdocPrep.ENGINES
+    @type engine: str
+    @param repeats: number of runs
+    @type repeats: int
+    @return: best wall clock time in seconds, and the output
+    @rtype (float, str)
+    '''
+    best = None
+    for _i in range(repeats):
+        out_fd = StringIO()
+        start = time.perf_counter()
+        PdocPrep(StringIO(text), out_fd, engine=engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best, out_fd.getvalue())
+
+#------------------------- Main -------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Compare the throughput of PdocPrep's engines."
+                                     )
+    parser.add_argument('--functions',
+                        type=int,
+                        nargs='+',
+                        help="Functions per generated module. Default: 100 1000 10000",
+                        default=[100, 1000, 10000])
+    parser.add_argument('--repeats',
+                        type=int,
+                        help="Runs per size and engine; the best is reported. Default: 3",
+                        default=3)
+    args = parser.parse_args()
+
+    print('%10s %10s %8s %12s %14s' % ('functions', 'lines', 'engine', 'seconds', 'klines per sec'))
+    for num_functions in args.functions:
+        text      = make_module(num_functions)
+        num_lines = text.count('\n')
+        outputs   = {}
+        for engine in PdocPrep.ENGINES:
+            (elapsed, outputs[engine]) = time_engine(text, engine, args.repeats)
+            print('%10d %10d %8s %12.4f %14.1f' % (num_functions, num_lines, engine, 
+                                                   elapsed, num_lines / elapsed / 1000))
+        if len(set(outputs.values())) != 1:
+            print('Engines disagree on the output for %s functions.' % num_functions)
+            sys.exit(1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+'''
+Created on Oct 18, 2026
+
+Times PdocPrep on a docstring whose parameter and
+return descriptions run over many continuation lines.
+Collecting such descriptions should take time linear
+in their length, so the time per continuation line
+printed for each size should stay about flat:
+
+    ```
+    shell> benchmarks/bench_multiline.py --sizes 1000 10000 100000
+    ```
+
+@author: Andreas Paepcke
+'''
+import argparse
+from io import StringIO
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pdoc_prep.pdoc_prep import PdocPrep
+
+
+#-------------------------
+# make_module
+#--------------
+
+def make_module(num_lines):
+    '''
+    Create module text with one function whose
+    parameter and return descriptions each span
+    num_lines continuation lines.
+
+    @param num_lines: continuation lines per description
+    @type num_lines: int
+    @return: module text
+    @rtype str
+    '''
+    continuation = ''.join('            continuation line %s of a generated description\n' % i
+                           for i in range(num_lines))
+    return "def foo(bar):\n" +\
+           "    '''\n" +\
+           "    Foo is bar.\n" +\
+           "    \n" +\
+           "    @param bar: first line of the description\n" +\
+           continuation +\
+           "    @type bar: int\n" +\
+           "    @return: first line of the description\n" +\
+           continuation +\
+           "    @rtype: int\n" +\
+           "    '''\n" +\
+           "    return bar\n"
+
+#-------------------------
+# time_prep
+#--------------
+
+def time_prep(text, repeats):
+    '''
+    Run PdocPrep over text repeats times, and
+    return the best time.
+
+    @param text: module text
+    @type text: str
+    @param repeats: number of runs
+    @type repeats: int
+    @return: best wall clock time in seconds
+    @rtype float
+    '''
+    best = None
+    for _i in range(repeats):
+        start = time.perf_counter()
+        PdocPrep(StringIO(text), StringIO())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+#------------------------- Main -------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Time PdocPrep on long multiline descriptions."
+                                     )
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        help="Continuation lines per description. Default: 100 1000 10000 100000",
+                        default=[100, 1000, 10000, 100000])
+    parser.add_argument('--repeats',
+                        type=int,
+                        help="Runs per size; the best is reported. Default: 3",
+                        default=3)
+    args = parser.parse_args()
+
+    print('%12s %12s %18s' % ('lines', 'seconds', 'usec per line'))
+    for num_lines in args.sizes:
+        elapsed = time_prep(make_module(num_lines), args.repeats)
+        print('%12d %12.4f %18.3f' % (num_lines, elapsed, 1e6 * elapsed / (2 * num_lines)))
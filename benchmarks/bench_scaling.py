@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+'''
+Created on Oct 18, 2026
+
+Times pdoc_run end to end on a generated package of growing
+size, in each execution mode:
+
+    modules   one pdoc_run process per module, --jobs at a time
+    batch     a single pdoc_run process over all modules
+    shards    --jobs pdoc_run processes with --shard i/N,
+              followed by pdoc_merge
+
+For each size and mode it reports the wall time, percentiles
+of the per-module latency, the peak resident set size of the
+largest pdoc_run process, and the number of files written.
+In the 'modules' mode, a module's latency is the wall time of
+its pdoc_run process. In the other modes, where one process
+handles many modules, it is the time from the start of the
+run until the module's page was written.
+
+If pdoc is not installed, a stand-in that parses each module
+and writes one page per module is used instead, so that the
+numbers show pdoc_prep's own overhead:
+
+    ```
+    shell> benchmarks/bench_scaling.py --sizes 10 100 1000 --density 0.5 --jobs 4
+    ```
+
+@author: Andreas Paepcke
+'''
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJ_DIR  = os.path.dirname(BENCH_DIR)
+PDOC_RUN   = os.path.join(PROJ_DIR, 'bin', 'pdoc_run')
+PDOC_MERGE = os.path.join(PROJ_DIR, 'bin', 'pdoc_merge')
+
+MODES = ('modules', 'batch', 'shards')
+
+# Used if pdoc is not installed. Like pdoc 0.3, writes
+# <html-dir>/<module>.m.html for each module given:
+PDOC_STAND_IN = '''import ast, html, os, sys
+args = sys.argv[1:]
+html_dir = args[args.index('--html-dir') + 1]
+os.makedirs(html_dir, exist_ok=True)
+for module in [arg for arg in args if arg.endswith('.py')]:
+    with open(module, 'rb') as in_fd:
+        tree = ast.parse(in_fd.read(), module)
+    docs = [ast.get_docstring(node) or '' for node in ast.walk(tree)
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef))]
+    with open(os.path.join(html_dir, os.path.basename(module)[:-3] + '.m.html'), 'w') as out_fd:
+        out_fd.write('<html><body><h1 class="title">' + module + '</h1>\\n')
+        for doc in docs:
+            out_fd.write('<div class="desc">' + html.escape(doc) + '</div>\\n')
+        out_fd.write('</body></html>\\n')
+'''
+
+#-------------------------
+# make_package
+#--------------
+
+def make_package(package_dir, num_modules, num_functions, density, modules_per_dir=50):
+    '''
+    Create a package of num_modules modules, in subpackages
+    of at most modules_per_dir modules each.
+
+    @param package_dir: directory to create the package in
+    @type package_dir: str
+    @param num_modules: number of modules
+    @type num_modules: int
+    @param num_functions: functions per module
+    @type num_functions: int
+    @param density: fraction of the functions whose docstrings
+        use directives; the others have prose docstrings
+    @type density: float
+    @param modules_per_dir: most modules per subpackage. Default: 50
+    @type modules_per_dir: int
+    @return: paths of the modules
+    @rtype [str]
+    '''
+    with_directives = "    def meth_%s(self, bar, baz):\n" +\
+                      "        '''\n" +\
+                      "        Foo is bar.\n" +\
+                      "        \n" +\
+                      "        @param bar: first line of the description\n" +\
+                      "            which continues here\n" +\
+                      "        @type bar: int\n" +\
+                      "        @param baz: the baz\n" +\
+                      "        @type baz: str\n" +\
+                      "        @return: the result\n" +\
+                      "        @rtype: int\n" +\
+                      "        '''\n" +\
+                      "        return bar + len(baz)\n\n"
+    prose_only      = "    def meth_%s(self, bar):\n" +\
+                      "        '''\n" +\
+                      "        Foo is bar, and bar is\n" +\
+                      "        a plain description.\n" +\
+                      "        '''\n" +\
+                      "        return bar\n\n"
+    python_modules = []
+    # Spread the functions with directives evenly:
+    num_with_directives = 0
+    for mod_num in range(num_modules):
+        sub_dir = os.path.join(package_dir, 'sub_%s' % (mod_num // modules_per_dir))
+        if not os.path.exists(sub_dir):
+            os.makedirs(sub_dir)
+            open(os.path.join(sub_dir, '__init__.py'), 'w').close()
+        functions = []
+        for func_num in range(num_functions):
+            total = mod_num * num_functions + func_num + 1
+            if num_with_directives < density * total:
+                num_with_directives += 1
+                functions.append(with_directives % func_num)
+            else:
+                functions.append(prose_only % func_num)
+        python_module = os.path.join(sub_dir, 'mod_%s.py' % mod_num)
+        with open(python_module, 'w') as out_fd:
+            out_fd.write("'''\nGenerated module %s.\n'''\n\nclass Foo(object):\n\n" % mod_num)
+            out_fd.write(''.join(functions))
+        python_modules.append(python_module)
+    return python_modules
+
+#-------------------------
+# run_processes
+#--------------
+
+def run_processes(cmds, jobs, env):
+    '''
+    Run commands as child processes, at most jobs at a time.
+
+    @param cmds: argument lists of the commands
+    @type cmds: [[str]]
+    @param jobs: most processes at a time
+    @type jobs: int
+    @param env: environment of the processes
+    @type env: {str : str}
+    @return: wall time of each process, and the largest
+        peak resident set size of any of them, in KiB
+    @rtype ([float], int)
+    @raise RuntimeError: if a process fails
+    '''
+    pending   = list(reversed(cmds))
+    running   = {}
+    latencies = []
+    peak_rss  = 0
+    while len(pending) > 0 or len(running) > 0:
+        while len(pending) > 0 and len(running) < jobs:
+            proc = subprocess.Popen(pending.pop(), env=env, stdout=subprocess.DEVNULL)
+            # Holding on to proc keeps subprocess from reaping it:
+            running[proc.pid] = (proc, time.perf_counter())
+        # wait4 yields the resource usage of just this child:
+        (pid, status, rusage) = os.wait4(-1, 0)
+        if pid not in running:
+            continue
+        (proc, start) = running.pop(pid)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        latencies.append(time.perf_counter() - start)
+        peak_rss = max(peak_rss, rusage.ru_maxrss)
+        if proc.returncode != 0:
+            raise RuntimeError("Benchmark process %s failed with status %s." % (pid, status))
+    return (latencies, peak_rss)
+
+#-------------------------
+# run_mode
+#--------------
+
+def run_mode(mode, python_modules, html_dir, jobs, env):
+    '''
+    Document all modules in one execution mode.
+
+    @param mode: one of MODES
+    @type mode: str
+    @param python_modules: paths of the modules
+    @type python_modules: [str]
+    @param html_dir: directory for the pages
+    @type html_dir: str
+    @param jobs: most processes at a time
+    @type jobs: int
+    @param env: environment for pdoc_run
+    @type env: {str : str}
+    @return: wall time, module latencies, and peak RSS in KiB
+    @rtype (float, [float], int)
+    '''
+    pdoc_run = [sys.executable, PDOC_RUN, '--html-dir', html_dir]
+    start = time.perf_counter()
+    if mode == 'modules':
+        (latencies, peak_rss) = run_processes([pdoc_run + [python_module] for python_module in python_modules],
+                                              jobs, env)
+        return (time.perf_counter() - start, latencies, peak_rss)
+
+    if mode == 'batch':
+        (_latencies, peak_rss) = run_processes([pdoc_run + python_modules], 1, env)
+        shard_dirs = [html_dir]
+    else:
+        shard_dirs = [os.path.join(html_dir, 'shard_%s' % shard) for shard in range(jobs)]
+        cmds = [[sys.executable, PDOC_RUN, '--html-dir', shard_dir, '--shard', '%s/%s' % (shard, jobs)] + python_modules
+                for (shard, shard_dir) in enumerate(shard_dirs)]
+        (_latencies, peak_rss) = run_processes(cmds, jobs, env)
+        (_latencies, merge_rss) = run_processes([[sys.executable, PDOC_MERGE, '-o', html_dir] + shard_dirs], 1, env)
+        peak_rss = max(peak_rss, merge_rss)
+    wall_time = time.perf_counter() - start
+
+    # Latency of a module is the time until its page was written:
+    start_epoch = time.time() - wall_time
+    latencies = []
+    for shard_dir in shard_dirs:
+        for file_name in os.listdir(shard_dir):
+            if file_name.endswith('.m.html'):
+                latencies.append(os.stat(os.path.join(shard_dir, file_name)).st_mtime - start_epoch)
+    return (wall_time, latencies, peak_rss)
+
+#-------------------------
+# count_files
+#--------------
+
+def count_files(directory):
+    '''
+    Number of files below directory.
+
+    @param directory: root of the count
+    @type directory: str
+    @return: number of files
+    @rtype int
+    '''
+    return sum(len(file_names) for (_dir_path, _dir_names, file_names) in os.walk(directory))
+
+#-------------------------
+# percentile
+#--------------
+
+def percentile(values, fraction):
+    '''
+    Nearest-rank percentile.
+
+    @param values: sorted values
+    @type values: [float]
+    @param fraction: percentile as a fraction, such as 0.95
+    @type fraction: float
+    @return: the percentile, or 0 for no values
+    @rtype float
+    '''
+    if len(values) == 0:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+#------------------------- Main -------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Time pdoc_run end to end on generated packages."
+                                     )
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        help="Modules per generated package. Default: 10 100 1000",
+                        default=[10, 100, 1000])
+    parser.add_argument('--functions',
+                        type=int,
+                        help="Functions per module. Default: 20",
+                        default=20)
+    parser.add_argument('--density',
+                        type=float,
+                        help="Fraction of docstrings with directives. Default: 0.5",
+                        default=0.5)
+    parser.add_argument('--modes',
+                        nargs='+',
+                        choices=MODES,
+                        help="Execution modes to time. Default: all",
+                        default=list(MODES))
+    parser.add_argument('--jobs',
+                        type=int,
+                        help="Processes at a time, and number of shards. Default: number of cores",
+                        default=os.cpu_count() or 1)
+    parser.add_argument('--keep',
+                        action='store_true',
+                        help="Keep the generated packages and pages. Default: False",
+                        default=False)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='pdoc_bench_scaling_')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.join(PROJ_DIR, 'src')] +
+                                        [path for path in [env.get('PYTHONPATH')] if path])
+    if 'PDOC_PATH' not in env and shutil.which('pdoc') is None:
+        stand_in = os.path.join(work_dir, 'pdoc_stand_in.py')
+        with open(stand_in, 'w') as out_fd:
+            out_fd.write(PDOC_STAND_IN)
+        env['PDOC_PATH'] = sys.executable + ' ' + stand_in
+        print('pdoc not found; using a stand-in.')
+
+    print('%8s %8s %10s %9s %9s %9s %11s %8s' % ('modules', 'mode', 'wall sec', 'p50 sec',
+                                                 'p95 sec', 'p99 sec', 'peak MiB', 'files'))
+    try:
+        for num_modules in args.sizes:
+            package_dir = os.path.join(work_dir, 'pkg_%s' % num_modules)
+            python_modules = make_package(package_dir, num_modules, args.functions, args.density)
+            files_before = count_files(package_dir)
+            for mode in args.modes:
+                html_dir = os.path.join(work_dir, 'html_%s_%s' % (num_modules, mode))
+                (wall_time, latencies, peak_rss) = run_mode(mode, python_modules, html_dir, args.jobs, env)
+                latencies.sort()
+                # Pages, manifests, and any temp files left in the package:
+                files_written = count_files(html_dir) + count_files(package_dir) - files_before
+                print('%8d %8s %10.2f %9.3f %9.3f %9.3f %11.1f %8d' %\
+                      (num_modules, mode, wall_time,
+                       percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(latencies, 0.99),
+                       peak_rss / 1024, files_written))
+                if not args.keep:
+                    shutil.rmtree(html_dir)
+    finally:
+        if args.keep:
+            print('Packages and pages kept in %s' % work_dir)
+        else:
+            shutil.rmtree(work_dir)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+'''
+Created on Oct 18, 2026
+
+Differential fuzzing of PdocPrep's parsing engines. Generates
+random modules: functions at random indentation, whose docstrings mix
+prose, directives with either delimiter, multiline descriptions,
+Google and NumPy sections, one-liners, both quote styles, random
+indentation, and deliberate irregularities such as a type for
+the wrong parameter, or a missing type. Each module is run
+through the reference engine and through every other engine,
+once collecting diagnostics, and once raising on the first
+irregularity. Outputs, diagnostics, and raised errors must be
+identical.
+
+A mismatching module is shrunk to a minimal set of lines that
+still mismatches, printed, and saved. Per-engine throughput
+over all cases is reported at the end:
+
+    ```
+    shell> benchmarks/fuzz_engines.py --cases 20000 --seed 7
+    shell> benchmarks/fuzz_engines.py --seed 7 --case 1234   # rerun one case
+    ```
+
+@author: Andreas Paepcke
+'''
+import argparse
+from io import StringIO
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pdoc_prep.diagnostics import DiagnosticsCollector
+from pdoc_prep.pdoc_prep import PdocPrep
+
+
+# Engine that all others are compared against:
+REFERENCE_ENGINE = 'chain'
+
+#-------------------------
+# make_docstring
+#--------------
+
+def make_docstring(rng, delimiter, indent):
+    '''
+    Create the lines of a random docstring body, without
+    the quotes. Mostly well formed, with occasional
+    irregularities and stray fragments.
+
+    @param rng: random source
+    @type rng: random.Random
+    @param delimiter: '@' or ':'
+    @type delimiter: str
+    @param indent: indentation of the docstring
+    @type indent: str
+    @return: docstring lines
+    @rtype [str]
+    '''
+    names = ['foo', 'bar', 'baz', 'table_name', 'x']
+    types = ['int', 'str', '{int | str}', 'MyTable', '[float]']
+    lines = []
+    for _i in range(rng.randint(0, 8)):
+        choice = rng.random()
+        name   = rng.choice(names)
+        if choice < 0.15:
+            lines.append(indent + rng.choice(['Foo is bar.', 'Does a thing', '', '   ']))
+        elif choice < 0.45:
+            # Parameter, maybe multiline, maybe with a mismatched or missing type:
+            lines.append(indent + delimiter + 'param ' + name + ': the ' + name)
+            for _j in range(rng.choice([0, 0, 1, 3])):
+                lines.append(indent + ' ' * rng.choice([2, 4, 8]) + 'more about ' + name)
+            if rng.random() < 0.8:
+                type_name = name if rng.random() < 0.85 else rng.choice(names)
+                lines.append(indent + delimiter + 'type ' + type_name + ': ' + rng.choice(types))
+        elif choice < 0.6:
+            lines.append(indent + delimiter + rng.choice(['return', 'returns']) + ': the result')
+            for _j in range(rng.choice([0, 1, 2])):
+                lines.append(indent + '    continued result')
+            if rng.random() < 0.7:
+                lines.append(indent + delimiter + 'rtype: ' + rng.choice(types))
+        elif choice < 0.68:
+            lines.append(indent + delimiter + rng.choice(['raises', 'raise', 'raises:']) + ' ValueError')
+        elif choice < 0.78:
+            # Google style section:
+            lines.append(indent + rng.choice(['Args:', 'Returns:', 'Raises:', 'Yields:', 'Keyword Args:']))
+            for _j in range(rng.randint(0, 3)):
+                lines.append(indent + '    ' + rng.choice([name + ' (' + rng.choice(types) + '): the ' + name,
+                                                         name + ': untyped',
+                                                         'ValueError: if bad',
+                                                         'int: the count',
+                                                         '    continuation']))
+        elif choice < 0.86:
+            # NumPy style section:
+            header = rng.choice(['Parameters', 'Returns', 'Raises', 'Other Parameters'])
+            lines.append(indent + header)
+            lines.append(indent + '-' * rng.choice([3, len(header)]))
+            for _j in range(rng.randint(0, 3)):
+                lines.append(indent + rng.choice([name + ' : ' + rng.choice(types),
+                                                  '    the ' + name,
+                                                  'ValueError',
+                                                  '']))
+        else:
+            # Stray and malformed fragments:
+            lines.append(indent + rng.choice([delimiter + 'type ' + name + ': int',
+                                              delimiter + 'param:',
+                                              delimiter + 'rtype int',
+                                              delimiter + 'typed ' + name + ': x',
+                                              delimiter + 'param ' + name,
+                                              'x = """inner"""',
+                                              "'''",
+                                              ]))
+    return lines
+
+#-------------------------
+# make_module
+#--------------
+
+def make_module(rng, delimiter):
+    '''
+    Create random module text.
+
+    @param rng: random source
+    @type rng: random.Random
+    @param delimiter: '@' or ':'
+    @type delimiter: str
+    @return: module text
+    @rtype str
+    '''
+    lines = []
+    if rng.random() < 0.3:
+        quote = rng.choice(["'''", '"""'])
+        lines.extend([quote] + make_docstring(rng, delimiter, '') + [quote])
+    for _i in range(rng.randint(1, 6)):
+        indent = ' ' * rng.choice([0, 2, 4, 4, 8])
+        quote  = rng.choice(["'''", '"""'])
+        lines.append(indent + 'def f_%s(foo, bar):' % len(lines))
+        body_indent = indent + ' ' * rng.choice([4, 4, 2, 0])
+        shape = rng.random()
+        if shape < 0.1:
+            # One-liner:
+            lines.append(body_indent + quote + 'Does foo.' + quote)
+        elif shape < 0.2:
+            # Opening quotes with text, closing quotes after text:
+            lines.append(body_indent + quote + 'Foo is bar.')
+            lines.extend(make_docstring(rng, delimiter, body_indent))
+            lines.append(body_indent + 'End.' + quote)
+        else:
+            lines.append(body_indent + quote)
+            lines.extend(make_docstring(rng, delimiter, body_indent))
+            if rng.random() < 0.95:
+                lines.append(body_indent + quote)
+        lines.append(body_indent + rng.choice(['pass', 'return foo', 'x = "' + delimiter + 'param foo: no"']))
+    return '\n'.join(lines) + rng.choice(['\n', ''])
+
+#-------------------------
+# make_options
+#--------------
+
+def make_options(rng, delimiter):
+    '''
+    Random PdocPrep options for one case.
+
+    @param rng: random source
+    @type rng: random.Random
+    @param delimiter: '@' or ':'
+    @type delimiter: str
+    @return: keyword arguments for PdocPrep
+    @rtype {str : Any}
+    '''
+    return {'delimiter_char'   : delimiter,
+            'force_type_spec'  : rng.random() < 0.5,
+            'section_styles'   : rng.choice([('google', 'numpy'), ('google',), ('numpy',), ()]),
+            'allow_unindented' : rng.random() < 0.3,
+            'markup'           : rng.choice(['html', 'markdown'])
+            }
+
+#-------------------------
+# run_engine
+#--------------
+
+def run_engine(text, engine, options):
+    '''
+    Run one engine over text, once collecting diagnostics,
+    and once raising on the first irregularity.
+
+    @param text: module text
+    @type text: str
+    @param engine: one of PdocPrep.ENGINES
+    @type engine: str
+    @param options: keyword arguments for PdocPrep
+    @type options: {str : Any}
+    @return: everything the engine produced, and the time taken
+    @rtype (tuple, float)
+    '''
+    start = time.perf_counter()
+
+    out_fd = StringIO()
+    diagnostics = DiagnosticsCollector()
+    PdocPrep(StringIO(text), out_fd, diagnostics=diagnostics, engine=engine, **options)
+    collected = (out_fd.getvalue(), [diagnostic.to_dict() for diagnostic in diagnostics.diagnostics])
+
+    out_fd = StringIO()
+    try:
+        PdocPrep(StringIO(text), out_fd, engine=engine, **options)
+        error = None
+    except Exception as e:
+        error = (type(e).__name__, str(e))
+    raised = (out_fd.getvalue(), error)
+
+    return ((collected, raised), time.perf_counter() - start)
+
+#-------------------------
+# shrink
+#--------------
+
+def shrink(text, engine, options):
+    '''
+    Remove lines from a mismatching module for as
+    long as the engines still disagree.
+
+    @param text: module text on which engine and reference disagree
+    @type text: str
+    @param engine: engine under test
+    @type engine: str
+    @param options: keyword arguments for PdocPrep
+    @type options: {str : Any}
+    @return: a smaller text on which they still disagree
+    @rtype str
+    '''
+    def disagree(lines):
+        candidate = '\n'.join(lines) + '\n'
+        return run_engine(candidate, REFERENCE_ENGINE, options)[0] != run_engine(candidate, engine, options)[0]
+
+    lines = text.split('\n')
+    if not disagree(lines):
+        # Only the text as given mismatches, e.g. due to its last line:
+        return text
+    chunk = max(1, len(lines) // 2)
+    while chunk >= 1:
+        pos = 0
+        while pos < len(lines):
+            candidate = lines[:pos] + lines[pos + chunk:]
+            if len(candidate) > 0 and disagree(candidate):
+                lines = candidate
+            else:
+                pos += chunk
+        chunk //= 2
+    return '\n'.join(lines) + '\n'
+
+#------------------------- Main -------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     description="Check that PdocPrep's engines agree on random modules."
+                                     )
+    parser.add_argument('--cases',
+                        type=int,
+                        help="Number of random modules. Default: 5000",
+                        default=5000)
+    parser.add_argument('--seed',
+                        type=int,
+                        help="Seed of the run; each case derives its own seed from it. Default: 0",
+                        default=0)
+    parser.add_argument('--case',
+                        type=int,
+                        help="Run only this case number of the seed's run. Default: all",
+                        default=None)
+    parser.add_argument('--engines',
+                        nargs='+',
+                        help="Engines to compare with the reference '%s'. Default: all others" % REFERENCE_ENGINE,
+                        default=[engine for engine in PdocPrep.ENGINES if engine != REFERENCE_ENGINE])
+    parser.add_argument('--save-dir',
+                        help="Directory to save shrunk mismatching modules in. Default: none saved",
+                        default=None)
+    parser.add_argument('--max-failures',
+                        type=int,
+                        help="Stop after this many mismatches. Default: 5",
+                        default=5)
+    args = parser.parse_args()
+
+    case_nums = range(args.cases) if args.case is None else [args.case]
+    all_engines = [REFERENCE_ENGINE] + args.engines
+    seconds = {engine : 0.0 for engine in all_engines}
+    num_lines = 0
+    num_cases = 0
+    failures  = 0
+    for case_num in case_nums:
+        rng       = random.Random('%s/%s' % (args.seed, case_num))
+        delimiter = rng.choice(['@', ':'])
+        text      = make_module(rng, delimiter)
+        options   = make_options(rng, delimiter)
+        num_lines += text.count('\n') + 1
+        num_cases += 1
+
+        (expected, elapsed) = run_engine(text, REFERENCE_ENGINE, options)
+        seconds[REFERENCE_ENGINE] += elapsed
+        for engine in args.engines:
+            (actual, elapsed) = run_engine(text, engine, options)
+            seconds[engine] += elapsed
+            if actual == expected:
+                continue
+
+            failures += 1
+            small_text = shrink(text, engine, options)
+            print("Case %s: engine '%s' disagrees with '%s'; options %s. Shrunk module:" %\
+                  (case_num, engine, REFERENCE_ENGINE, options))
+            print(small_text)
+            if args.save_dir is not None:
+                os.makedirs(args.save_dir, exist_ok=True)
+                with open(os.path.join(args.save_dir, 'case_%s_%s_%s.py' % (args.seed, case_num, engine)), 'w') as out_fd:
+                    out_fd.write(small_text)
+        if failures >= args.max_failures:
+            break
+
+    print('%8s %12s %14s' % ('engine', 'seconds', 'klines per sec'))
+    for engine in all_engines:
+        print('%8s %12.4f %14.1f' % (engine, seconds[engine], num_lines / max(seconds[engine], 1e-9) / 1000))
+    print('%s cases, %s lines, %s mismatches.' % (num_cases, num_lines, failures))
+    if failures > 0:
+        sys.exit(1)
@@ -22,7 +22,7 @@ setup(
     long_description_content_type="text/markdown",
     description="Add processing of sphinx-like docstring specs to pdoc via preprocessor.",
     long_description=long_description,
-    scripts=['bin/pdoc_run'],
+    scripts=['bin/pdoc_run', 'bin/pdoc_merge'],
     license="BSD",
     keywords="pdoc, python documentation",
     url="https://github.com/paepcke/pdoc_prep"
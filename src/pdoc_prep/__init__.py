@@ -0,0 +1,20 @@
+'''
+Library interface of pdoc_prep:
+
+    ```
+    from pdoc_prep import transform_text, render_module
+    
+    html_page = render_module('src/mypkg/mymod.py', html_dir='docs')
+    ```
+'''
+from .pdoc_prep import transform_text, transform_file
+from .pdoc_prep import PdocPrep, NoTypeError, NoParamError, ParamTypeMismatch, DoubleReturnError
+from .htmlprep import PdocHtmlPrep
+from .diagnostics import DiagnosticsCollector, Diagnostic, DiagnosticsError
+from .symbols import SymbolIndex
+from .markup import Markup, make_markup
+from .sourcemap import SourceMap
+from .runner import render_module, render_package, PdocRunner, PdocError, PdocTimeout
+from .store import PageWriter, PageStore
+from .metrics import BuildMetrics
+from .sharding import merge_shards, parse_shard_spec, ShardMergeError
@@ -0,0 +1,171 @@
+'''
+Created on Oct 18, 2026
+
+Preprocessing of many modules, with file reads and
+writes overlapped with the transformation.
+
+@author: Andreas Paepcke
+'''
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from io import StringIO
+
+from .chunked import ChunkedPrep
+from .encoding import source_encoding, open_source_out
+from .grammars import make_section_grammars
+from .markup import make_markup
+from .pdoc_prep import ParseInfo, PdocPrep
+from .sourcemap import SourceMap
+
+# ---------------------------------- Class BatchPrep -----------------
+
+class BatchPrep(object):
+    '''
+    Preprocesses many modules, overlapping file I/O with
+    the transformation work. A thread pool reads source files
+    ahead of the transformation, which runs on the calling 
+    thread, and writes results behind it. Both queues are
+    bounded, so memory use stays flat for any number of 
+    modules. On slow, e.g. networked, file systems the I/O
+    latency is hidden behind the regex work.
+    
+    Modules without any directive are neither decoded, nor
+    written. The others are decoded in, and their results 
+    written in, the encoding their PEP 263 coding cookie 
+    declares.
+    '''
+    
+    def __init__(self,
+                 io_threads=4,
+                 read_ahead=8,
+                 write_behind=8,
+                 chunk_lines=None,
+                 source_maps=False,
+                 **prep_kwargs):
+        '''
+        @param io_threads: number of threads for reading and writing. Default: 4
+        @type io_threads: int
+        @param read_ahead: most source files read, but not yet transformed. Default: 8
+        @type read_ahead: int
+        @param write_behind: most results transformed, but not yet written. Default: 8
+        @type write_behind: int
+        @param chunk_lines: if provided, modules of more lines are 
+            preprocessed by a ChunkedPrep with chunks of about that 
+            many lines. Default: None
+        @type chunk_lines: {None | int}
+        @param source_maps: if True, a SourceMap of each preprocessed 
+            module is kept in source_maps, by source path. Default: False
+        @type source_maps: bool
+        @param prep_kwargs: keyword arguments for each PdocPrep instance,
+            such as delimiter_char, or diagnostics. Not in_fd, out_fd,
+            or file_name.
+        @type prep_kwargs: {str : Any}
+        '''
+        self.io_threads   = io_threads
+        self.read_ahead   = max(1, read_ahead)
+        self.write_behind = max(1, write_behind)
+        self.prep_kwargs  = dict(prep_kwargs)
+        self.prep_kwargs['section_styles'] = make_section_grammars(prep_kwargs.get('section_styles', ('google', 'numpy')))
+        # Compiled once for all modules:
+        self.prep_kwargs['markup'] = make_markup(prep_kwargs.get('markup'))
+        self.parseInfo    = ParseInfo(prep_kwargs.get('delimiter_char', '@'), self.prep_kwargs['section_styles'])
+        self.chunk_lines  = chunk_lines
+        self.chunked_prep = None if chunk_lines is None else ChunkedPrep(chunk_lines, **self.prep_kwargs)
+        self.source_maps  = {} if source_maps else None
+
+    #-------------------------
+    # run 
+    #--------------
+    
+    def run(self, src_paths, make_dst):
+        '''
+        Preprocess each source file, writing the result to a 
+        destination that make_dst provides. make_dst is called 
+        on an I/O thread, and only for modules that contain 
+        directives.
+        
+        @param src_paths: paths of the Python modules to preprocess
+        @type src_paths: [str]
+        @param make_dst: function that takes a source path, and
+            returns the path for the preprocessed result
+        @type make_dst: callable
+        @return: list of (src_path, dst_path) in the order of src_paths;
+            dst_path is None for modules without directives
+        @rtype [(str, {None | str})]
+        '''
+        results = []
+        metrics = self.prep_kwargs.get('metrics')
+        with ThreadPoolExecutor(max_workers=self.io_threads) as pool:
+            reads  = deque()
+            writes = deque()
+            src_iter = iter(src_paths)
+            
+            def fill_read_ahead():
+                while len(reads) < self.read_ahead:
+                    src_path = next(src_iter, None)
+                    if src_path is None:
+                        return
+                    reads.append((src_path, pool.submit(self.read_file, src_path)))
+            
+            fill_read_ahead()
+            while len(reads) > 0:
+                (src_path, read_future) = reads.popleft()
+                fill_read_ahead()
+                source = read_future.result()
+                
+                if not self.parseInfo.may_contain_directives(source):
+                    results.append((src_path, None))
+                    continue
+                
+                encoding = source_encoding(source, src_path)
+                out_fd = StringIO()
+                with nullcontext() if metrics is None else metrics.timer('preprocess'):
+                    self.prep_source(source.decode(encoding), out_fd, src_path)
+                
+                # Wait for the oldest write if too many are pending:
+                if len(writes) >= self.write_behind:
+                    writes.popleft().result()
+                write_future = pool.submit(self.write_file, src_path, out_fd.getvalue(), make_dst, encoding)
+                writes.append(write_future)
+                results.append((src_path, write_future))
+            
+            # Surface any write error:
+            for write_future in writes:
+                write_future.result()
+        
+        return [(src_path, None if dst is None else dst.result()) for (src_path, dst) in results]
+
+    #-------------------------
+    # prep_source 
+    #--------------
+    
+    def prep_source(self, text, out_fd, src_path):
+        
+        source_map = None
+        if self.source_maps is not None:
+            source_map = self.source_maps[src_path] = SourceMap()
+        if self.chunked_prep is not None and text.count('\n') > self.chunk_lines:
+            self.chunked_prep.run(text, out_fd, file_name=src_path, source_map=source_map)
+        else:
+            PdocPrep(StringIO(text), out_fd, file_name=src_path, source_map=source_map, **self.prep_kwargs)
+
+    #-------------------------
+    # read_file 
+    #--------------
+    
+    def read_file(self, src_path):
+        
+        with open(src_path, 'rb') as in_fd:
+            return in_fd.read()
+
+    #-------------------------
+    # write_file 
+    #--------------
+    
+    def write_file(self, src_path, text, make_dst, encoding):
+        
+        dst_path = make_dst(src_path)
+        with open_source_out(dst_path, encoding, self.prep_kwargs['markup'], src_path) as out_fd:
+            out_fd.write(text)
+        return dst_path
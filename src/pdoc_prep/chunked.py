@@ -0,0 +1,234 @@
+'''
+Created on Oct 18, 2026
+
+Preprocessing of one large module in chunks, on a pool
+of processes.
+
+@author: Andreas Paepcke
+'''
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+import sys
+
+from .diagnostics import DiagnosticsCollector
+from .grammars import make_section_grammars
+from .markup import make_markup
+from .pdoc_prep import ParseInfo, PdocPrep
+from .sourcemap import SourceMap
+
+# ---------------------------------- Class ChunkedPrep -----------------
+
+class ChunkedPrep(object):
+    '''
+    Preprocesses one large module on a pool of processes.
+    A pre-scan that only looks at lines with triple quotes
+    splits the module into chunks of about chunk_lines lines,
+    cutting only between lines that lie outside any docstring.
+    The chunks are transformed in parallel, and the results
+    are concatenated in order. Line numbers in errors and
+    diagnostics count from the start of the module.
+
+    A spec still open when its docstring ends takes in lines
+    of the next docstring. A chunk that ends with a spec open
+    is therefore done again together with the chunk after it,
+    so the output is always that of a single PdocPrep pass.
+    '''
+
+    def __init__(self, chunk_lines=20000, processes=None, **prep_kwargs):
+        '''
+        @param chunk_lines: least number of lines per chunk. Default: 20000
+        @type chunk_lines: int
+        @param processes: size of the process pool. Default: number of cores
+        @type processes: {None | int}
+        @param prep_kwargs: keyword arguments as for PdocPrep, such as
+            delimiter_char, or diagnostics. Not in_fd, out_fd, file_name,
+            line_offset, or profiler. All but diagnostics and metrics
+            must be picklable.
+        @type prep_kwargs: {str : Any}
+        '''
+        self.chunk_lines = max(1, chunk_lines)
+        self.processes   = processes
+        self.prep_kwargs = dict(prep_kwargs)
+        self.prep_kwargs['section_styles'] = make_section_grammars(prep_kwargs.get('section_styles', ('google', 'numpy')))
+        # Compiled once for all chunks:
+        self.prep_kwargs['markup'] = make_markup(prep_kwargs.get('markup'))
+
+    #-------------------------
+    # split
+    #--------------
+
+    def split(self, lines):
+        '''
+        Find the chunk boundaries.
+
+        @param lines: lines of the module, with line ends
+        @type lines: [str]
+        @return: zero-based first and end line of each chunk
+        @rtype [(int, int)]
+        '''
+        parseInfo = ParseInfo(self.prep_kwargs.get('delimiter_char', '@'))
+        bounds = []
+        first  = 0
+        for (line_num, line) in enumerate(lines):
+            # Only lines with triple quotes can open or
+            # close a docstring:
+            if "'''" in line or '"""' in line:
+                parseInfo.in_docstr(line)
+            if line_num + 1 - first >= self.chunk_lines and not parseInfo.curr_in_docstr:
+                bounds.append((first, line_num + 1))
+                first = line_num + 1
+        if first < len(lines):
+            bounds.append((first, len(lines)))
+        return bounds
+
+    #-------------------------
+    # run
+    #--------------
+
+    def run(self, text, out_fd, file_name=None, line_offset=0, source_map=None):
+        '''
+        Preprocess text, writing the result to out_fd.
+
+        @param text: module source, or an excerpt of it
+        @type text: str
+        @param out_fd: destination of the transformed module
+        @type out_fd: file-like
+        @param file_name: name of the module, used in diagnostics. Default: None
+        @type file_name: {None | str}
+        @param line_offset: zero-based number, in the complete module, of
+            the first line of text. Default: 0
+        @type line_offset: int
+        @param source_map: if provided, the original line of each output
+            line is appended there. Default: None
+        @type source_map: {None | SourceMap}
+        '''
+        prep_kwargs = dict(self.prep_kwargs)
+        diagnostics = prep_kwargs.pop('diagnostics', None)
+        metrics     = prep_kwargs.pop('metrics', None)
+        # Text without any directive passes through a single
+        # pass unchanged, while its chunks would be parsed:
+        parseInfo = ParseInfo(prep_kwargs.get('delimiter_char', '@'),
+                              prep_kwargs['section_styles'],
+                              prep_kwargs.get('allow_unindented', False),
+                              prep_kwargs['markup'].line_sep)
+        lines  = StringIO(text).readlines()
+        bounds = self.split(lines) if parseInfo.may_contain_directives(text) else []
+        if len(bounds) < 2:
+            PdocPrep(StringIO(text), out_fd, file_name=file_name, line_offset=line_offset,
+                     diagnostics=diagnostics, metrics=metrics, source_map=source_map, **prep_kwargs)
+            return
+
+        # Irregularities that are not raised are collected in the
+        # workers, and reported here in order:
+        collect  = diagnostics is not None or not prep_kwargs.get('raise_errors', True)
+        with_map = source_map is not None
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            futures = [pool.submit(prep_chunk, ''.join(lines[first:end]), line_offset + first,
+                                   i == len(bounds) - 1, file_name, collect, with_map, prep_kwargs)
+                       for (i, (first, end)) in enumerate(bounds)]
+            # First line of chunks to do again together
+            # with the current one:
+            carry_first = None
+            # Whether the output so far ends with a complete line:
+            at_line_start = True
+            for (i, (first, end)) in enumerate(bounds):
+                is_last = i == len(bounds) - 1
+                if carry_first is None:
+                    (output, open_at_end, chunk_diagnostics, directive_counts, chunk_map) = futures[i].result()
+                else:
+                    futures[i].cancel()
+                    (output, open_at_end, chunk_diagnostics, directive_counts, chunk_map) = \
+                        prep_chunk(''.join(lines[carry_first:end]), line_offset + carry_first,
+                                   is_last, file_name, collect, with_map, prep_kwargs)
+                if open_at_end and not is_last:
+                    carry_first = first if carry_first is None else carry_first
+                    continue
+                carry_first = None
+
+                out_fd.write(output)
+                if with_map and len(output) > 0:
+                    # A line the previous chunk left unfinished
+                    # continues, rather than starts, here:
+                    source_map.lines.extend(chunk_map if at_line_start else chunk_map[1:])
+                    at_line_start = output[-1] == '\n'
+                for diagnostic in chunk_diagnostics:
+                    if diagnostics is not None:
+                        diagnostics.add(diagnostic)
+                    elif prep_kwargs.get('warnings_on', False):
+                        sys.stderr.write("****Warning: " + diagnostic.msg + '\n')
+                    if metrics is not None:
+                        metrics.inc('errors_total', error=diagnostic.error_class)
+                if metrics is not None:
+                    for (kind, count) in directive_counts.items():
+                        metrics.inc('directives_total', count, kind=kind)
+
+#-------------------------
+# ChunkPrep
+#--------------
+
+class ChunkPrep(PdocPrep):
+    '''
+    PdocPrep for one chunk of a module. Chunks without
+    any directive are parsed as well, because their blank
+    docstring lines still get line separators. Specs open
+    at the end of any but the last chunk are left open,
+    and open_at_end is set.
+    '''
+
+    def __init__(self, is_last, *args, **kwargs):
+        self.is_last     = is_last
+        self.open_at_end = False
+        super().__init__(*args, **kwargs)
+
+    def needs_parse(self, content):
+        return True
+
+    def finish_open_specs(self, line_num):
+        self.open_at_end = self.curr_parm_match is not None or \
+                           self.curr_return_desc is not None or \
+                           self.curr_section is not None or \
+                           self.lines_to_skip > 0
+        # An error part way through the chunk ends the
+        # module's preprocessing, so specs are closed, and 
+        # may raise in turn, as for a single pass:
+        if self.is_last or not self.open_at_end or sys.exc_info()[0] is not None:
+            super().finish_open_specs(line_num)
+
+#-------------------------
+# prep_chunk
+#--------------
+
+def prep_chunk(text, line_offset, is_last, file_name, collect, with_map, prep_kwargs):
+    '''
+    Transform one chunk of a module. Runs in the
+    worker processes of ChunkedPrep.
+
+    @param text: the chunk
+    @type text: str
+    @param line_offset: zero-based number of its first line in the module
+    @type line_offset: int
+    @param is_last: whether the chunk ends the module
+    @type is_last: bool
+    @param file_name: name of the module, used in diagnostics
+    @type file_name: {None | str}
+    @param collect: whether to collect irregularities, rather than raise them
+    @type collect: bool
+    @param with_map: whether to map output lines to original lines
+    @type with_map: bool
+    @param prep_kwargs: further keyword arguments for PdocPrep
+    @type prep_kwargs: {str : Any}
+    @return: the output, whether a spec was left open at the end,
+        the irregularities, the directives transformed by kind, and
+        the original line of each output line, if asked for
+    @rtype (str, bool, [Diagnostic], {str : int}, {None | array})
+    '''
+    out_fd = StringIO()
+    diagnostics = DiagnosticsCollector() if collect else None
+    source_map  = SourceMap() if with_map else None
+    prepper = ChunkPrep(is_last, StringIO(text), out_fd, file_name=file_name, line_offset=line_offset, 
+                        diagnostics=diagnostics, source_map=source_map, **prep_kwargs)
+    return (out_fd.getvalue(),
+            prepper.open_at_end,
+            [] if diagnostics is None else diagnostics.diagnostics,
+            prepper.directive_counts,
+            None if source_map is None else source_map.lines)
@@ -0,0 +1,185 @@
+'''
+Created on Oct 18, 2026
+
+Docstring irregularities collected, rather than raised:
+a Diagnostic per irregularity, and the DiagnosticsCollector
+that keeps them, and reports them as JSON.
+
+@author: Andreas Paepcke
+'''
+import json
+import sys
+
+# ---------------------------------- Exceptions -----------------
+
+class DiagnosticsError(Exception):
+    pass
+
+# ---------------------------------- Diagnostics -----------------
+
+class Diagnostic(object):
+    '''
+    One irregularity found while preprocessing: the file, 
+    the line (counting from 1), the name of the error class
+    that would have been raised, the parameter involved, if
+    any, and the human readable message.
+    '''
+    
+    def __init__(self, file_name, line, error_class, parm_name, msg):
+        self.file_name   = file_name
+        self.line        = line
+        self.error_class = error_class
+        self.parm_name   = parm_name
+        self.msg         = msg
+        
+    def to_dict(self):
+        return {'file'        : self.file_name,
+                'line'        : self.line,
+                'error_class' : self.error_class,
+                'parm_name'   : self.parm_name,
+                'msg'         : self.msg
+                }
+
+#-------------------------
+# DiagnosticsCollector 
+#--------------
+
+class DiagnosticsCollector(object):
+    '''
+    Accumulates Diagnostic records across any number of
+    PdocPrep runs, so that a batch over many files does 
+    not stop at the first bad docstring. 
+    
+    Caps limit how many records are kept per file and 
+    in total; records beyond a cap are only counted.
+    With fail_at_end set, check() raises a DiagnosticsError
+    once all work is done, if anything was recorded.
+    '''
+    
+    def __init__(self, max_per_file=None, max_total=None, fail_at_end=False):
+        '''
+        @param max_per_file: most records to keep for any one file. Default: no limit
+        @type max_per_file: {None | int}
+        @param max_total: most records to keep overall. Default: no limit
+        @type max_total: {None | int}
+        @param fail_at_end: if True, check() raises DiagnosticsError if
+            any irregularity was recorded. Default: False
+        @type fail_at_end: bool
+        '''
+        self.max_per_file = max_per_file
+        self.max_total    = max_total
+        self.fail_at_end  = fail_at_end
+        
+        self.diagnostics  = []
+        self.num_dropped  = 0
+        self.per_file     = {}
+        self.per_class    = {}
+
+    #-------------------------
+    # record 
+    #--------------
+    
+    def record(self, file_name, line, error_class, msg, parm_name=None):
+        '''
+        Add one irregularity, unless a cap is reached. Counts
+        by error class include dropped records.
+        
+        @param file_name: file being processed; None for streams
+        @type file_name: {None | str}
+        @param line: line number, counting from 1; None if unknown
+        @type line: {None | int}
+        @param error_class: exception class that describes the irregularity
+        @type error_class: type
+        @param msg: human readable message
+        @type msg: str
+        @param parm_name: parameter involved, if any
+        @type parm_name: {None | str}
+        '''
+        self.add(Diagnostic(file_name, line, error_class.__name__, parm_name, msg))
+
+    #-------------------------
+    # add 
+    #--------------
+    
+    def add(self, diagnostic):
+        '''
+        Add a Diagnostic, such as one recorded by another 
+        collector, unless a cap is reached.
+        
+        @param diagnostic: the irregularity
+        @type diagnostic: Diagnostic
+        '''
+        class_name = diagnostic.error_class
+        self.per_class[class_name] = self.per_class.get(class_name, 0) + 1
+        
+        file_name   = diagnostic.file_name
+        num_in_file = self.per_file.get(file_name, 0)
+        if (self.max_per_file is not None and num_in_file >= self.max_per_file) or \
+           (self.max_total is not None and len(self.diagnostics) >= self.max_total):
+            self.num_dropped += 1
+            return
+        self.per_file[file_name] = num_in_file + 1
+        self.diagnostics.append(diagnostic)
+
+    #-------------------------
+    # num_found 
+    #--------------
+    
+    def num_found(self):
+        '''
+        @return: number of irregularities recorded, including dropped ones
+        @rtype int
+        '''
+        return len(self.diagnostics) + self.num_dropped
+
+    #-------------------------
+    # to_dict 
+    #--------------
+    
+    def to_dict(self):
+        return {'diagnostics' : [diagnostic.to_dict() for diagnostic in self.diagnostics],
+                'counts'      : dict(self.per_class),
+                'total'       : self.num_found(),
+                'dropped'     : self.num_dropped
+                }
+
+    #-------------------------
+    # to_json 
+    #--------------
+    
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    #-------------------------
+    # write_json 
+    #--------------
+    
+    def write_json(self, path):
+        '''
+        Write all records as JSON to the given file.
+        Path '-' writes to stderr, keeping stdout free
+        for preprocessed output.
+        
+        @param path: destination file, or '-'
+        @type path: str
+        '''
+        if path == '-':
+            sys.stderr.write(self.to_json() + '\n')
+            return
+        with open(path, 'w') as out_fd:
+            out_fd.write(self.to_json() + '\n')
+
+    #-------------------------
+    # check 
+    #--------------
+    
+    def check(self):
+        '''
+        Called when all work is done. If fail_at_end was
+        requested, and anything was recorded, raise.
+        
+        @raise DiagnosticsError
+        '''
+        if self.fail_at_end and self.num_found() > 0:
+            counts = ', '.join('%s: %s' % (class_name, num) for (class_name, num) in sorted(self.per_class.items()))
+            raise DiagnosticsError("%s docstring irregularities (%s)" % (self.num_found(), counts))
@@ -0,0 +1,96 @@
+'''
+Created on Oct 18, 2026
+
+Reading and writing module source in the encoding
+the module declares.
+
+@author: Andreas Paepcke
+'''
+from contextlib import contextmanager
+from io import BytesIO
+import sys
+import tokenize
+
+# ---------------------------------- Source Encoding -----------------
+
+#-------------------------
+# source_encoding 
+#--------------
+
+def source_encoding(source, file_name=None):
+    '''
+    Encoding of Python source, as the interpreter determines
+    it: from a UTF-8 byte order mark, or a PEP 263 coding 
+    cookie in the first two lines. Default is UTF-8.
+    
+    @param source: module source
+    @type source: bytes
+    @param file_name: name of the source; used in the error message
+    @type file_name: {None | str}
+    @return: name of the encoding, such as 'utf-8', 'utf-8-sig', or 'iso-8859-1'
+    @rtype str
+    @raise ValueError: if the cookie names an unknown encoding, 
+        or contradicts the byte order mark
+    '''
+    try:
+        (encoding, _lines) = tokenize.detect_encoding(BytesIO(source).readline)
+    except SyntaxError as e:
+        raise ValueError("Cannot determine the encoding of %s: %s" % (file_name or 'source', e))
+    return encoding
+
+#-------------------------
+# read_source 
+#--------------
+
+def read_source(path):
+    '''
+    Read a Python module, and decode it in its own encoding.
+    
+    @param path: path to the module
+    @type path: str
+    @return: module text, and its encoding
+    @rtype (str, str)
+    @raise ValueError: if the encoding cannot be determined
+    '''
+    with open(path, 'rb') as in_fd:
+        source = in_fd.read()
+    encoding = source_encoding(source, path)
+    return (source.decode(encoding), encoding)
+
+#-------------------------
+# open_source_out 
+#--------------
+
+@contextmanager
+def open_source_out(path, encoding, markup, file_name=None):
+    '''
+    Open a file for a preprocessed module in the module's 
+    encoding. With HTML markup, characters that the encoding 
+    lacks are written as character references. Else they 
+    raise a ValueError that names them.
+    
+    @param path: file to write; None for stdout
+    @type path: {None | str}
+    @param encoding: encoding of the module
+    @type encoding: str
+    @param markup: markup that the preprocessing writes
+    @type markup: Markup
+    @param file_name: name of the original module; used in the error message
+    @type file_name: {None | str}
+    @return: context manager that yields the file
+    @rtype contextmanager
+    @raise ValueError: if a character cannot be encoded
+    '''
+    if path is None:
+        sys.stdout.flush()
+        out_fd = open(sys.stdout.fileno(), 'w', encoding=encoding, 
+                      errors=markup.encoding_errors, closefd=False)
+    else:
+        out_fd = open(path, 'w', encoding=encoding, errors=markup.encoding_errors)
+    try:
+        with out_fd:
+            yield out_fd
+    except UnicodeEncodeError as e:
+        raise ValueError("Cannot write %r to the preprocessed %s in its encoding %s; "
+                         "use markup within that encoding, or HTML markup." %\
+                         (e.object[e.start:e.end], file_name or path or 'module', encoding)) from e
@@ -0,0 +1,352 @@
+'''
+Created on Oct 18, 2026
+
+Google and NumPy style docstring sections: the grammars
+that recognize their headers and items, and the state of
+the specs and sections that PdocPrep is collecting.
+
+@author: Andreas Paepcke
+'''
+from abc import ABC, abstractmethod
+import re
+
+# ---------------------------------- Section Grammars -----------------
+
+class SectionGrammar(ABC):
+    '''
+    Base class for docstring styles that group parameter,
+    return, and raises specs under section headers, rather 
+    than marking each spec with a directive. Subclasses 
+    provide the header texts, the per-item regexps, and
+    the indentation rules of their style. 
+    
+    Section kinds are 'params', 'returns', and 'raises'.
+    '''
+    
+    # Name under which the style is selected in PdocPrep:
+    style = None
+    
+    # Map from stripped header line to section kind:
+    headers = {}
+    
+    # Regexp source that finds a header in an entire
+    # module's text. Used for ParseInfo's pre-scan:
+    marker_regex = None
+    
+    def __init__(self):
+        self.params_item_pat  = None
+        self.returns_item_pat = None
+        self.raises_item_pat  = None
+    
+    #-------------------------
+    # section_header 
+    #--------------
+    
+    @abstractmethod
+    def section_header(self, stripped, next_line):
+        '''
+        Check whether a line opens a section of this style.
+        This is the cheap first-line check: a dict lookup
+        of the stripped line.
+        
+        @param stripped: the line, stripped of surrounding white space
+        @type stripped: str
+        @param next_line: the line after the one being checked; '' at end of input
+        @type next_line: str
+        @return: None if the line is no header, else a tuple with
+            the section kind, and the number of lines following the
+            header that belong to it (e.g. an underline).
+        @rtype {None | (str, int)}
+        '''
+    
+    #-------------------------
+    # classify_line 
+    #--------------
+    
+    @abstractmethod
+    def classify_line(self, section, indent, next_line):
+        '''
+        Given the indentation of a non-blank line inside an
+        open section, tell whether the line starts a new item,
+        continues the description of the current item, or
+        ends the section.
+        
+        @param section: state of the open section
+        @type section: SectionState
+        @param indent: number of leading spaces of the line
+        @type indent: int
+        @param next_line: the line after the one being checked
+        @type next_line: str
+        @return: one of 'item', 'continuation', and 'end'
+        @rtype str
+        '''
+    
+    #-------------------------
+    # parse_item 
+    #--------------
+    
+    @abstractmethod
+    def parse_item(self, kind, stripped):
+        '''
+        Split the first line of a section item into name,
+        type, and description.
+        
+        @param kind: one of 'params', 'returns', 'raises'
+        @type kind: str
+        @param stripped: item line, stripped of surrounding white space
+        @type stripped: str
+        @return: None if the line is not a legal item, else
+            a tuple (name, type, desc). Name and type may be None,
+            desc may be empty.
+        @rtype {None | (str, str, str)}
+        '''
+
+#-------------------------
+# GoogleGrammar 
+#--------------
+
+class GoogleGrammar(SectionGrammar):
+    '''
+    Google style:
+    <pre>
+        Args:
+            foo (int): controls whether bar is set to None
+        Returns:
+            bool: True for success, else False
+        Raises:
+            ValueError: if foo is negative
+    </pre>
+    '''
+    
+    style = 'google'
+    
+    headers = {'Args:'              : 'params',
+               'Arguments:'         : 'params',
+               'Parameters:'        : 'params',
+               'Params:'            : 'params',
+               'Keyword Args:'      : 'params',
+               'Keyword Arguments:' : 'params',
+               'Returns:'           : 'returns',
+               'Return:'            : 'returns',
+               'Yields:'            : 'returns',
+               'Raises:'            : 'raises'
+               }
+    
+    marker_regex = r'^[ \t]*(?:Args|Arguments|Parameters|Params|Keyword Args|Keyword Arguments|' +\
+                   r'Returns|Return|Yields|Raises):[ \t]*$'
+    
+    def __init__(self):
+        # Find foo (int): meaning of foo; the type is optional:
+        self.params_item_pat  = re.compile(r'^(\*{0,2}\w+)[ ]*(?:\(([^)]*)\))?[ ]*:[ ]*(.*)$')
+        # Find bool: True for success. Without a colon after
+        # a type-like first word, the whole line is the description:
+        self.returns_item_pat = re.compile(r'^([\w\.]+(?:\[[^\]]*\])?):[ ]+(.*)$')
+        # Find ValueError: if foo is negative; the description is optional:
+        self.raises_item_pat  = re.compile(r'^(\w[\w\.]*)[ ]*(?::[ ]*(.*))?$')
+    
+    def section_header(self, stripped, next_line):
+        kind = self.headers.get(stripped)
+        return None if kind is None else (kind, 0)
+    
+    def classify_line(self, section, indent, next_line):
+        # Items are indented relative to the header; 
+        # description lines further still:
+        if indent <= section.header_indent:
+            return 'end'
+        # A return description often continues at the
+        # indentation of its first line:
+        if section.kind == 'returns' and section.item is not None:
+            return 'continuation'
+        if section.item_indent is None or indent <= section.item_indent:
+            return 'item'
+        return 'continuation'
+    
+    def parse_item(self, kind, stripped):
+        if kind == 'params':
+            item_match = self.params_item_pat.search(stripped)
+            if item_match is None:
+                return None
+            (name, type_desc, desc) = item_match.groups()
+            return (name, None if type_desc is None else type_desc.strip(), desc.strip())
+        elif kind == 'returns':
+            item_match = self.returns_item_pat.search(stripped)
+            if item_match is None:
+                return (None, None, stripped)
+            (type_desc, desc) = item_match.groups()
+            return (None, type_desc, desc.strip())
+        else:
+            item_match = self.raises_item_pat.search(stripped)
+            if item_match is None:
+                return None
+            (exc_name, desc) = item_match.groups()
+            return (exc_name, None, '' if desc is None else desc.strip())
+
+#-------------------------
+# NumpyGrammar 
+#--------------
+
+class NumpyGrammar(SectionGrammar):
+    '''
+    NumPy style:
+    <pre>
+        Parameters
+        ----------
+        foo : int
+            controls whether bar is set to None
+        Returns
+        -------
+        bool
+            True for success, else False
+        Raises
+        ------
+        ValueError
+            if foo is negative
+    </pre>
+    '''
+    
+    style = 'numpy'
+    
+    headers = {'Parameters'       : 'params',
+               'Other Parameters' : 'params',
+               'Returns'          : 'returns',
+               'Yields'           : 'returns',
+               'Raises'           : 'raises'
+               }
+    
+    marker_regex = r'^[ \t]*(?:Parameters|Other Parameters|Returns|Yields|Raises)[ \t]*\r?\n[ \t]*-{3,}[ \t]*$'
+    
+    def __init__(self):
+        self.underline_pat    = re.compile(r'^[ \t]*-{3,}[ \t]*$')
+        # Find foo : int, and the like 'x, y : float'; the type is optional:
+        self.params_item_pat  = re.compile(r'^(\*{0,2}\w+(?:[ ]*,[ ]*\*{0,2}\w+)*)[ ]*(?::[ ]*(.*))?$')
+        # Find 'bool', or with a name: 'success : bool':
+        self.returns_item_pat = re.compile(r'^(?:(\w+)[ ]*:[ ]*)?(.+)$')
+        self.raises_item_pat  = re.compile(r'^(\w[\w\.]*)$')
+    
+    def section_header(self, stripped, next_line):
+        kind = self.headers.get(stripped)
+        if kind is None or self.underline_pat.search(next_line) is None:
+            return None
+        # The underline belongs to the header:
+        return (kind, 1)
+    
+    def classify_line(self, section, indent, next_line):
+        # Items are aligned with the header, descriptions
+        # are indented below them. Any underlined line
+        # is the header of a following section:
+        if indent < section.header_indent or self.underline_pat.search(next_line) is not None:
+            return 'end'
+        if indent == section.header_indent:
+            return 'item'
+        return 'continuation'
+    
+    def parse_item(self, kind, stripped):
+        if kind == 'params':
+            item_match = self.params_item_pat.search(stripped)
+            if item_match is None:
+                return None
+            (name, type_desc) = item_match.groups()
+            return (name, None if not type_desc else type_desc.strip(), '')
+        elif kind == 'returns':
+            item_match = self.returns_item_pat.search(stripped)
+            if item_match is None:
+                return None
+            (_name, type_desc) = item_match.groups()
+            return (None, type_desc.strip(), '')
+        else:
+            item_match = self.raises_item_pat.search(stripped)
+            if item_match is None:
+                return None
+            return (item_match.group(1), None, '')
+
+# Grammars that can be selected by their style name:
+SECTION_GRAMMARS = {GoogleGrammar.style : GoogleGrammar,
+                    NumpyGrammar.style  : NumpyGrammar
+                    }
+
+#-------------------------
+# make_section_grammars 
+#--------------
+
+def make_section_grammars(section_styles):
+    '''
+    Turn a list of style names and/or grammar 
+    instances into a list of grammar instances.
+    
+    @param section_styles: style names, or SectionGrammar instances
+    @type section_styles: [{str | SectionGrammar}]
+    @return: list of grammars
+    @rtype [SectionGrammar]
+    @raise ValueError if a style name is unknown
+    '''
+    grammars = []
+    for style in section_styles or []:
+        if isinstance(style, SectionGrammar):
+            grammars.append(style)
+            continue
+        try:
+            grammars.append(SECTION_GRAMMARS[style]())
+        except KeyError:
+            raise ValueError("Docstring style '%s' is not one of %s." % (style, sorted(SECTION_GRAMMARS.keys())))
+    return grammars
+
+#-------------------------
+# OpenSpec 
+#--------------
+
+class OpenSpec(object):
+    '''
+    A parameter or return spec whose description is still
+    being collected. Continuation lines are kept as a list
+    of fragments that is joined only once, when the spec is 
+    finished. So collecting a description costs time linear
+    in its length, no matter how many lines it spans.
+    '''
+    __slots__ = ('name', 'fragments')
+    
+    def __init__(self, name, first_fragment):
+        self.name      = name
+        self.fragments = [first_fragment]
+        
+    def append(self, fragment):
+        self.fragments.append(fragment)
+        
+    def desc(self):
+        return ' '.join(self.fragments)
+
+#-------------------------
+# SectionItem 
+#--------------
+
+class SectionItem(OpenSpec):
+    '''
+    Item of a Google or NumPy style section being collected.
+    In addition to an OpenSpec, holds the item's indentation,
+    its type (None if not given), and the line it started on.
+    '''
+    __slots__ = ('indent', 'type_desc', 'line_num')
+    
+    def __init__(self, indent, name, type_desc, first_fragment, line_num):
+        super().__init__(name, first_fragment)
+        self.indent    = indent
+        self.type_desc = type_desc
+        self.line_num  = line_num
+
+#-------------------------
+# SectionState 
+#--------------
+
+class SectionState(object):
+    '''
+    State of a section that is currently open in 
+    a docstring: the grammar that recognized it, the
+    kind of section, the indentation of the header and 
+    of its items, and the SectionItem being collected.
+    '''
+    
+    def __init__(self, grammar, kind, header_indent):
+        self.grammar       = grammar
+        self.kind          = kind
+        self.header_indent = header_indent
+        self.item_indent   = None
+        self.item          = None
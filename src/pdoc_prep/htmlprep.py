@@ -0,0 +1,326 @@
+'''
+Created on Oct 18, 2026
+
+Transformation of the docstrings in the HTML that pdoc
+produced from an untouched module.
+
+@author: Andreas Paepcke
+'''
+from contextlib import contextmanager
+from io import StringIO
+import re
+import sys
+
+from .grammars import NumpyGrammar, make_section_grammars, OpenSpec
+from .markup import make_markup
+from .pdoc_prep import ParseInfo, PdocPrep
+
+# ---------------------------------- Class PdocHtmlPrep -----------------
+
+class PdocHtmlPrep(object):
+    '''
+    Post-processes HTML that pdoc produced from an
+    untouched module, instead of preprocessing the module.
+    Streams over the HTML, and hands the text of each
+    docstring block, i.e. the module intro and each
+    <div class="desc">, to a PdocPrep instance. All other
+    lines are copied through. Blocks without any directive
+    marker are copied through as well.
+    
+    Within a block, each paragraph is transformed on its own,
+    but a parameter or return spec still open at the end of a
+    paragraph stays open into the next one, as it would across
+    the lines of a docstring. NumPy section headers, which pdoc's
+    markdown turns into <h2> elements, are turned back into 
+    underlined headers of the paragraph that follows them.
+    '''
+    
+    def __init__(self,
+                 in_fd=sys.stdin,
+                 out_fd=sys.stdout,
+                 raise_errors=True,
+                 warnings_on=False,
+                 delimiter_char='@',
+                 force_type_spec=False,
+                 section_styles=('google', 'numpy'),
+                 file_name=None,
+                 diagnostics=None,
+                 profiler=None,
+                 symbol_index=None,
+                 markup=None,
+                 metrics=None):
+        '''
+        Constructor. Arguments are as for PdocPrep, except
+        that in_fd and out_fd carry pdoc-produced HTML, and
+        that the profiled phase is called 'postprocess'.
+        
+        @param in_fd: source of pdoc-produced HTML. Default: stdin
+        @type in_fd: file-like
+        @param out_fd: destination of transformed HTML. Default: stdout
+        @type out_fd: file-like
+        '''
+        self.out_fd = out_fd
+        self.prep_kwargs = {'raise_errors'     : raise_errors,
+                            'warnings_on'      : warnings_on,
+                            'delimiter_char'   : delimiter_char,
+                            'force_type_spec'  : force_type_spec,
+                            'section_styles'   : make_section_grammars(section_styles),
+                            'file_name'        : file_name,
+                            'diagnostics'      : diagnostics,
+                            'allow_unindented' : True,
+                            'symbol_index'     : symbol_index,
+                            # Compiled once for all blocks:
+                            'markup'           : make_markup(markup),
+                            'metrics'          : metrics
+                            }
+        self.parseInfo = ParseInfo(delimiter_char, self.prep_kwargs['section_styles'])
+        
+        self.desc_start_pat   = re.compile(r'<div class="desc">')
+        self.intro_start_pat  = re.compile(r'<header id="section-intro">')
+        self.intro_title_pat  = re.compile(r'<h1 class="title">.*</h1>')
+        self.intro_end_pat    = re.compile(r'class="source_cont"|class="source_link"|</header>')
+        self.div_tag_pat      = re.compile(r'<div[\s>]|</div>')
+        # A paragraph, possibly right after a NumPy section header, 
+        # which pdoc's markdown turns into an <h2>:
+        self.para_pat = re.compile(r'(?:<h2>(%s)</h2>\n)?<p>(.*?)</p>' % '|'.join(NumpyGrammar.headers.keys()),
+                                   re.DOTALL)
+        self.h2_pat   = re.compile(r'^<h2>([^<]+)</h2>$', re.MULTILINE)
+        
+        if profiler is None:
+            self.process(in_fd)
+        else:
+            with profiler.phase('postprocess'):
+                self.process(in_fd)
+
+    #-------------------------
+    # process 
+    #--------------
+    
+    def process(self, in_fd):
+        '''
+        Go through the HTML, copying lines outside of
+        docstring blocks, and transforming the blocks.
+        
+        @param in_fd: pdoc-produced HTML
+        @type in_fd: file-like
+        '''
+        lines = iter(in_fd)
+        for line in lines:
+            desc_match = self.desc_start_pat.search(line)
+            if desc_match is not None:
+                self.process_desc(line, desc_match.end(), lines)
+                continue
+            if self.intro_start_pat.search(line) is not None:
+                self.out_fd.write(line)
+                self.process_intro(lines)
+                continue
+            self.out_fd.write(line)
+
+    #-------------------------
+    # process_desc 
+    #--------------
+    
+    def process_desc(self, first_line, block_start, lines):
+        '''
+        Collect the lines of one <div class="desc"> up to its
+        matching </div>, which may come after nested divs, such
+        as code blocks. Transform the block, and output it.
+        
+        @param first_line: line holding the opening div
+        @type first_line: str
+        @param block_start: offset of the block text in first_line
+        @type block_start: int
+        @param lines: iterator over the remaining HTML lines
+        @type lines: iterator
+        '''
+        self.out_fd.write(first_line[0:block_start])
+        block = []
+        depth = 1
+        line  = first_line[block_start:]
+        while True:
+            # Find the closing div of the block within this line:
+            pos = 0
+            for tag_match in self.div_tag_pat.finditer(line):
+                depth += -1 if tag_match.group(0) == '</div>' else 1
+                if depth == 0:
+                    pos = tag_match.start()
+                    break
+            if depth == 0:
+                block.append(line[0:pos])
+                self.out_fd.write(self.transform_block(''.join(block)))
+                self.out_fd.write(line[pos:])
+                return
+            block.append(line)
+            line = next(lines, None)
+            if line is None:
+                # Unterminated block; leave it alone:
+                self.out_fd.write(''.join(block))
+                return
+
+    #-------------------------
+    # process_intro 
+    #--------------
+    
+    def process_intro(self, lines):
+        '''
+        The module docstring follows the module title in
+        the intro header, and ends where the source link,
+        or the end of the header starts.
+        
+        @param lines: iterator over the HTML lines after the header start
+        @type lines: iterator
+        '''
+        block = []
+        for line in lines:
+            if len(block) == 0 and self.intro_title_pat.search(line) is not None:
+                self.out_fd.write(line)
+                continue
+            if self.intro_end_pat.search(line) is not None:
+                self.out_fd.write(self.transform_block(''.join(block)))
+                self.out_fd.write(line)
+                return
+            block.append(line)
+        self.out_fd.write(''.join(block))
+
+    #-------------------------
+    # transform_block 
+    #--------------
+    
+    def transform_block(self, block_text):
+        '''
+        Transform the text of one docstring block. Each paragraph,
+        together with a NumPy section header right before it, is 
+        presented to a PdocPrep instance as the body of a docstring.
+        So directives and sections are rendered exactly as when
+        preprocessing source. Code blocks, lists, etc. between
+        paragraphs are left alone.
+        
+        @param block_text: HTML text of the block
+        @type block_text: str
+        @return: transformed block text
+        @rtype str
+        '''
+        if not self.parseInfo.may_contain_directives(self.h2_pat.sub(r'\1\n---', block_text)):
+            return block_text
+        # Specs open at the end of the latest paragraph, and 
+        # the number of paragraphs still to do:
+        self.carried = {}
+        self.paras_left = len(self.para_pat.findall(block_text))
+        return self.para_pat.sub(self.transform_paragraph, block_text)
+
+    #-------------------------
+    # transform_paragraph 
+    #--------------
+    
+    def transform_paragraph(self, para_match):
+        '''
+        Substitution function for transform_block.
+        
+        @param para_match: match of para_pat
+        @type para_match: re.Match
+        @return: replacement text
+        @rtype str
+        '''
+        (numpy_title, para_text) = para_match.groups()
+        self.paras_left -= 1
+        if numpy_title is not None:
+            para_text = numpy_title + '\n' + '-' * len(numpy_title) + '\n' + para_text
+        if len(self.carried) == 0 and not self.parseInfo.may_contain_directives(para_text):
+            return para_match.group(0)
+        
+        # An opening docstring delimiter starts the engine
+        # off inside a docstring; the docstring is never closed,
+        # so that nothing gets appended to an open spec: 
+        docstr_open = ParagraphPrep.DOCSTR_OPEN
+        out_fd = StringIO()
+        prepper = ParagraphPrep(self.carried, self.paras_left == 0, 
+                                StringIO(docstr_open + para_text), out_fd, **self.prep_kwargs)
+        self.carried = prepper.carried
+        return '<p>' + out_fd.getvalue()[len(docstr_open):] + '</p>'
+
+#-------------------------
+# ParagraphPrep 
+#--------------
+
+class ParagraphPrep(PdocPrep):
+    '''
+    PdocPrep for one paragraph of a docstring block in pdoc's
+    HTML. A parameter or return spec open at the end of any 
+    but the block's last paragraph is written out, so that its
+    description stays in its paragraph, but is handed on in 
+    carried, without description. The next paragraph resumes
+    it, so that a type spec there still counts for it. Sections
+    end with the paragraph.
+    '''
+    
+    DOCSTR_OPEN = '"""\n'
+    
+    def __init__(self, carried, is_last, *args, **kwargs):
+        self.carried = carried
+        self.is_last = is_last
+        super().__init__(*args, **kwargs)
+
+    def reset_parse_state(self):
+        super().reset_parse_state()
+        self.curr_parm_match  = self.carried.get('curr_parm_match')
+        self.curr_return_desc = self.carried.get('curr_return_desc')
+
+    def needs_parse(self, content):
+        return len(self.carried) > 0 or super().needs_parse(content)
+
+    def append_to_parm_desc(self, line):
+        # A carried spec takes in the opening docstring delimiter,
+        # which is output as is, to be cut off with the others:
+        if line == self.DOCSTR_OPEN:
+            self.out_fd.write(line)
+        else:
+            super().append_to_parm_desc(line)
+
+    def append_to_return_desc(self, line):
+        if line == self.DOCSTR_OPEN:
+            self.out_fd.write(line)
+        else:
+            super().append_to_return_desc(line)
+
+    def finish_parameter_spec(self, type_found=False, line_no=None, report=True):
+        with self.resumed_output(self.curr_parm_match):
+            super().finish_parameter_spec(type_found=type_found, line_no=line_no, report=report)
+
+    def finish_return_spec(self, rtype_found=False, line_no=None, report=True):
+        with self.resumed_output(self.curr_return_desc):
+            super().finish_return_spec(rtype_found=rtype_found, line_no=line_no, report=report)
+
+    @contextmanager
+    def resumed_output(self, spec):
+        '''
+        Discard what finishing spec writes, if spec was 
+        carried in, and got no further description here.
+        '''
+        if spec is None or spec not in self.carried.values() or len(spec.fragments) > 0:
+            yield
+            return
+        out_fd = self.out_fd
+        self.out_fd = StringIO()
+        try:
+            yield
+        finally:
+            self.out_fd = out_fd
+
+    def finish_open_specs(self, line_num):
+        self.finish_section()
+        # An error part way through the paragraph ends the
+        # block's preprocessing, so specs are closed, and 
+        # may raise in turn:
+        if self.is_last or sys.exc_info()[0] is not None:
+            super().finish_open_specs(line_num)
+            return
+        carried = {}
+        if self.curr_parm_match is not None:
+            carried['curr_parm_match'] = OpenSpec(self.curr_parm_match.name, None)
+            self.finish_parameter_spec(line_no=line_num, report=False)
+        elif self.curr_return_desc is not None:
+            carried['curr_return_desc'] = OpenSpec(None, None)
+            self.finish_return_spec(line_no=line_num, report=False)
+        for spec in carried.values():
+            spec.fragments = []
+        self.carried = carried
@@ -0,0 +1,176 @@
+'''
+Created on Oct 18, 2026
+
+Output markup that replaces the docstring directives:
+HTML by default, Markdown, or templates of one's own.
+
+@author: Andreas Paepcke
+'''
+import json
+import os
+import string
+
+# ---------------------------------- Output Markup -----------------
+
+class Markup(object):
+    '''
+    Markup that replaces the directives. Each directive kind
+    has a template, such as '<b>{name}</b> ' for a parameter
+    name. Templates are compiled once, into the literal prefix 
+    and suffix around their field, so that writing a spec 
+    only concatenates prebuilt fragments.
+    
+    Templates are given as a dict, whose entries override 
+    those of a base format, one of MARKUP_FORMATS. The special
+    entry 'line_sep' is the text that replaces the end of 
+    each docstring line.
+    '''
+    
+    # Kind of template, and the fields it must contain:
+    FIELDS = {'param'   : ('name',),
+              'type'    : ('type',),
+              'returns' : ('desc',),
+              'rtype'   : ('type',),
+              'raises'  : ('desc',),
+              'link'    : ('href', 'name')
+              }
+    
+    def __init__(self, templates=None, base='html'):
+        '''
+        @param templates: templates by kind, and optionally 'line_sep'
+        @type templates: {None | {str : str}}
+        @param base: format whose templates are used where
+            templates has none. Default: 'html'
+        @type base: str
+        @raise ValueError: if a kind, base, or template field is unknown,
+            or a template lacks a field
+        '''
+        if base not in MARKUP_FORMATS:
+            raise ValueError("Markup format '%s' is not one of %s." % (base, sorted(MARKUP_FORMATS.keys())))
+        all_templates = dict(MARKUP_FORMATS[base])
+        all_templates.update(templates or {})
+        
+        self.line_sep = all_templates.pop('line_sep')
+        # Characters of the markup that a module's encoding
+        # lacks can be written as character references
+        # only where they end up in HTML:
+        self.encoding_errors = 'xmlcharrefreplace' if base == 'html' else 'strict'
+        for (kind, template) in all_templates.items():
+            if kind not in Markup.FIELDS:
+                raise ValueError("Markup kind '%s' is not one of %s." % (kind, sorted(Markup.FIELDS.keys())))
+            (literals, fields) = self.compile(kind, template)
+            if kind == 'link':
+                # The link's two fields may come in either order:
+                self.link_fragments  = literals
+                self.link_name_first = fields[0] == 'name'
+            else:
+                setattr(self, kind + '_prefix', literals[0])
+                setattr(self, kind + '_suffix', literals[1])
+
+    #-------------------------
+    # compile 
+    #--------------
+    
+    def compile(self, kind, template):
+        '''
+        Split a template into the literal fragments 
+        around its fields.
+        
+        @param kind: kind of template
+        @type kind: str
+        @param template: template with {field} placeholders
+        @type template: str
+        @return: literal fragments, one more than there are fields,
+            and the fields in the order they occur
+        @rtype ((str), (str))
+        @raise ValueError: if the template's fields are not those of kind
+        '''
+        literals = ['']
+        fields   = []
+        try:
+            for (literal, field, _spec, _conversion) in string.Formatter().parse(template):
+                literals[-1] += literal
+                if field is not None:
+                    fields.append(field)
+                    literals.append('')
+        except ValueError as e:
+            raise ValueError("Bad %s template '%s': %s" % (kind, template, e))
+        if sorted(fields) != sorted(Markup.FIELDS[kind]):
+            raise ValueError("The %s template '%s' must contain exactly the fields %s." %\
+                             (kind, template, ', '.join('{%s}' % field for field in Markup.FIELDS[kind])))
+        return (tuple(literals), tuple(fields))
+
+    #-------------------------
+    # link 
+    #--------------
+    
+    def link(self, href, name):
+        '''
+        Render the link template.
+        
+        @param href: link target
+        @type href: str
+        @param name: link text
+        @type name: str
+        @return: the link
+        @rtype str
+        '''
+        (first, middle, last) = self.link_fragments
+        if self.link_name_first:
+            return first + name + middle + href + last
+        return first + href + middle + name + last
+
+# Templates of the built-in formats:
+MARKUP_FORMATS = {'html'     : {'line_sep' : '</br>',
+                                'param'    : '<b>{name}</b> ',
+                                'type'     : '(<b></i>{type}</i></b>): ',
+                                'returns'  : '<b>returns:</b> {desc}',
+                                'rtype'    : '<b>return type:</b> {type}',
+                                'raises'   : '<b>raises:</b> {desc}',
+                                'link'     : '<a href="{href}">{name}</a>'
+                                },
+                  'markdown' : {'line_sep' : '  \n',
+                                'param'    : '**{name}** ',
+                                'type'     : '(*{type}*): ',
+                                'returns'  : '**returns:** {desc}',
+                                'rtype'    : '**return type:** {type}',
+                                'raises'   : '**raises:** {desc}',
+                                'link'     : '[{name}]({href})'
+                                }
+                  }
+
+#-------------------------
+# make_markup 
+#--------------
+
+def make_markup(markup):
+    '''
+    Turn a markup specification into a Markup instance. 
+    The specification is a Markup instance, a key of 
+    MARKUP_FORMATS, or the path of a JSON file with an 
+    object of templates, and optionally a 'base' format.
+    
+    @param markup: markup specification; None for HTML
+    @type markup: {None | str | Markup}
+    @return: compiled markup
+    @rtype Markup
+    @raise ValueError: if the format is unknown, or the file is faulty
+    '''
+    if isinstance(markup, Markup):
+        return markup
+    if markup is None:
+        markup = 'html'
+    if markup in MARKUP_FORMATS:
+        return Markup(base=markup)
+    if not os.path.exists(markup):
+        raise ValueError("Markup '%s' is neither one of %s, nor a template file." %\
+                         (markup, sorted(MARKUP_FORMATS.keys())))
+    with open(markup, 'r') as in_fd:
+        try:
+            templates = json.load(in_fd)
+        except ValueError as e:
+            raise ValueError("Markup template file %s is not valid JSON: %s" % (markup, e))
+    if not isinstance(templates, dict):
+        raise ValueError("Markup template file %s must hold a JSON object." % markup)
+    base = templates.pop('base', 'html')
+    return Markup(templates, base=base)
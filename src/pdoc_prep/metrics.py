@@ -0,0 +1,251 @@
+'''
+Created on Oct 18, 2026
+
+Counters and phase durations of pdoc_run builds,
+exported in the Prometheus text format: to a file, 
+or from a small HTTP server.
+
+@author: Andreas Paepcke
+'''
+from contextlib import contextmanager
+import os
+import tempfile
+import threading
+import time
+
+# ---------------------------------- Metrics -----------------
+
+class BuildMetrics(object):
+    '''
+    Counters and phase duration histograms of doc builds,
+    rendered in the Prometheus text exposition format. The
+    rendering may be written to a file, for instance for the
+    node exporter's textfile collector, or served over HTTP
+    for scraping while a long build runs.
+
+    Metrics kept, all with prefix 'pdoc_prep_':
+    <pre>
+        modules_processed_total{outcome}   'prepped', 'original' (no directives, so
+                                           pdoc saw the module itself), 'skipped'
+                                           (completed by an earlier, resumed run),
+                                           'timed_out' (pdoc ran out of time), or
+                                           'failed' (pdoc failed, e.g. over its memory limit)
+        cache_hits_total{cache}            'journal', 'symbol_index', and 'page_store'
+        cache_misses_total{cache}
+        directives_total{kind}             'param', 'type', 'return', 'rtype', 'raises'
+        errors_total{error}                by exception class
+        pdoc_retries_total{error}          by exception class of the failed try
+        phase_duration_seconds{phase}      histogram over 'preprocess', 'postprocess'
+                                           (with --html-postprocess), 'pdoc', 
+                                           'replace_temp_name', and 'store'
+    </pre>
+    Safe to share between threads.
+    '''
+
+    PREFIX = 'pdoc_prep_'
+
+    # Name without prefix to (type, help text):
+    METRICS = {'modules_processed_total' : ('counter',   'Modules documented, by outcome.'),
+               'cache_hits_total'        : ('counter',   'Cache lookups that were hits, by cache.'),
+               'cache_misses_total'      : ('counter',   'Cache lookups that were misses, by cache.'),
+               'directives_total'        : ('counter',   'Directives and section items transformed, by kind.'),
+               'errors_total'            : ('counter',   'Docstring irregularities and failures, by exception class.'),
+               'pdoc_retries_total'      : ('counter',   'pdoc runs repeated after a failure, by exception class.'),
+               'phase_duration_seconds'  : ('histogram', 'Duration of build phases, by phase.')
+               }
+
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        '''
+        @param buckets: upper bounds of the histogram buckets,
+            in seconds, ascending. Default: DEFAULT_BUCKETS
+        @type buckets: [float]
+        '''
+        self.buckets = tuple(buckets)
+        # Name to {sorted label items : value}:
+        self.counters = {}
+        # Name to {sorted label items : [bucket counts, sum, count]}:
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    #-------------------------
+    # inc
+    #--------------
+
+    def inc(self, name, amount=1, **labels):
+        '''
+        Add to a counter.
+
+        @param name: metric name without prefix; a key of METRICS
+        @type name: str
+        @param amount: what to add. Default: 1
+        @type amount: {int | float}
+        @param labels: label names and values of the series
+        @type labels: {str : str}
+        '''
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    #-------------------------
+    # observe
+    #--------------
+
+    def observe(self, name, value, **labels):
+        '''
+        Add an observation to a histogram.
+
+        @param name: metric name without prefix; a key of METRICS
+        @type name: str
+        @param value: the observation, such as seconds
+        @type value: float
+        @param labels: label names and values of the series
+        @type labels: {str : str}
+        '''
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry = series[key]
+            for (i, bound) in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    #-------------------------
+    # timer
+    #--------------
+
+    @contextmanager
+    def timer(self, phase_name):
+        '''
+        Context manager that records the duration of
+        the enclosed code in the phase duration histogram,
+        also if the code raises.
+
+        @param phase_name: name of the phase
+        @type phase_name: str
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('phase_duration_seconds', time.perf_counter() - start, phase=phase_name)
+
+    #-------------------------
+    # render
+    #--------------
+
+    def render(self):
+        '''
+        All metrics in the Prometheus text exposition format.
+
+        @return: the exposition text
+        @rtype str
+        '''
+        lines = []
+        with self.lock:
+            for (name, (metric_type, help_text)) in BuildMetrics.METRICS.items():
+                full_name = BuildMetrics.PREFIX + name
+                lines.append('# HELP %s %s' % (full_name, help_text))
+                lines.append('# TYPE %s %s' % (full_name, metric_type))
+                if metric_type == 'counter':
+                    for (key, value) in sorted(self.counters.get(name, {}).items()):
+                        lines.append('%s%s %s' % (full_name, self.format_labels(key), self.format_value(value)))
+                    continue
+                for (key, (bucket_counts, total, count)) in sorted(self.histograms.get(name, {}).items()):
+                    for (bound, bucket_count) in zip(self.buckets, bucket_counts):
+                        lines.append('%s_bucket%s %s' % (full_name,
+                                                         self.format_labels(key + (('le', self.format_value(bound)),)),
+                                                         bucket_count))
+                    lines.append('%s_bucket%s %s' % (full_name, self.format_labels(key + (('le', '+Inf'),)), count))
+                    lines.append('%s_sum%s %s' % (full_name, self.format_labels(key), self.format_value(total)))
+                    lines.append('%s_count%s %s' % (full_name, self.format_labels(key), count))
+        return '\n'.join(lines) + '\n'
+
+    #-------------------------
+    # format_labels
+    #--------------
+
+    def format_labels(self, key):
+
+        if len(key) == 0:
+            return ''
+        escaped = [(label, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for (label, value) in key]
+        return '{' + ','.join('%s="%s"' % label_value for label_value in escaped) + '}'
+
+    #-------------------------
+    # format_value
+    #--------------
+
+    def format_value(self, value):
+
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    #-------------------------
+    # write
+    #--------------
+
+    def write(self, path):
+        '''
+        Write the rendering to a file. The file is replaced
+        in one step, so a collector never reads half of it.
+
+        @param path: destination file
+        @type path: str
+        '''
+        out_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        (tmp_fd, tmp_path) = tempfile.mkstemp(prefix='.tmp_metrics_', dir=out_dir)
+        try:
+            with os.fdopen(tmp_fd, 'w') as out_fd:
+                out_fd.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    #-------------------------
+    # serve
+    #--------------
+
+    def serve(self, port, host='127.0.0.1'):
+        '''
+        Serve the rendering at http://host:port/metrics from
+        a daemon thread, for as long as the process lives,
+        or until shutdown() is called on the returned server.
+
+        @param port: TCP port; 0 picks a free one
+        @type port: int
+        @param host: interface to listen on. Default: localhost only
+        @type host: str
+        @return: the server; its server_address holds the port
+        @rtype http.server.HTTPServer
+        '''
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *_args):
+                # Keep scrapes out of the build output:
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
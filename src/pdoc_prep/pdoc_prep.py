@@ -30,6 +30,11 @@ documentation will look like this:
 or '<b>@</b>' is controlled from a command line option. See main
 section below.
 
+Google style (<i>Args:</i>, <i>Returns:</i>, <i>Raises:</i>) and
+NumPy style (underlined <i>Parameters</i>, <i>Returns</i>, 
+<i>Raises</i>) sections are rendered the same way, in the same 
+pass. Option --sections selects which of these styles are recognized.
+
 This module can be used directly, either to process an input
 file, or as part of a pipe. In general it is much more
 conventient to use *pdoc_run.py*:
@@ -42,6 +47,12 @@ Used directly:<br>
     ```
     shell> cat myMod.py | pdoc_prep.py > new myModTmp.py; pdoc --html myModTmp.py
     ```
+<br>
+Alternatively, pdoc's HTML output for the untouched module
+can be transformed afterwards:<br>
+    ```
+    shell> pdoc --html myMod.py; pdoc_prep.py --html -f myMod.m.html -o myMod.m.html.new
+    ```
     
 **Note:** it would be more sensible to include this functionality in
 the pdoc HTML production code itself. Alas, not enough time. 
@@ -49,10 +60,23 @@ the pdoc HTML production code itself. Alas, not enough time.
 @author: Andreas Paepcke
 '''
 import argparse
+from io import StringIO
 import os
 import re
 import sys
 
+if __name__ == '__main__' and not __package__:
+    # Run as a script: import the sibling modules 
+    # through the package, as when imported:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = 'pdoc_prep'
+
+from .diagnostics import DiagnosticsError, DiagnosticsCollector
+from .encoding import source_encoding, read_source, open_source_out
+from .grammars import make_section_grammars, OpenSpec, SectionItem, SectionState
+from .markup import MARKUP_FORMATS, make_markup
+from .profiling import PhaseProfiler
+from .sourcemap import SourceMap, SourceMapWriter
 
 # ---------------------------------- Special Exception and Enums -----------------
 class NoTypeError(Exception):
@@ -71,6 +95,20 @@ class HandleRes(enumerate):
     HANDLED     = True
     NOT_HANDLED = False
 
+class ParseState(object):
+    '''
+    States of PdocPrep's state machine engine. OUTSIDE is
+    any line outside a docstring. Within a docstring, IN_PARAM
+    and IN_RETURN collect the description of an open parameter
+    or return spec, IN_SECTION the items of a Google or NumPy
+    section, and IN_DOC is anything else.
+    '''
+    OUTSIDE    = 'outside'
+    IN_DOC     = 'in_doc'
+    IN_PARAM   = 'in_param'
+    IN_RETURN  = 'in_return'
+    IN_SECTION = 'in_section'
+
 # ---------------------------------- Class ParseInfo -----------------
 
 class ParseInfo(object):
@@ -80,7 +118,7 @@ class ParseInfo(object):
     in the pdoc HTML output.  
     '''
     
-    def __init__(self, delimiter_char):
+    def __init__(self, delimiter_char, section_grammars=None, allow_unindented=False, line_sep='</br>'):
         '''
         Initialize different regexp and other constants
         depending on whether the delimiter for starting
@@ -90,6 +128,14 @@ class ParseInfo(object):
         
         @param delimiter_char: char literal in [':', '@']
         @type delimiter_char: char
+        @param section_grammars: grammars of section-based docstring
+            styles whose headers the pre-scan needs to find as well.
+            Default: none
+        @type section_grammars: [SectionGrammar]
+        @param allow_unindented: if True, directives are also recognized at
+            the very start of a line. Docstrings in pdoc's HTML output
+            are dedented. Default: False
+        @type allow_unindented: bool
         '''
 
         self.curr_in_docstr = False
@@ -102,31 +148,66 @@ class ParseInfo(object):
         elif delimiter_char == '@':
             self.parm_markers = ['@param', '@type', '@return', '@rtype', '@raises']
 
-        self.line_sep = '</br>'
+        # One regex that finds any of the directive markers, used to
+        # pre-scan an entire file in a single search. The raises marker
+        # is cut back to 'raise', because raises_pat below also accepts
+        # 'raise' and 'raised':
+        marker_regexes = [re.escape(re.sub(r'raises$', 'raise', marker)) for marker in self.parm_markers]
+        # Section headers, such as 'Args:', mark specs as well:
+        if section_grammars is not None:
+            marker_regexes.extend(grammar.marker_regex for grammar in section_grammars)
+        self.directive_marker_pat = re.compile('|'.join(marker_regexes), re.MULTILINE)
+        # Markers are ASCII, and Python source is in an ASCII
+        # compatible encoding. So raw source bytes can be scanned
+        # without decoding them:
+        self.directive_marker_bytes_pat = re.compile('|'.join(marker_regexes).encode('ascii'), re.MULTILINE)
+        
+        # All section header texts, to rule out headers with
+        # one set lookup:
+        self.header_texts = frozenset(header for grammar in section_grammars or [] 
+                                             for header in grammar.headers)
+
+        self.line_sep = line_sep
         
         self.line_blank_pat    = re.compile(r'^[\s]*$')
+        # Names in a type spec, such as Foo, or pkg.mod.Foo:
+        self.type_name_pat     = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*')
+        self.indent_pat        = re.compile(r'^[ ]*')
+        
+        # Directives are normally indented within their docstring:
+        indent_regex = r'(^[ ]*)' if allow_unindented else r'(^[ ]+)'
         
         if delimiter_char == ':':
             # Find :param myParm: meaning of my parm
-            self.param_pat    = re.compile(r'(^[ ]+):param([^:]*):(.*)$')
+            self.param_pat    = re.compile(indent_regex + r':param([^:]*):(.*)$')
             # Find :type myParm: int
-            self.type_pat     = re.compile(r'(^[ ]+):type([^:]*):(.*)$')
+            self.type_pat     = re.compile(indent_regex + r':type([^:]*):(.*)$')
             # Be forgiving; accept ':return ', ':return:', ':returns ', and ':returns:' 
-            self.return_pat   = re.compile(r'(^[ ]+):return[s]{0,1}[:| ]{0,1}(.*)$')
+            self.return_pat   = re.compile(indent_regex + r':return[s]{0,1}[:| ]{0,1}(.*)$')
             # Find :rtype int</span> and allow an optional colon after the 'rtype':
-            self.rtype_pat    = re.compile(r'(^[ ]+):rtype[:| ]{0,1}(.*)$')
+            self.rtype_pat    = re.compile(indent_regex + r':rtype[:| ]{0,1}(.*)$')
             # Find :raises ValueError, and allow an optional colon after the 'raises'.
             # Accepts 'raise', 'raises', and 'raised'              
-            self.raises_pat   = re.compile(r'(^[ ]+):raise[s|d]{0,1}[:| ]{0,1}(.*)$')
+            self.raises_pat   = re.compile(indent_regex + r':raise[s|d]{0,1}[:| ]{0,1}(.*)$')
         else:
             # Same, but using '@' as the delimiter:
-            self.param_pat    = re.compile(r'(^[ ]+)@param([^:]*):(.*)$')
-            self.type_pat     = re.compile(r'(^[ ]+)@type([^:]*):(.*)$')
+            self.param_pat    = re.compile(indent_regex + r'@param([^:]*):(.*)$')
+            self.type_pat     = re.compile(indent_regex + r'@type([^:]*):(.*)$')
             # Be forgiving; accept ':return ', ':return:', ':returns ', and ':returns:' 
-            self.return_pat   = re.compile(r'(^[ ]+)@return[s]{0,1}[:| ]{0,1}(.*)$')
-            self.rtype_pat    = re.compile(r'(^[ ]+)@rtype[:| ]{0,1}(.*)$')
+            self.return_pat   = re.compile(indent_regex + r'@return[s]{0,1}[:| ]{0,1}(.*)$')
+            self.rtype_pat    = re.compile(indent_regex + r'@rtype[:| ]{0,1}(.*)$')
             # Accepts 'raise', 'raises', and 'raised'                          
-            self.raises_pat   = re.compile(r'(^[ ]+)@raise[s|d]{0,1}[:| ]{0,1}(.*)$')
+            self.raises_pat   = re.compile(indent_regex + r'@raise[s|d]{0,1}[:| ]{0,1}(.*)$')
+        
+        # Tells with one search which of the above patterns
+        # could match a line, so only that one needs trying:
+        self.directive_kind_pat = re.compile(indent_regex + re.escape(delimiter_char) + r'(param|type|return|rtype|raise)')
+        self.directive_pats = {'param'  : self.param_pat,
+                               'type'   : self.type_pat,
+                               'return' : self.return_pat,
+                               'rtype'  : self.rtype_pat,
+                               'raise'  : self.raises_pat
+                               }
 
         self.single_quote_one_liner     = re.compile(r"^[\s]*[']{3}[^']+[']{3}$")
 
@@ -223,13 +304,35 @@ class ParseInfo(object):
         
         return self.curr_in_docstr
 
+    #-------------------------
+    # may_contain_directives 
+    #--------------
+
+    def may_contain_directives(self, text):
+        '''
+        Quick check whether a text, usually the content of an
+        entire Python module, could hold any directive at all. 
+        A False return guarantees that the text would pass
+        through PdocPrep unchanged. A True return only means
+        that one of the markers occurs somewhere, maybe 
+        outside a docstring.
+        
+        @param text: text to scan, or the undecoded source
+        @type text: {str | bytes}
+        @return: whether any directive marker occurs in text
+        @rtype bool
+        '''
+        if isinstance(text, bytes):
+            return self.directive_marker_bytes_pat.search(text) is not None
+        return self.directive_marker_pat.search(text) is not None
+
 # ---------------------------------- Class PdocPrep -----------------
 
 class PdocPrep(object):
     '''
-    Reads a pdoc-produced HTML file. Finds the 
+    Reads a Python module. Finds the 
     :param, :type, :return, :rtype, and :raises
-    lines. Replaces them with HTML.
+    lines in its docstrings. Replaces them with HTML.
     
     :param foo: this tells about fum
     :type foo: int
@@ -238,7 +341,21 @@ class PdocPrep(object):
         <b>foo</b>(<i>int</i>): this tells about fum<br>
         
     Similarly for :return/:rtype, and :raises
+    
+    Google style (Args:/Returns:/Raises:) and NumPy style
+    (Parameters/Returns/Raises, underlined) sections are
+    rendered the same way in the same pass. The style is
+    recognized per docstring from its first section header.
+    
+    Two engines produce identical output. The default, 'states',
+    is a table-driven state machine: each docstring line is 
+    classified once, and the pair of current state and line
+    class selects the transition. The original engine, 'chain',
+    tries each directive check in turn on every line, and is
+    kept as the reference.
     '''
+    
+    ENGINES = ('states', 'chain')
         
     #-------------------------
     # Constructor 
@@ -250,13 +367,24 @@ class PdocPrep(object):
                  raise_errors=True,
                  warnings_on=False,
                  delimiter_char='@',
-                 force_type_spec=False):
+                 force_type_spec=False,
+                 section_styles=('google', 'numpy'),
+                 file_name=None,
+                 diagnostics=None,
+                 profiler=None,
+                 allow_unindented=False,
+                 engine='states',
+                 symbol_index=None,
+                 markup=None,
+                 line_offset=0,
+                 metrics=None,
+                 source_map=None):
         '''
         Constructor
         
-        @param in_fd: source of pdoc-produced HTML file. Default: stdin
+        @param in_fd: source of the Python module. Default: stdin
         @type in_fd: file-like
-        @param out_fd: destination of transformed html. Default: stdout
+        @param out_fd: destination of transformed module. Default: stdout
         @type out_fd: file-like
         @param raise_errors: if True then irregularities will raise errors. Default: True
         @type raise_errors: boolean
@@ -265,15 +393,75 @@ class PdocPrep(object):
         @type warnings_on: boolean
         @param delimiter_char: starting char of a directive: ':' or '@'. Default: '@'
         @type delimiter_char: char
+        @param force_type_spec: if True, every parameter and return spec must
+            come with a type. Default: False
+        @type force_type_spec: bool
+        @param section_styles: section-based docstring styles to recognize 
+            in addition to directives. Each element is a key of SECTION_GRAMMARS,
+            or a SectionGrammar instance. Default: Google and NumPy style
+        @type section_styles: [{str | SectionGrammar}]
+        @param file_name: name of the input, used in diagnostics. Default: None
+        @type file_name: {None | str}
+        @param diagnostics: if provided, irregularities are recorded there,
+            instead of being raised or printed. Default: None
+        @type diagnostics: {None | DiagnosticsCollector}
+        @param profiler: if provided, parsing is profiled as phase 'parse'. Default: None
+        @type profiler: {None | PhaseProfiler}
+        @param allow_unindented: if True, directives at the very start
+            of a line are recognized as well. Default: False
+        @type allow_unindented: bool
+        @param engine: parsing engine, one of ENGINES. Default: 'states'
+        @type engine: str
+        @param symbol_index: if provided, names in type specs that the index
+            knows are linked to their documentation. Default: None
+        @type symbol_index: {None | SymbolIndex}
+        @param markup: markup to replace the directives with: a Markup 
+            instance, a key of MARKUP_FORMATS, or a template file. Default: HTML
+        @type markup: {None | str | Markup}
+        @param line_offset: zero-based number, in the complete module, of the 
+            first input line, when the input is an excerpt. Line numbers 
+            in errors and diagnostics count from there. Default: 0
+        @type line_offset: int
+        @param metrics: if provided, the directives transformed, and
+            the irregularities, are counted there. Default: None
+        @type metrics: {None | BuildMetrics}
+        @param source_map: if provided, the original line of each output 
+            line is appended there. Default: None
+        @type source_map: {None | SourceMap}
+        @raise ValueError: if the engine or markup is unknown
         '''
+        if engine not in PdocPrep.ENGINES:
+            raise ValueError("Engine '%s' is not one of %s." % (engine, list(PdocPrep.ENGINES)))
         
+        self.engine = engine
+        self.line_offset = line_offset
+        self.symbol_index = symbol_index
+        if symbol_index is not None:
+            self.module_rel_path = symbol_index.module_rel_path(file_name)
+        self.source_map = source_map
+        if source_map is not None:
+            out_fd = SourceMapWriter(out_fd, source_map, line_offset)
         self.out_fd = out_fd
         self.raise_errors = raise_errors
         self.warnings = warnings_on
+        self.file_name = file_name
+        self.diagnostics = diagnostics
         self.force_type_spec = force_type_spec
         self.delimiter_char = delimiter_char
-        self.parseInfo = ParseInfo(delimiter_char)
-        self.parse(in_fd)
+        self.section_grammars = make_section_grammars(section_styles)
+        self.markup = make_markup(markup)
+        self.parseInfo = ParseInfo(delimiter_char, self.section_grammars, allow_unindented, self.markup.line_sep)
+        self.metrics = metrics
+        # Directives transformed, by kind:
+        self.directive_counts = {}
+        if profiler is None:
+            self.parse(in_fd)
+        else:
+            with profiler.phase('parse'):
+                self.parse(in_fd)
+        if metrics is not None:
+            for (kind, count) in self.directive_counts.items():
+                metrics.inc('directives_total', count, kind=kind)
 
     #-------------------------
     # parse 
@@ -288,14 +476,299 @@ class PdocPrep(object):
         @param in_fd: input stream
         @type in_fd: file-like
         '''
+        self.reset_parse_state()
+        content = in_fd.read()
         
+        if not self.needs_parse(content):
+            if self.source_map is None:
+                self.out_fd.write(content)
+            else:
+                self.out_fd.copy(content)
+            return
+        
+        lines = StringIO(content).readlines()
+        if self.engine == 'states':
+            self.parse_states(lines)
+        else:
+            self.parse_chain(lines)
+
+    #-------------------------
+    # reset_parse_state 
+    #--------------
+    
+    def reset_parse_state(self):
+        '''
+        Start the input with no spec or section open.
+        '''
         self.curr_parm_match = None
         self.curr_return_desc = None
         
+        # Section style of the current docstring once
+        # its first header was seen, and the section
+        # being worked on: 
+        self.curr_grammar = None
+        self.curr_section = None
+        self.lines_to_skip = 0
+
+    #-------------------------
+    # needs_parse 
+    #--------------
+    
+    def needs_parse(self, content):
+        '''
+        Most modules have no directives at all. Those
+        are copied through without looking at every line.
+        
+        @param content: the complete input
+        @type content: str
+        @return: whether the input must be parsed
+        @rtype bool
+        '''
+        return self.parseInfo.may_contain_directives(content)
+
+    #-------------------------
+    # numbered 
+    #--------------
+    
+    def numbered(self, lines):
+        '''
+        The lines with their numbers, counting from the 
+        line offset. With a source map, the map's writer
+        is told the number of each line as it comes up.
+        
+        @param lines: lines of the module
+        @type lines: [str]
+        @return: iterator over (line number, line)
+        @rtype iterator
+        '''
+        if self.source_map is None:
+            return enumerate(lines, self.line_offset)
+        return self.numbered_for_map(lines)
+    
+    def numbered_for_map(self, lines):
+        
+        writer = self.out_fd
+        for (line_num, line) in enumerate(lines, self.line_offset):
+            writer.src_line = line_num
+            yield (line_num, line)
+
+    #-------------------------
+    # parse_states 
+    #--------------
+    
+    def parse_states(self, lines):
+        '''
+        The state machine engine. Outside docstrings, a
+        line is only checked for triple quotes. Inside, it is
+        classified once by classify_line(), and the transition
+        for the current state and the line's class handles it 
+        and returns the next state. 
+        
+        @param lines: lines of the module, with line ends
+        @type lines: [str]
+        '''
+        parseInfo   = self.parseInfo
+        transitions = PdocPrep.TRANSITIONS
+        state = ParseState.OUTSIDE
+        # Line numbers count from the line offset; indexes
+        # into lines are line_num - line_offset:
+        line_offset = self.line_offset
+        line_num = line_offset
+        try:
+            for (line_num, line) in self.numbered(lines):
+                
+                # Only lines with triple quotes can open or
+                # close a docstring:
+                if "'''" in line or '"""' in line:
+                    parseInfo.in_docstr(line)
+                in_docstr = parseInfo.curr_in_docstr
+                
+                if state == ParseState.OUTSIDE:
+                    if not in_docstr:
+                        self.out_fd.write(line)
+                        continue
+                    # Entering a docstring. Specs left open by an 
+                    # earlier docstring take in this one's lines: 
+                    state = self.open_spec_state()
+                
+                elif state == ParseState.IN_SECTION:
+                    # Drop lines that belong to a section header, 
+                    # such as the underline of NumPy headers:
+                    if self.lines_to_skip > 0:
+                        self.lines_to_skip -= 1
+                        continue
+                    if in_docstr:
+                        next_index = line_num - line_offset + 1
+                        next_line  = lines[next_index] if next_index < len(lines) else ''
+                        if self.check_section_line(line, line_num, next_line) == HandleRes.HANDLED:
+                            continue
+                    else:
+                        # A section ends with its docstring:
+                        self.finish_section()
+                    state = ParseState.IN_DOC
+                
+                if not in_docstr:
+                    # The line closes the docstring, but may still
+                    # hold a spec, as in "   :return'''":
+                    self.curr_grammar = None
+                
+                (line_class, match) = self.classify_line(line, line_num, lines)
+                state = transitions[(state, line_class)](self, state, line, line_num, match)
+                
+                if not in_docstr:
+                    state = ParseState.OUTSIDE
+        finally:
+            self.finish_open_specs(line_num)
+
+    #-------------------------
+    # classify_line 
+    #--------------
+    
+    def classify_line(self, line, line_num, lines):
+        '''
+        Classify a docstring line as one of 'blank', 'header', 
+        'param', 'type', 'return', 'rtype', 'raises', or 'text'.
+        A directive line counts as 'text' if it does not match
+        its directive's full pattern.
+        
+        @param line: the line
+        @type line: str
+        @param line_num: number of the line; line_num - line_offset 
+            is its index in lines
+        @type line_num: int
+        @param lines: all lines, for looking ahead to the next one
+        @type lines: [str]
+        @return: the class, and the regex match of the directive,
+            or the section header tuple, or None 
+        @rtype (str, Any)
+        '''
+        if not line or line.isspace():
+            return ('blank', None)
+        
+        parseInfo = self.parseInfo
+        if self.section_grammars:
+            stripped = line.strip()
+            if stripped in parseInfo.header_texts:
+                next_index = line_num - self.line_offset + 1
+                next_line  = lines[next_index] if next_index < len(lines) else ''
+                grammars  = self.section_grammars if self.curr_grammar is None else [self.curr_grammar]
+                for grammar in grammars:
+                    header = grammar.section_header(stripped, next_line)
+                    if header is not None:
+                        return ('header', (grammar, header))
+        
+        kind_match = parseInfo.directive_kind_pat.search(line)
+        if kind_match is None:
+            return ('text', None)
+        kind  = kind_match.group(2)
+        match = parseInfo.directive_pats[kind].search(line)
+        if match is None:
+            return ('text', None)
+        return ('raises' if kind == 'raise' else kind, match)
+
+    #-------------------------
+    # open_spec_state 
+    #--------------
+    
+    def open_spec_state(self):
+        '''
+        The docstring state that matches the specs currently open.
+        
+        @return: IN_PARAM, IN_RETURN, or IN_DOC
+        @rtype str
+        '''
+        if self.curr_parm_match is not None:
+            return ParseState.IN_PARAM
+        if self.curr_return_desc is not None:
+            return ParseState.IN_RETURN
+        return ParseState.IN_DOC
+
+    #-------------------------
+    # Transitions 
+    #--------------
+    
+    # Each takes the current state, the line, its number, and
+    # the match from classify_line(), and returns the next state.
+    
+    def on_blank(self, state, line, line_num, match):
+        # Keep indentation (spaces/tabs), but replace NL with </br>
+        self.out_fd.write(line[0:len(line)-1] + self.parseInfo.line_sep)
+        return state
+    
+    def on_header(self, state, line, line_num, match):
+        (grammar, (kind, lines_to_skip)) = match
+        # Any open directive-style spec ends here:
+        self.finish_parameter_spec(line_no=line_num)
+        self.finish_return_spec(line_no=line_num)
+        # The header lines themselves are not output;
+        # the items read like directive-style specs:
+        self.curr_grammar  = grammar
+        self.curr_section  = SectionState(grammar, kind, self.indent_of(line))
+        self.lines_to_skip = lines_to_skip
+        return ParseState.IN_SECTION
+    
+    def on_param(self, state, line, line_num, match):
+        self.open_parameter_spec(match, line_num)
+        return ParseState.IN_PARAM
+    
+    def on_type_in_param(self, state, line, line_num, match):
+        if self.close_parameter_type(match, line_num):
+            return self.open_spec_state()
+        # Mismatched type; the line is taken as description:
+        self.append_to_parm_desc(line)
+        return state
+    
+    def on_type_in_return(self, state, line, line_num, match):
+        self.report_orphan_type(match, line_num)
+        self.append_to_return_desc(line)
+        return state
+    
+    def on_type_in_doc(self, state, line, line_num, match):
+        self.report_orphan_type(match, line_num)
+        self.out_fd.write(line)
+        return state
+    
+    def on_return(self, state, line, line_num, match):
+        self.open_return_spec(match, line_num)
+        return ParseState.IN_RETURN
+    
+    def on_rtype(self, state, line, line_num, match):
+        self.write_rtype_spec(match, line_num)
+        return ParseState.IN_DOC
+    
+    def on_raises(self, state, line, line_num, match):
+        self.write_raises_spec(match, line_num)
+        # An open return spec stays open:
+        return self.open_spec_state()
+    
+    def on_text_in_param(self, state, line, line_num, match):
+        self.append_to_parm_desc(line)
+        return state
+    
+    def on_text_in_return(self, state, line, line_num, match):
+        self.append_to_return_desc(line)
+        return state
+    
+    def on_text_in_doc(self, state, line, line_num, match):
+        self.out_fd.write(line)
+        return state
+
+    #-------------------------
+    # parse_chain 
+    #--------------
+    
+    def parse_chain(self, lines):
+        '''
+        The reference engine: tries each directive 
+        check in turn on every docstring line.
+        
+        @param lines: lines of the module, with line ends
+        @type lines: [str]
+        '''
         try:
             # Try finding in every line each of the special directives,
             # and transform if found, alse pass through.
-            for (line_num, line) in enumerate(in_fd.readlines()):
+            for (line_num, line) in self.numbered(lines):
                 
                 # Before consuming current line, which could finish
                 # a docstr we are currently processing, remember
@@ -316,12 +789,32 @@ class PdocPrep(object):
                 
                 # We are working through a docstr:
                 
+                # Drop lines that belong to a section header, 
+                # such as the underline of NumPy headers:
+                if self.lines_to_skip > 0:
+                    self.lines_to_skip -= 1
+                    continue
+                
+                # A section ends with its docstring:
+                if not self.parseInfo.curr_in_docstr:
+                    self.finish_section()
+                    self.curr_grammar = None
+                
+                next_index = line_num - self.line_offset + 1
+                next_line  = lines[next_index] if next_index < len(lines) else ''
+                
+                if self.curr_section is not None and \
+                    self.check_section_line(line, line_num, next_line) == HandleRes.HANDLED:
+                    continue
+                
                 # Empty lines within a docstr get a terminating </br>:
                 if self.is_blank_line(line):
                     # Keep indentation (spaces/tabs), but replace NL with </br>
                     self.out_fd.write(line[0:len(line)-1] + self.parseInfo.line_sep)
                     continue
                 
+                if self.check_section_header(line, line_num, next_line) == HandleRes.HANDLED:
+                    continue
                 if self.check_param_spec(line, line_num) == HandleRes.HANDLED:
                     continue
                 if self.check_type_spec(line, line_num)  == HandleRes.HANDLED:
@@ -346,12 +839,28 @@ class PdocPrep(object):
                 continue
 
         finally:
-            # Ensure that a possibly open parameter spec is closed:
-            if self.curr_parm_match is not None:
-                self.finish_parameter_spec(type_found=False, line_no=line_num)
-            # Same for return spec:                
-            elif self.curr_return_desc is not None:
-                self.finish_return_spec(rtype_found=False, line_no=line_num)
+            self.finish_open_specs(line_num)
+
+    #-------------------------
+    # finish_open_specs 
+    #--------------
+    
+    def finish_open_specs(self, line_num):
+        '''
+        At the end of the input, close whatever 
+        section or spec is still open.
+        
+        @param line_num: number of the last line. Used for error msgs.
+        @type line_num: int
+        '''
+        # Ensure that a possibly open section is closed:
+        self.finish_section()
+        # Ensure that a possibly open parameter spec is closed:
+        if self.curr_parm_match is not None:
+            self.finish_parameter_spec(type_found=False, line_no=line_num)
+        # Same for return spec:                
+        elif self.curr_return_desc is not None:
+            self.finish_return_spec(rtype_found=False, line_no=line_num)
         
     #-------------------------
     # handle_multiline_spec 
@@ -370,19 +879,178 @@ class PdocPrep(object):
         '''
         # In the middle of a multiline parm spec?
         if self.curr_parm_match is not None:
-            (param_name, param_desc) = self.curr_parm_match
-            param_desc += ' ' + line
-            self.curr_parm_match = (param_name, param_desc)
+            self.append_to_parm_desc(line)
             return True
         
         # Are we in the middle of a return specification? If so, this 
         # is likely a continuation line:
         if self.curr_return_desc is not None:
-            self.curr_return_desc += ' ' + line.strip()
+            self.append_to_return_desc(line)
             return True
         
         return False
 
+    #-------------------------
+    # check_section_header 
+    #--------------
+    
+    def check_section_header(self, line, line_num, next_line):
+        '''
+        Handle the header line of a Google or NumPy style
+        section. Once a docstring's first header was found,
+        only the grammar of that header's style is consulted 
+        for the rest of the docstring.
+        
+        @param line: line to check for a section header
+        @type line: str
+        @param line_num: line number in the original file. Used for error msgs.
+        @type line_num: int
+        @param next_line: line following the one to check
+        @type next_line: str
+        @returns whether the given line was handled and output,
+            or nothing was done.
+        @rtype HandleRes
+        '''
+        if not self.section_grammars:
+            return HandleRes.NOT_HANDLED
+        
+        stripped = line.strip()
+        grammars = self.section_grammars if self.curr_grammar is None else [self.curr_grammar]
+        for grammar in grammars:
+            header = grammar.section_header(stripped, next_line)
+            if header is None:
+                continue
+            
+            (kind, lines_to_skip) = header
+            
+            # Any open directive-style spec ends here:
+            self.finish_parameter_spec(line_no=line_num)
+            self.finish_return_spec(line_no=line_num)
+            
+            # The header lines themselves are not output;
+            # the items read like directive-style specs:
+            self.curr_grammar  = grammar
+            self.curr_section  = SectionState(grammar, kind, self.indent_of(line))
+            self.lines_to_skip = lines_to_skip
+            return HandleRes.HANDLED
+        
+        return HandleRes.NOT_HANDLED
+
+    #-------------------------
+    # check_section_line 
+    #--------------
+    
+    def check_section_line(self, line, line_num, next_line):
+        '''
+        Handle a line while a section is open: start a new item,
+        or add to the description of the current item. If the 
+        line ends the section, the section is finished, and
+        the line is left for regular processing. 
+        
+        @param line: line to check
+        @type line: str
+        @param line_num: line number in the original file. Used for error msgs.
+        @type line_num: int
+        @param next_line: line following the one to check
+        @type next_line: str
+        @returns whether the given line was handled and output,
+            or nothing was done.
+        @rtype HandleRes
+        '''
+        section = self.curr_section
+        if self.is_blank_line(line):
+            self.finish_section()
+            return HandleRes.NOT_HANDLED
+        
+        line_type = section.grammar.classify_line(section, self.indent_of(line), next_line)
+        
+        if line_type == 'continuation' and section.item is not None:
+            section.item.append(line.strip())
+            return HandleRes.HANDLED
+        
+        if line_type == 'item':
+            item_parts = section.grammar.parse_item(section.kind, line.strip())
+            if item_parts is not None:
+                self.finish_section_item()
+                (name, type_desc, desc) = item_parts
+                section.item_indent = self.indent_of(line)
+                section.item = SectionItem(line[0:section.item_indent], name, type_desc, desc, line_num)
+                return HandleRes.HANDLED
+        
+        # Line is not part of the section:
+        self.finish_section()
+        return HandleRes.NOT_HANDLED
+
+    #-------------------------
+    # finish_section 
+    #--------------
+    
+    def finish_section(self):
+        '''
+        If a section is open, output its last item,
+        and close the section. Else do nothing. 
+        '''
+        if self.curr_section is None:
+            return
+        self.finish_section_item()
+        self.curr_section = None
+
+    #-------------------------
+    # finish_section_item 
+    #--------------
+    
+    def finish_section_item(self):
+        '''
+        Output the item collected in the open section, 
+        using the same markup as directive-style specs.
+        
+        @raises NoTypeError
+        '''
+        section = self.curr_section
+        item = section.item
+        if item is None:
+            return
+        section.item = None
+        
+        indent    = item.indent
+        name      = item.name
+        type_desc = item.type_desc
+        desc      = item.desc().strip()
+        line_sep  = self.parseInfo.line_sep
+        markup    = self.markup
+        
+        if section.kind == 'params':
+            if self.force_type_spec and type_desc is None:
+                self.error_notify('No type spec found for parameter %s at line %s' %\
+                                  (name, item.line_num), NoTypeError,
+                                  line_num=item.line_num, parm_name=name
+                                  )
+            self.out_fd.write(indent + markup.param_prefix + name + markup.param_suffix)
+            self.count_directive('param')
+            if type_desc is not None:
+                self.out_fd.write(markup.type_prefix + self.link_types(type_desc) + markup.type_suffix)
+                self.count_directive('type')
+            self.out_fd.write(desc + line_sep)
+        
+        elif section.kind == 'returns':
+            if self.force_type_spec and type_desc is None:
+                self.error_notify('No return type found by line %s' %\
+                                  (item.line_num), NoTypeError,
+                                  line_num=item.line_num
+                                  )
+            if len(desc) > 0:
+                self.out_fd.write(indent + markup.returns_prefix + desc + markup.returns_suffix + line_sep)
+                self.count_directive('return')
+            if type_desc is not None:
+                self.out_fd.write(indent + markup.rtype_prefix + self.link_types(type_desc) + 
+                                  markup.rtype_suffix + line_sep)
+                self.count_directive('rtype')
+        
+        else:
+            raises_desc = name if len(desc) == 0 else name + ': ' + desc
+            self.out_fd.write(indent + markup.raises_prefix + raises_desc + markup.raises_suffix + line_sep)
+            self.count_directive('raises')
+
     #-------------------------
     # check_param_spec 
     #--------------
@@ -403,30 +1071,46 @@ class PdocPrep(object):
         parm_match = self.parseInfo.param_pat.search(line)
         if parm_match is None:
             return HandleRes.NOT_HANDLED
-        else:
-            # Got a parameter spec
-            # Is there one already, waiting for a type,
-            # and caller has force_type_spec set to True:
-            if self.curr_parm_match is not None:
-                (parm_name_prev, _parm_desc_prev) = self.curr_parm_match
-                if self.force_type_spec:
-                    msg = "Parameter being defined at line %s, but parameter %s still needs a type." %\
-                            (line_num,parm_name_prev)
-                    # Throw error or print warning:
-                    self.error_notify(msg, NoTypeError)
-                self.finish_parameter_spec()
-                
-            # The regexp groups look like this:
-            #    ('       ', ' tableName', ' name of new table')
-            # Keep the indentation before the parameter name:
-            frags = parm_match.groups()
-            indent    = frags[0]
-            parm_name = frags[1].strip()
-            parm_desc = frags[2].strip()
+        self.open_parameter_spec(parm_match, line_num)
+        return HandleRes.HANDLED
+
+    #-------------------------
+    # open_parameter_spec 
+    #--------------
+    
+    def open_parameter_spec(self, parm_match, line_num):
+        '''
+        Start collecting a parameter spec, finishing
+        any parameter spec that is still open.
+        
+        @param parm_match: match of the param_pat
+        @type parm_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        '''
+        # Is there one already, waiting for a type,
+        # and caller has force_type_spec set to True:
+        if self.curr_parm_match is not None:
+            parm_name_prev = self.curr_parm_match.name
+            if self.force_type_spec:
+                msg = "Parameter being defined at line %s, but parameter %s still needs a type." %\
+                        (line_num,parm_name_prev)
+                # Throw error or print warning:
+                self.error_notify(msg, NoTypeError, line_num=line_num, parm_name=parm_name_prev)
+            # A missing type was just reported, if needed:
+            self.finish_parameter_spec(line_no=line_num, report=False)
             
-            self.curr_parm_match = (parm_name, parm_desc)
-            self.out_fd.write(indent + '<b>' + parm_name + '</b> ')
-            return HandleRes.HANDLED
+        # The regexp groups look like this:
+        #    ('       ', ' tableName', ' name of new table')
+        # Keep the indentation before the parameter name:
+        frags = parm_match.groups()
+        indent    = frags[0]
+        parm_name = frags[1].strip()
+        parm_desc = frags[2].strip()
+        
+        self.curr_parm_match = OpenSpec(parm_name, parm_desc)
+        self.out_fd.write(indent + self.markup.param_prefix + parm_name + self.markup.param_suffix)
+        self.count_directive('param')
 
     #-------------------------
     # check_type_spec 
@@ -448,50 +1132,79 @@ class PdocPrep(object):
         
         type_match = self.parseInfo.type_pat.search(line)
         
-        # For convenience and good error messages:
-        if self.curr_parm_match is not None:
-            (parm_name, parm_desc) = self.curr_parm_match
-            
-        # Have a prior parameter spec, but no type spec?
-        if type_match is None and self.curr_parm_match is not None:
-            # Prev line was a parameter spec, but this line is
-            # not a type spec. That's fine, b/c parameter specs
-            # can be multiline.
+        # Not a type spec. If a parameter spec is open, that's 
+        # fine, b/c parameter specs can be multiline:
+        if type_match is None:
             return HandleRes.NOT_HANDLED
         
         # Have a type match but not a prior parameter spec?
-        elif type_match is not None and self.curr_parm_match is None:
-            msg = "Type declaration without prior parameter; line %s" % line_num
-            self.error_notify(msg, NoParamError)
+        if self.curr_parm_match is None:
+            self.report_orphan_type(type_match, line_num)
             return HandleRes.NOT_HANDLED
         
         # Almost home: 
-        elif type_match is not None and self.curr_parm_match is not None:
-            # Had a prior ":param" line, and now a type.  
-            # Ensure that the type is about the same parameter:
-            
-            # Have groups like this:
-            #    ('       ', ' tableName', ' String')
-            # Keep the indentation before the parameter name:
-            frags = type_match.groups()
-            _indent    = frags[0]
-            type_name = frags[1].strip()
-            type_desc = frags[2].strip()
-
-            if type_name != parm_name:
-                # Have a parm spec followed by a type spec,
-                # but the type spec doesn't match the parameter:
-                msg = "Type %s, but preceding param %s; line %s.\n" %\
-                        (type_name, parm_name, line_num)
-                self.error_notify(msg, ParamTypeMismatch)
-                return HandleRes.NOT_HANDLED
-            
-            # Finally...all is good:
-            self.out_fd.write('(<b></i>' + type_desc + '</i></b>): ')
-            self.finish_parameter_spec(type_found=True, line_no=line_num)
+        if self.close_parameter_type(type_match, line_num):
             return HandleRes.HANDLED
-        # Not a type spec, and no prior param spec:
         return HandleRes.NOT_HANDLED
+
+    #-------------------------
+    # report_orphan_type 
+    #--------------
+    
+    def report_orphan_type(self, type_match, line_num):
+        '''
+        Report a type spec that follows no parameter spec.
+        
+        @param type_match: match of the type_pat
+        @type type_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        @raises NoParamError
+        '''
+        msg = "Type declaration without prior parameter; line %s" % line_num
+        self.error_notify(msg, NoParamError, line_num=line_num, parm_name=type_match.group(2).strip())
+
+    #-------------------------
+    # close_parameter_type 
+    #--------------
+    
+    def close_parameter_type(self, type_match, line_num):
+        '''
+        Given a type spec while a parameter spec is open,
+        output the type and finish the parameter spec, if
+        the type is about the same parameter. Else report
+        the mismatch.
+        
+        @param type_match: match of the type_pat
+        @type type_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        @return: True if the parameter spec was finished, else False
+        @rtype bool
+        @raises ParamTypeMismatch
+        '''
+        parm_name = self.curr_parm_match.name
+        
+        # Have groups like this:
+        #    ('       ', ' tableName', ' String')
+        # Keep the indentation before the parameter name:
+        frags = type_match.groups()
+        type_name = frags[1].strip()
+        type_desc = frags[2].strip()
+
+        if type_name != parm_name:
+            # Have a parm spec followed by a type spec,
+            # but the type spec doesn't match the parameter:
+            msg = "Type %s, but preceding param %s; line %s.\n" %\
+                    (type_name, parm_name, line_num)
+            self.error_notify(msg, ParamTypeMismatch, line_num=line_num, parm_name=parm_name)
+            return False
+        
+        # Finally...all is good:
+        self.out_fd.write(self.markup.type_prefix + self.link_types(type_desc) + self.markup.type_suffix)
+        self.count_directive('type')
+        self.finish_parameter_spec(type_found=True, line_no=line_num)
+        return True
         
     #-------------------------
     # check_return_spec 
@@ -512,12 +1225,27 @@ class PdocPrep(object):
         return_match = self.parseInfo.return_pat.search(line)
         if return_match is None:
             return HandleRes.NOT_HANDLED
+        self.open_return_spec(return_match, line_num)
+        return HandleRes.HANDLED
+
+    #-------------------------
+    # open_return_spec 
+    #--------------
     
+    def open_return_spec(self, return_match, line_num):
+        '''
+        Start collecting a return spec, finishing any 
+        open parameter spec.
+        
+        @param return_match: match of the return_pat
+        @type return_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        @raises DoubleReturnError
+        '''
         # Got a 'return: ' or 'return ' or 'returns ' or 'returns ' spec
-        # If there is an open parameter spec, finish it:
-
         # Finish any possibly open parameter spec:        
-        self.finish_parameter_spec()
+        self.finish_parameter_spec(line_no=line_num)
 
         # Is there is (an open) return spec already, that's bad, only one allowed.
         # We don't check for already completed prior return specs. We should.
@@ -525,8 +1253,8 @@ class PdocPrep(object):
         if self.curr_return_desc is not None:
             msg = "Missing '%srtype' in previous '%sreturn' spec, or two '%sreturn' specs in same docstr (line %s)" % \
                         (self.delimiter_char, self.delimiter_char, self.delimiter_char, line_num)
-            self.error_notify(msg, DoubleReturnError)
-            self.finish_return_spec()
+            self.error_notify(msg, DoubleReturnError, line_num=line_num)
+            self.finish_return_spec(line_no=line_num, report=False)
             self.curr_return_desc = None
 
         # Have groups like this:
@@ -534,10 +1262,10 @@ class PdocPrep(object):
         # Keep the indentation before the parameter name:
         frags = return_match.groups()
         indent    = frags[0]
-        self.curr_return_desc = frags[1].strip()
+        self.curr_return_desc = OpenSpec(None, frags[1].strip())
 
-        self.out_fd.write(indent + '<b>returns:</b> ')
-        return HandleRes.HANDLED
+        self.out_fd.write(indent + self.markup.returns_prefix)
+        self.count_directive('return')
     
     #-------------------------
     # check_rtype_spec 
@@ -559,22 +1287,37 @@ class PdocPrep(object):
         rtype_match = self.parseInfo.rtype_pat.search(line)
         if rtype_match is None:
             return HandleRes.NOT_HANDLED
-        else:
-            # Got an 'rtype:' spec
-            
-            # If there is an open parameter or return spec, finish it:
-            self.finish_parameter_spec()
-            self.finish_return_spec(rtype_found=True, line_no=line_num)
-            
-            # Have groups like this:
-            #    ('       ', '{int | str}')
-            # Keep the indentation before the parameter name:
-            frags = rtype_match.groups()
-            indent     = frags[0]
-            rtype_desc = frags[1].strip()
-            
-            self.out_fd.write(indent + '<b>return type:</b> ' + rtype_desc + self.parseInfo.line_sep)
-            return HandleRes.HANDLED
+        self.write_rtype_spec(rtype_match, line_num)
+        return HandleRes.HANDLED
+
+    #-------------------------
+    # write_rtype_spec 
+    #--------------
+    
+    def write_rtype_spec(self, rtype_match, line_num):
+        '''
+        Output an rtype spec, finishing any open parameter
+        or return spec.
+        
+        @param rtype_match: match of the rtype_pat
+        @type rtype_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        '''
+        # If there is an open parameter or return spec, finish it:
+        self.finish_parameter_spec(line_no=line_num)
+        self.finish_return_spec(rtype_found=True, line_no=line_num)
+        
+        # Have groups like this:
+        #    ('       ', '{int | str}')
+        # Keep the indentation before the parameter name:
+        frags = rtype_match.groups()
+        indent     = frags[0]
+        rtype_desc = frags[1].strip()
+        
+        self.out_fd.write(indent + self.markup.rtype_prefix + self.link_types(rtype_desc) + 
+                          self.markup.rtype_suffix + self.parseInfo.line_sep)
+        self.count_directive('rtype')
 
     #-------------------------
     # check_raises_spec 
@@ -596,32 +1339,48 @@ class PdocPrep(object):
         raises_match = self.parseInfo.raises_pat.search(line)
         if raises_match is None:
             return HandleRes.NOT_HANDLED
-        else:
-            # Got an 'rtype:' spec
-            
-            # If there is an open parameter spec, finish it:
-            self.finish_parameter_spec()
-            
-            # Have groups like this:
-            #    ('       ', 'ValueError')
-            # Keep the indentation before the parameter name:
-            frags = raises_match.groups()
-            indent    = frags[0]
-            raises_desc = frags[1].strip()
-            
-            self.out_fd.write(indent + '<b>raises:</b> ' + raises_desc + self.parseInfo.line_sep)
-            return HandleRes.HANDLED
+        self.write_raises_spec(raises_match, line_num)
+        return HandleRes.HANDLED
+
+    #-------------------------
+    # write_raises_spec 
+    #--------------
+    
+    def write_raises_spec(self, raises_match, line_num):
+        '''
+        Output a raises spec, finishing any open 
+        parameter spec.
+        
+        @param raises_match: match of the raises_pat
+        @type raises_match: re.Match
+        @param line_num: line number in original file. Used for error msgs.
+        @type line_num: int
+        '''
+        # If there is an open parameter spec, finish it:
+        self.finish_parameter_spec(line_no=line_num)
+        
+        # Have groups like this:
+        #    ('       ', 'ValueError')
+        # Keep the indentation before the parameter name:
+        frags = raises_match.groups()
+        indent    = frags[0]
+        raises_desc = frags[1].strip()
+        
+        self.out_fd.write(indent + self.markup.raises_prefix + raises_desc + 
+                          self.markup.raises_suffix + self.parseInfo.line_sep)
+        self.count_directive('raises')
     
     #-------------------------
     # finish_parameter_spec 
     #--------------
     
-    def finish_parameter_spec(self, type_found=False, line_no=None):
+    def finish_parameter_spec(self, type_found=False, line_no=None, report=True):
         '''
         If a parameter spec is being constructed, finish it. If
         no parameter spec is being constructed, do nothing. If
         type_found is False, and client has indicated force_type_spec
-        when instantiating this object, an error is raised.
+        when instantiating this object, an error is raised, unless
+        report is False.
         
         Parameters specs are closed adding a line separator if
         non is already part of the param_desc part of curr_parm_match.  
@@ -631,18 +1390,23 @@ class PdocPrep(object):
         @param line_no: line in which parameter spec was found. Used
             in error messages.
         @type line_no: int
+        @param report: whether to report a missing type. False where 
+            the caller has already reported it
+        @type report: bool
         @raised NoTypeError
         '''
         
         if self.curr_parm_match is None:
             return
         
-        (parm_name, parm_desc) = self.curr_parm_match
+        parm_name = self.curr_parm_match.name
+        parm_desc = self.curr_parm_match.desc()
         # We are to enforce type specs then ensure that
         # we have a type:
-        if self.force_type_spec and not type_found:
+        if self.force_type_spec and not type_found and report:
             self.error_notify('No type spec found for parameter %s at line %s' %\
-                              (parm_name, line_no), NoTypeError
+                              (parm_name, line_no), NoTypeError,
+                              line_num=line_no, parm_name=parm_name
                               )
         self.out_fd.write(parm_desc)
         if not parm_desc.endswith(self.parseInfo.line_sep):
@@ -658,16 +1422,14 @@ class PdocPrep(object):
         '''
         Assuming that we are currently processing a
         parameter spec, append line to the parameter description.
-        We assume that self.curr_parm_match is a tuple:
-        (parm_name, parm_desc).
+        We assume that self.curr_parm_match is an OpenSpec.
         
         Surrounding white space in line is removed.
         
         @param line: text to add
         @type line: str
         '''
-        (_parm_name, parm_desc) = self.curr_parm_match
-        self.curr_parm_match = (_parm_name, parm_desc + ' ' + line.strip())
+        self.curr_parm_match.append(line.strip())
 
     #-------------------------
     # append_to_return_desc 
@@ -677,21 +1439,21 @@ class PdocPrep(object):
         '''
         Assuming that we are currently processing a
         return spec, append line to the return description.
-        We assume that self.curr_return_desc is a string!
+        We assume that self.curr_return_desc is an OpenSpec.
         
         Surrounding white space in line is removed.
         
         @param line: text to add
         @type line: str
         '''
-        self.curr_return_desc += ' ' + line.strip()
+        self.curr_return_desc.append(line.strip())
      
 
     #-------------------------
     # finish_return_spec 
     #--------------
     
-    def finish_return_spec(self, rtype_found=False, line_no=None):
+    def finish_return_spec(self, rtype_found=False, line_no=None, report=True):
         '''
         If a return spec is being constructed, finish it. If
         no return spec is being constructed, do nothing.
@@ -704,6 +1466,9 @@ class PdocPrep(object):
         @param line_no: line in which parameter spec was found. Used
             in error messages.
         @type line_no: int
+        @param report: whether to report a missing rtype. False where 
+            the caller reports it later, or has already
+        @type report: bool
         '''
         
         if self.curr_return_desc is None:
@@ -711,17 +1476,60 @@ class PdocPrep(object):
         
         # We are to enforce type specs then ensure that
         # we have an rtype:
-        if self.force_type_spec and not rtype_found:
+        if self.force_type_spec and not rtype_found and report:
             self.error_notify('No return type (rtype spec) found by line %s' %\
-                              (line_no), NoTypeError
+                              (line_no), NoTypeError,
+                              line_num=line_no
                               )
         
-        self.out_fd.write(self.curr_return_desc)
-        if not self.curr_return_desc.endswith(self.parseInfo.line_sep):
+        return_desc = self.curr_return_desc.desc() + self.markup.returns_suffix
+        self.out_fd.write(return_desc)
+        if not return_desc.endswith(self.parseInfo.line_sep):
             self.out_fd.write(self.parseInfo.line_sep)
 
         self.curr_return_desc = None
 
+    #-------------------------
+    # link_types 
+    #--------------
+    
+    def link_types(self, type_desc):
+        '''
+        Turn each name in a type spec that the symbol index
+        knows into a link to its documentation. Costs one dict
+        lookup per name. Without a symbol index, type_desc is 
+        returned unchanged.
+        
+        @param type_desc: type spec, such as '{int | MyTable}'
+        @type type_desc: str
+        @return: the type spec with links
+        @rtype str
+        '''
+        if self.symbol_index is None:
+            return type_desc
+        return self.parseInfo.type_name_pat.sub(self.link_type_name, type_desc)
+
+    #-------------------------
+    # link_type_name 
+    #--------------
+    
+    def link_type_name(self, name_match):
+        '''
+        Replacement for one name that link_types() found
+        in a type spec: a link to the name's documentation, 
+        or the name itself if the symbol index lacks it.
+        
+        @param name_match: match of a name in the type spec
+        @type name_match: re.Match
+        @return: the link, or the name
+        @rtype str
+        '''
+        name = name_match.group(0)
+        href = self.symbol_index.lookup(name, self.module_rel_path)
+        if href is None:
+            return name
+        return self.markup.link(href, name)
+
     #-------------------------
     # is_blank_line 
     #--------------
@@ -730,6 +1538,14 @@ class PdocPrep(object):
         
         return self.parseInfo.line_blank_pat.search(line) is not None        
 
+    #-------------------------
+    # indent_of 
+    #--------------
+    
+    def indent_of(self, line):
+        
+        return self.parseInfo.indent_pat.search(line).end()
+
 
     #-------------------------
     # write_out 
@@ -737,32 +1553,177 @@ class PdocPrep(object):
                     
     def write_out(self, txt, nl=True):
         self.out_fd.write(txt + '\n' if nl else '')
+
+    #-------------------------
+    # count_directive 
+    #--------------
+    
+    def count_directive(self, kind):
+        
+        self.directive_counts[kind] = self.directive_counts.get(kind, 0) + 1
             
     #-------------------------
     # error_notify 
     #--------------
     
-    def error_notify(self, msg, error_inst):
+    def error_notify(self, msg, error_inst, line_num=None, parm_name=None):
         '''
-        Handles either raising error, printing
-        warning to stderr, or staying silent. All
-        controlled by parameters to constructor.
+        Handles either recording the irregularity in a diagnostics
+        collector, raising error, printing warning to stderr, or 
+        staying silent. All controlled by parameters to constructor.
         
         @param msg: msg to use for error msg or warning
         @type msg: str
         @param error_inst: instance of error to raise. Only needed
             if raise_errors is True in the constructor call.
         @type error_inst: Exception
+        @param line_num: zero-based number of the offending line, if known
+        @type line_num: {None | int}
+        @param parm_name: parameter involved, if any
+        @type parm_name: {None | str}
         '''
-        if self.raise_errors:
+        # Raised errors are counted by whoever catches them:
+        if self.metrics is not None and (self.diagnostics is not None or not self.raise_errors):
+            self.metrics.inc('errors_total', error=error_inst.__name__)
+        if self.diagnostics is not None:
+            self.diagnostics.record(self.file_name,
+                                    None if line_num is None else line_num + 1,
+                                    error_inst,
+                                    msg,
+                                    parm_name=parm_name)
+        elif self.raise_errors:
             raise error_inst(msg)
         elif self.warnings:
             sys.stderr.write("****Warning: " + msg + '\n')
         else:
             # No notification
             pass
+
+    # Transition table of the state machine engine, keyed
+    # by current state and line class:
+    TRANSITIONS = {}
+    for _state in (ParseState.IN_DOC, ParseState.IN_PARAM, ParseState.IN_RETURN):
+        TRANSITIONS.update({(_state, 'blank')  : on_blank,
+                            (_state, 'header') : on_header,
+                            (_state, 'param')  : on_param,
+                            (_state, 'return') : on_return,
+                            (_state, 'rtype')  : on_rtype,
+                            (_state, 'raises') : on_raises
+                            })
+    del _state
+    TRANSITIONS.update({(ParseState.IN_DOC,    'type') : on_type_in_doc,
+                        (ParseState.IN_PARAM,  'type') : on_type_in_param,
+                        (ParseState.IN_RETURN, 'type') : on_type_in_return,
+                        (ParseState.IN_DOC,    'text') : on_text_in_doc,
+                        (ParseState.IN_PARAM,  'text') : on_text_in_param,
+                        (ParseState.IN_RETURN, 'text') : on_text_in_return
+                        })
     
-        
+
+# ---------------------------------- Library API -----------------
+
+#-------------------------
+# transform_text 
+#--------------
+
+def transform_text(text,
+                   delimiter_char='@',
+                   force_type_spec=False,
+                   section_styles=('google', 'numpy'),
+                   file_name=None,
+                   diagnostics=None,
+                   html=False,
+                   symbol_index=None,
+                   markup=None,
+                   source_map=None):
+    '''
+    Transform the docstring directives in the source text 
+    of a module, or, with html set, in the docstrings of a
+    pdoc-generated HTML page.
+    
+    @param text: module source, or pdoc HTML
+    @type text: str
+    @param delimiter_char: '@' or ':'
+    @type delimiter_char: str
+    @param force_type_spec: if True, insist on types for parameters and returns
+    @type force_type_spec: bool
+    @param section_styles: section-based docstring styles to recognize
+    @type section_styles: [str]
+    @param file_name: name of the text's origin; used in diagnostics
+    @type file_name: {None | str}
+    @param diagnostics: if provided, irregularities are recorded there instead of raised
+    @type diagnostics: {None | DiagnosticsCollector}
+    @param html: whether text is pdoc HTML rather than module source
+    @type html: bool
+    @param symbol_index: if provided, known names in type specs become links
+    @type symbol_index: {None | SymbolIndex}
+    @param markup: markup for the directives: a Markup instance, a key of
+        MARKUP_FORMATS, or a template file. Default: HTML
+    @type markup: {None | str | Markup}
+    @param source_map: if provided, the original line of each output line
+        is appended there. Module source only. Default: None
+    @type source_map: {None | SourceMap}
+    @return: the transformed text
+    @rtype str
+    @raise NoTypeError, NoParamError, ParamTypeMismatch: on irregular 
+        docstrings, unless a diagnostics collector is given
+    @raise ValueError: if a source map is requested for HTML
+    '''
+    prep_kwargs = {}
+    if source_map is not None:
+        if html:
+            raise ValueError("Source maps are only kept for module source, not for HTML.")
+        prep_kwargs['source_map'] = source_map
+    # PdocHtmlPrep builds on PdocPrep, so its module imports this one:
+    from .htmlprep import PdocHtmlPrep
+    prep_class = PdocHtmlPrep if html else PdocPrep
+    out_fd = StringIO()
+    prep_class(StringIO(text),
+               out_fd=out_fd,
+               delimiter_char=delimiter_char,
+               force_type_spec=force_type_spec,
+               section_styles=section_styles,
+               file_name=file_name,
+               diagnostics=diagnostics,
+               symbol_index=symbol_index,
+               markup=markup,
+               **prep_kwargs
+               )
+    return out_fd.getvalue()
+
+#-------------------------
+# transform_file 
+#--------------
+
+def transform_file(src_path, dst_path=None, **transform_kwargs):
+    '''
+    Transform the file at src_path, as in transform_text(). 
+    
+    @param src_path: module, or pdoc HTML page to transform
+    @type src_path: str
+    @param dst_path: if provided, the result is written there
+    @type dst_path: {None | str}
+    @param transform_kwargs: keyword arguments for transform_text()
+    @type transform_kwargs: {str : Any}
+    @return: the transformed text
+    @rtype str
+    '''
+    # Pages are UTF-8, as pdoc writes them; modules
+    # are in the encoding they declare:
+    if transform_kwargs.get('html', False):
+        with open(src_path, 'r', encoding='utf-8') as in_fd:
+            text = in_fd.read()
+        encoding = 'utf-8'
+    else:
+        (text, encoding) = read_source(src_path)
+    transform_kwargs.setdefault('file_name', src_path)
+    res = transform_text(text, **transform_kwargs)
+    if dst_path is not None:
+        with open_source_out(dst_path, encoding, 
+                             make_markup(transform_kwargs.get('markup')), src_path) as out_fd:
+            out_fd.write(res)
+    return res
+
 if __name__ == '__main__':
 
     # A couple of test cases, though test_pdoc_prep.py unittests
@@ -794,30 +1755,120 @@ if __name__ == '__main__':
     parser.add_argument('-t', '--typecheck',
                         help="If present, require a 'type' spec for each parameter, and an 'rtype' for each return. Default: False",
                         default=False)
+    parser.add_argument('-s', '--sections',
+                        help="Comma-separated section-based docstring styles to recognize besides directives;\n" +\
+                             "any of 'google' and 'numpy'. Empty string for none. Default: 'google,numpy'",
+                        default='google,numpy')
+    parser.add_argument('--html',
+                        action='store_true',
+                        help="Input is HTML that pdoc produced from an untouched module,\n" +\
+                             "rather than Python source. Default: False",
+                        default=False)
+    parser.add_argument('--diagnostics-json',
+                        help="Collect all irregularities instead of stopping at the first one,\n" +\
+                             "and write them as JSON to this file; '-' for stderr. Default: None",
+                        default=None)
+    parser.add_argument('--max-diagnostics',
+                        type=int,
+                        help="Most irregularities to keep in the collected diagnostics. Default: no limit",
+                        default=None)
+    parser.add_argument('--fail-at-end',
+                        action='store_true',
+                        help="Collect all irregularities, and exit with status 1 after\n" +\
+                             "processing if there were any. Default: False",
+                        default=False)
+    parser.add_argument('--markup',
+                        help="Markup for the directives: one of %s, or a JSON file\n" % sorted(MARKUP_FORMATS.keys()) +\
+                             "of templates. Default: 'html'",
+                        default='html')
+    parser.add_argument('--source-map',
+                        help="Write the original line of each output line as JSON to this file.\n" +\
+                             "Not with --html. Default: None",
+                        default=None)
+
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help="Write cProfile stats of the parse to <outfile>.parse.prof[.txt].\n" +\
+                             "Without --outfile, next to the input file, or in cwd. Default: False",
+                        default=False)
+    parser.add_argument('--trace-memory',
+                        action='store_true',
+                        help="Write tracemalloc top allocations of the parse to <outfile>.parse.mem.txt.\n" +\
+                             "Default: False",
+                        default=False)
 
     args = parser.parse_args();
+    if args.html and args.source_map is not None:
+        parser.error("Option --source-map cannot be combined with --html.")
     
-    try:
-        if args.file is None:
-            in_fd = sys.stdin
-        else:
-            in_fd = open(args.file, 'r')
-            
-        if args.outfile is None:
-            out_fd = sys.stdout
+    profiler = None
+    if args.profile or args.trace_memory:
+        if args.outfile is not None:
+            profile_base = args.outfile
+        elif args.file is not None:
+            profile_base = args.file
         else:
-            out_fd = open(args.outfile, 'w')
-            
+            profile_base = os.path.join(os.getcwd(), 'pdoc_prep_stdin')
+        profiler = PhaseProfiler(profile_base, profile=args.profile, trace_memory=args.trace_memory)
+    
+    diagnostics = None
+    if args.diagnostics_json is not None or args.fail_at_end:
+        diagnostics = DiagnosticsCollector(max_total=args.max_diagnostics,
+                                           fail_at_end=args.fail_at_end)
+    
+    # Modules are decoded in, and written back in, the
+    # encoding they declare. HTML pages are UTF-8:
+    if args.file is None:
+        source = sys.stdin.buffer.read()
+    else:
+        with open(args.file, 'rb') as source_fd:
+            source = source_fd.read()
+    encoding = 'utf-8' if args.html else source_encoding(source, args.file)
+    in_fd = StringIO(source.decode(encoding))
+    
+    try:
+        markup = make_markup(args.markup)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    # The output, on stdout as well, is in the encoding of the input:
+    with open_source_out(args.outfile, encoding, markup, args.file) as out_fd:
         
-        PdocPrep(in_fd=in_fd, 
-                 out_fd=out_fd,
-                 delimiter_char=args.delimiter,
-                 force_type_spec=args.typecheck)
-    finally:
-        if in_fd != sys.stdin:
-            in_fd.close()
-        if out_fd != sys.stdout:
-            out_fd.close()
+        section_styles = [style.strip() for style in args.sections.split(',') if style.strip()]
+        if args.html:
+            from .htmlprep import PdocHtmlPrep
+            PdocHtmlPrep(in_fd=in_fd,
+                         out_fd=out_fd,
+                         delimiter_char=args.delimiter,
+                         force_type_spec=args.typecheck,
+                         section_styles=section_styles,
+                         file_name=args.file,
+                         diagnostics=diagnostics,
+                         profiler=profiler,
+                         markup=markup)
+        else:
+            source_map = None if args.source_map is None else SourceMap()
+            PdocPrep(in_fd=in_fd, 
+                     out_fd=out_fd,
+                     delimiter_char=args.delimiter,
+                     force_type_spec=args.typecheck,
+                     section_styles=section_styles,
+                     file_name=args.file,
+                     diagnostics=diagnostics,
+                     profiler=profiler,
+                     markup=markup,
+                     source_map=source_map)
+            if source_map is not None:
+                source_map.write(args.source_map, source=args.file)
+
+    if diagnostics is not None:
+        if args.diagnostics_json is not None:
+            diagnostics.write_json(args.diagnostics_json)
+        try:
+            diagnostics.check()
+        except DiagnosticsError as e:
+            sys.stderr.write("%s\n" % e)
+            sys.exit(1)
     
     
     
\ No newline at end of file
@@ -0,0 +1,120 @@
+'''
+Created on Oct 18, 2026
+
+cProfile stats and tracemalloc top allocations for
+the phases of a pdoc_prep or pdoc_run run.
+
+@author: Andreas Paepcke
+'''
+from contextlib import contextmanager
+import cProfile
+import os
+import pstats
+import tracemalloc
+
+# ---------------------------------- Profiling -----------------
+
+class PhaseProfiler(object):
+    '''
+    Captures cProfile stats and/or tracemalloc top allocations
+    for named phases of a run, such as 'parse'. For each phase
+    the results go to files named after a base path, usually
+    the output file:
+    <pre>
+        <out_base>.<phase>.prof       cProfile stats, for pstats or snakeviz
+        <out_base>.<phase>.prof.txt   the same, as readable text
+        <out_base>.<phase>.mem.txt    top allocations and peak memory
+    </pre>
+    '''
+    
+    def __init__(self, out_base, profile=False, trace_memory=False, top_n=30):
+        '''
+        @param out_base: path to which phase and file extension are appended
+        @type out_base: str
+        @param profile: whether to capture cProfile stats
+        @type profile: bool
+        @param trace_memory: whether to capture tracemalloc allocations
+        @type trace_memory: bool
+        @param top_n: number of functions/allocation sites to list in text files
+        @type top_n: int
+        '''
+        self.out_base     = out_base
+        self.profile      = profile
+        self.trace_memory = trace_memory
+        self.top_n        = top_n
+        self.files_written = []
+
+    #-------------------------
+    # phase 
+    #--------------
+    
+    @contextmanager
+    def phase(self, phase_name):
+        '''
+        Context manager that profiles the enclosed code
+        as the phase of the given name.
+        
+        @param phase_name: name of the phase; becomes part of the file names
+        @type phase_name: str
+        '''
+        profiler = None
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        if self.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            # Take the snapshot before writing the profile
+            # allocates memory of its own:
+            if started_tracing:
+                snapshot = tracemalloc.take_snapshot()
+                (_curr_size, peak_size) = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.write_memory(phase_name, snapshot, peak_size)
+            if profiler is not None:
+                self.write_profile(phase_name, profiler)
+
+    #-------------------------
+    # write_profile 
+    #--------------
+    
+    def write_profile(self, phase_name, profiler):
+        
+        prof_path = '%s.%s.prof' % (self.out_base, phase_name)
+        self.ensure_out_dir()
+        profiler.dump_stats(prof_path)
+        with open(prof_path + '.txt', 'w') as out_fd:
+            stats = pstats.Stats(profiler, stream=out_fd)
+            stats.sort_stats('cumulative').print_stats(self.top_n)
+        self.files_written.extend([prof_path, prof_path + '.txt'])
+
+    #-------------------------
+    # write_memory 
+    #--------------
+    
+    def write_memory(self, phase_name, snapshot, peak_size):
+        
+        mem_path = '%s.%s.mem.txt' % (self.out_base, phase_name)
+        self.ensure_out_dir()
+        with open(mem_path, 'w') as out_fd:
+            out_fd.write('Peak traced memory: %s bytes\n' % peak_size)
+            out_fd.write('Top %s allocation sites:\n' % self.top_n)
+            for stat in snapshot.statistics('lineno')[0:self.top_n]:
+                out_fd.write('%s\n' % stat)
+        self.files_written.append(mem_path)
+
+    #-------------------------
+    # ensure_out_dir 
+    #--------------
+    
+    def ensure_out_dir(self):
+        
+        out_dir = os.path.dirname(self.out_base)
+        if len(out_dir) > 0:
+            os.makedirs(out_dir, exist_ok=True)
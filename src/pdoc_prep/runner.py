@@ -0,0 +1,1908 @@
+'''
+Created on Oct 18, 2026
+
+PdocRunner, which preprocesses modules with PdocPrep, has
+pdoc document them, and puts the HTML where pdoc would have
+put it for the original modules. Also the build journal that
+lets an interrupted run resume, and render_module() and 
+render_package() for build systems.
+
+@author: Andreas Paepcke
+'''
+import ast
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import hashlib
+import importlib.abc
+import importlib.util
+from io import StringIO
+import json
+import os
+import re
+import shutil
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from .batch import BatchPrep
+from .chunked import ChunkedPrep
+from .encoding import source_encoding, open_source_out
+from .grammars import make_section_grammars
+from .htmlprep import PdocHtmlPrep
+from .markup import make_markup
+from .pdoc_prep import ParseInfo, PdocPrep
+from .profiling import PhaseProfiler
+from .sharding import SHARD_MANIFEST_NAME, parse_shard_spec, shard_keys, shard_of, modules_digest
+from .sourcemap import SourceMap
+from .store import PageWriter, PageStore
+from .symbols import SymbolIndex
+
+# ---------------------------------- Exceptions -----------------
+
+class PdocError(Exception):
+    pass
+
+class PdocTimeout(PdocError):
+    pass
+
+# ---------------------------------- Build Journal -----------------
+
+# Journal of a batch run, kept in the (first) HTML directory:
+JOURNAL_NAME = 'pdoc_run_journal.jsonl'
+
+#-------------------------
+# host_tag 
+#--------------
+
+def host_tag():
+    '''
+    Short tag of this host, or of this container: a digest
+    of the hostname and the kernel's boot id, where there is
+    one. pids are only meaningful among processes that share
+    a tag.
+    
+    @return: eight hex digits
+    @rtype str
+    '''
+    try:
+        with open('/proc/sys/kernel/random/boot_id', 'r') as in_fd:
+            boot_id = in_fd.read().strip()
+    except OSError:
+        boot_id = ''
+    return hashlib.sha1((socket.gethostname() + '/' + boot_id).encode('utf-8')).hexdigest()[:8]
+
+# Temp modules are named tmp_pdoc_prep_h<host tag>_<pid>_<random>.py. 
+# Older releases left out the host tag, and before that the pid:
+TMP_FILE_PREFIX = 'tmp_pdoc_prep_'
+TMP_FILE_PAT    = re.compile(r'^tmp_pdoc_prep_(?:h([0-9a-f]{8})_)?(?:(\d+)_)?\w+\.py$')
+HOST_TAG        = host_tag()
+# Temp modules of other hosts, or without host tag and pid, count 
+# as orphaned once they are this many seconds old:
+ORPHAN_AGE = 3600
+
+class BuildJournal(object):
+    '''
+    Journal of the modules that a batch run completed, one
+    JSON line per module, holding the digests of the module's
+    source and of its page. Each line is flushed as soon as 
+    the page is in place, so the journal survives the run 
+    being killed.
+    
+    The first line holds a digest of the run's options. A
+    resumed run with different options starts over.
+    
+    Safe to share between threads.
+    '''
+    
+    def __init__(self, path, options_digest, resume=False):
+        '''
+        @param path: journal file
+        @type path: str
+        @param options_digest: digest of the options that shape the pages
+        @type options_digest: str
+        @param resume: if True, keep the entries of an existing journal
+            written with the same options. Else start a new journal.
+            Default: False
+        @type resume: bool
+        '''
+        self.path    = path
+        self.entries = {}
+        self.lock    = threading.Lock()
+        if resume:
+            self.entries = self.load(options_digest)
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume and self.entries is not None:
+            self.out_fd = open(path, 'a')
+        else:
+            self.entries = {}
+            self.out_fd  = open(path, 'w')
+            self.write_line({'options_digest' : options_digest})
+
+    #-------------------------
+    # load 
+    #--------------
+    
+    def load(self, options_digest):
+        '''
+        Read the entries of an existing journal. A last line
+        that a killed run left incomplete is ignored.
+        
+        @param options_digest: digest that the journal must carry
+        @type options_digest: str
+        @return: entries by module path, or None if there is no
+            journal, or one for other options
+        @rtype {None | {str : {str : str}}}
+        '''
+        if not os.path.exists(self.path):
+            return None
+        entries = {}
+        with open(self.path, 'r') as in_fd:
+            lines = in_fd.read().split('\n')
+        try:
+            if json.loads(lines[0]).get('options_digest') != options_digest:
+                return None
+        except ValueError:
+            return None
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['module']] = entry
+        return entries
+
+    #-------------------------
+    # is_done 
+    #--------------
+    
+    def is_done(self, python_module, source_digest):
+        '''
+        Whether a module was completed, is unchanged since,
+        and its page is still the one that was written.
+        
+        @param python_module: absolute path of the module
+        @type python_module: str
+        @param source_digest: current digest of the module's source
+        @type source_digest: str
+        @return: True if the module need not be documented again
+        @rtype bool
+        '''
+        entry = self.entries.get(python_module)
+        return entry is not None and \
+            entry['source_digest'] == source_digest and \
+            PageWriter().file_digest(entry['page']) == entry['page_digest']
+
+    #-------------------------
+    # record 
+    #--------------
+    
+    def record(self, python_module, source_digest, page):
+        '''
+        Journal a completed module.
+        
+        @param python_module: absolute path of the module
+        @type python_module: str
+        @param source_digest: digest of the module's source
+        @type source_digest: str
+        @param page: path of the module's finished page
+        @type page: str
+        '''
+        entry = {'module'        : python_module,
+                 'source_digest' : source_digest,
+                 'page'          : page,
+                 'page_digest'   : PageWriter().file_digest(page)
+                 }
+        with self.lock:
+            self.entries[python_module] = entry
+            self.write_line(entry)
+
+    #-------------------------
+    # write_line 
+    #--------------
+    
+    def write_line(self, record):
+        
+        self.out_fd.write(json.dumps(record) + '\n')
+        self.out_fd.flush()
+
+    #-------------------------
+    # close 
+    #--------------
+    
+    def close(self):
+        
+        self.out_fd.close()
+
+#-------------------------
+# remove_orphaned_tmp_files 
+#--------------
+
+def remove_orphaned_tmp_files(directories):
+    '''
+    Remove temp modules that earlier runs left behind when they
+    were killed: those of this host whose process no longer exists, 
+    and others that are older than ORPHAN_AGE. On a shared file
+    system, the pid of another host's temp module says nothing 
+    about whether its run is still going.
+    
+    @param directories: directories to clean
+    @type directories: [str]
+    @return: paths of the removed files
+    @rtype [str]
+    '''
+    removed = []
+    now = time.time()
+    for directory in set(directories):
+        try:
+            file_names = os.listdir(directory)
+        except FileNotFoundError:
+            continue
+        for file_name in file_names:
+            tmp_match = TMP_FILE_PAT.match(file_name)
+            if tmp_match is None:
+                continue
+            path = os.path.join(directory, file_name)
+            try:
+                if tmp_match.group(1) != HOST_TAG or tmp_match.group(2) is None:
+                    if now - os.stat(path).st_mtime < ORPHAN_AGE:
+                        continue
+                elif process_exists(int(tmp_match.group(2))):
+                    continue
+                os.remove(path)
+                removed.append(path)
+            except FileNotFoundError:
+                # Removed concurrently:
+                continue
+    return removed
+
+#-------------------------
+# process_exists 
+#--------------
+
+def process_exists(pid):
+    '''
+    Whether a process with the given pid exists on this host.
+    
+    @param pid: process id
+    @type pid: int
+    @return: True if the process exists
+    @rtype bool
+    '''
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to someone else:
+        return True
+    return True
+
+#-------------------------
+# git_changed_files 
+#--------------
+
+def git_changed_files(rev, directory):
+    '''
+    Ask the local git repository that holds directory which
+    files changed since rev: files that differ between rev and
+    the working tree, plus untracked files that git does not
+    ignore. No remote is contacted.
+    
+    @param rev: any git revision, such as a commit, tag, or 'HEAD~3'
+    @type rev: str
+    @param directory: a directory inside the repository
+    @type directory: str
+    @return: real paths of the changed files
+    @rtype {str}
+    @raise ValueError: if git is missing, directory is not in a
+        repository, or rev is unknown
+    '''
+    def git(*args):
+        try:
+            git_res = subprocess.run(['git', '-C', directory] + list(args),
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise ValueError("Selecting changed modules needs git, which was not found.")
+        if git_res.returncode != 0:
+            raise ValueError("git %s failed: %s" % (args[0], os.fsdecode(git_res.stderr).strip()))
+        return os.fsdecode(git_res.stdout)
+    
+    top_dir = git('rev-parse', '--show-toplevel').strip()
+    # Without rename detection, a renamed file shows up
+    # under its new name, and never as unchanged:
+    names = git('diff', '--name-only', '--no-renames', '-z', rev, '--').split('\0')
+    # Unlike diff, ls-files lists paths relative to directory,
+    # unless asked for the full names:
+    names.extend(git('ls-files', '--others', '--exclude-standard', '--full-name', '-z').split('\0'))
+    return {os.path.realpath(os.path.join(top_dir, name)) for name in names if name != ''}
+
+# ---------------------------------- Class PdocRunner -----------------
+
+#-------------------------
+# PreppedSourceLoader 
+#--------------
+
+class PreppedSourceLoader(importlib.abc.SourceLoader):
+    '''
+    Import loader that serves the preprocessed text of a
+    module from memory. Code objects and tracebacks refer 
+    to the original file, so inspect and linecache show
+    the original source. The text is served in the module's 
+    own encoding, which its coding cookie, if any, declares.
+    '''
+    
+    def __init__(self, python_module, prepped_text, encoding='utf-8'):
+        self.python_module = python_module
+        self.prepped_text  = prepped_text
+        self.encoding      = encoding
+        
+    def get_filename(self, fullname):
+        return self.python_module
+    
+    def get_data(self, path):
+        return self.prepped_text.encode(self.encoding)
+
+#-------------------------
+# PdocRunner 
+#--------------
+
+class PdocRunner(object):
+    '''
+    Preprocesses modules, and has pdoc render them to HTML.
+    An instance holds the pdoc_prep options, and may run any
+    number of times. Failures are raised, never exited on, so
+    a long-running host process survives them.
+    '''
+    
+    # Options, keyed like the pdoc_run command line options:
+    DEFAULT_OPTIONS = {'delimiter'        : '@',
+                       'typecheck'        : False,
+                       'sections'         : 'google,numpy',
+                       'diagnostics'      : None,
+                       'page_writer'      : None,
+                       'in_memory'        : False,
+                       'html_postprocess' : False,
+                       'profile'          : False,
+                       'trace_memory'     : False,
+                       'io_threads'       : 4,
+                       'read_ahead'       : 8,
+                       'write_behind'     : 8,
+                       'shard'            : None,
+                       'link_types'       : None,
+                       'symbol_cache'     : None,
+                       'link_layout'      : None,
+                       'markup'           : None,
+                       'resume'           : False,
+                       'metrics'          : None,
+                       'chunk_lines'      : None,
+                       'source_maps'      : False,
+                       'timeout'          : None,
+                       'memory_limit'     : None,
+                       'retries'          : 0,
+                       'retry_on'         : 'timeout',
+                       'store'            : None,
+                       'store_compression': 'gzip',
+                       'store_version'    : None,
+                       'since'            : None
+                       }
+    
+    RETRY_ON = ('timeout', 'failure')
+    
+    def __init__(self, pdoc_prep_args=None):
+        '''
+        @param pdoc_prep_args: options intended for pdoc_prep; see
+            DEFAULT_OPTIONS. Missing ones take their default. 'sections'
+            may be a comma-separated string, or a list of styles. 'shard'
+            may be a string 'i/N', or a tuple (i, N). 'link_types' is 
+            the package directory whose classes and functions type specs 
+            are linked to; 'link_layout' is 'flat' if all pages go into 
+            one directory, or 'tree' if they mirror the package. By default
+            the layout is 'flat' exactly if an --html-dir is given.
+            'markup' is a key of MARKUP_FORMATS, or a template file.
+            With 'resume', a batch run skips the modules that the journal
+            of an earlier run with the same options records as completed.
+            'metrics' is a BuildMetrics instance to count modules, caches,
+            directives, errors, and phase durations in. Modules of more 
+            than 'chunk_lines' lines are preprocessed in chunks of about 
+            that many lines on a process pool. With 'source_maps', line 
+            numbers in pdoc's error output that refer to a preprocessed
+            temp module are translated to lines of the original module.
+            A pdoc process that runs longer than 'timeout' seconds is
+            killed; 'memory_limit' caps its address space at that many
+            MiB. Both apply to pdoc processes only, not to --in-memory
+            runs. pdoc is run up to 'retries' more times after a timeout,
+            or, if 'retry_on' is 'failure', after any failure. In batch 
+            runs, modules that time out every time are listed in the 
+            runner's timed_out, those on which pdoc fails otherwise, as
+            when over the memory limit, in its failed. The other modules
+            are documented.
+            With 'store', a directory, the finished pages also go into
+            a PageStore there, compressed as 'store_compression' says,
+            under the manifest 'store_version', by default the UTC time.
+            With 'since', a git revision, modules that git reports as
+            unchanged since then, and whose page exists, keep their page,
+            and are neither preprocessed nor given to pdoc.
+        @type pdoc_prep_args: {str : Any}
+        @raise ValueError: if 'retry_on' is not in RETRY_ON, if
+            'retries' is negative, 'timeout' or 'memory_limit' not 
+            positive, if a memory limit is asked for where the shell
+            has no ulimit, or if the store compression is unavailable
+        '''
+        self.pdoc_prep_args = dict(PdocRunner.DEFAULT_OPTIONS)
+        if pdoc_prep_args is not None:
+            self.pdoc_prep_args.update(pdoc_prep_args)
+        
+        sections = self.pdoc_prep_args['sections']
+        if isinstance(sections, str):
+            sections = sections.split(',')
+        self.section_styles = [style.strip() for style in sections if style.strip()]
+        
+        if self.pdoc_prep_args['retry_on'] not in PdocRunner.RETRY_ON:
+            raise ValueError("Retry policy must be one of %s, not '%s'." % 
+                             (PdocRunner.RETRY_ON, self.pdoc_prep_args['retry_on']))
+        if self.pdoc_prep_args['retries'] < 0:
+            raise ValueError("Retries must be 0 or more, not %s." % self.pdoc_prep_args['retries'])
+        if self.pdoc_prep_args['timeout'] is not None and self.pdoc_prep_args['timeout'] <= 0:
+            raise ValueError("Timeout must be more than 0 seconds, not %s." % self.pdoc_prep_args['timeout'])
+        if self.pdoc_prep_args['memory_limit'] is not None:
+            if self.pdoc_prep_args['memory_limit'] <= 0:
+                raise ValueError("Memory limit must be more than 0 MiB, not %s." % 
+                                 self.pdoc_prep_args['memory_limit'])
+            if os.name != 'posix':
+                raise ValueError("Memory limits for pdoc need a POSIX shell, which this platform lacks.")
+
+        # All finished pages are written through the page writer,
+        # which may leave unchanged pages untouched:
+        self.page_writer = self.pdoc_prep_args['page_writer']
+        if self.page_writer is None:
+            self.page_writer = PageWriter()
+        
+        # Built on first use, once for all modules:
+        self.symbol_index = None
+        # Compiled once for all modules:
+        self.markup = make_markup(self.pdoc_prep_args['markup'])
+        self.metrics = self.pdoc_prep_args['metrics']
+        # Temp module path to its original module and source
+        # map, while pdoc may run over it:
+        self.source_maps = {}
+        # Modules of batch runs for which pdoc timed out, 
+        # or failed otherwise:
+        self.timed_out = []
+        self.failed    = []
+        # Modules whose pages are kept, as git reports them unchanged:
+        self.unchanged = set()
+        self.page_store = None
+        if self.pdoc_prep_args['store'] is not None:
+            self.page_store = PageStore(self.pdoc_prep_args['store'], self.pdoc_prep_args['store_compression'])
+
+    #-------------------------
+    # run 
+    #--------------
+    
+    def run(self, pdoc_arg_list):
+        '''
+        Document the module(s) named in pdoc_arg_list.
+        
+        @param pdoc_arg_list: arguments intended for pdoc, including
+            one or more module paths
+        @type pdoc_arg_list: [str]
+        @return: paths of the HTML pages, one per module, except
+            for modules of a batch for which pdoc timed out or failed
+        @rtype [str]
+        @raise ValueError: if the arguments name no existing module
+        @raise PdocTimeout: if pdoc times out on a single module
+        @raise PdocError: if pdoc fails
+        '''
+        python_modules = [arg for arg in pdoc_arg_list if arg.endswith('.py')]
+        self.timed_out = []
+        self.failed    = []
+        self.unchanged = set()
+        try:
+            if self.pdoc_prep_args['since'] is not None:
+                self.unchanged = self.unchanged_modules(pdoc_arg_list, python_modules)
+            # Temp modules of killed runs would otherwise stay forever:
+            remove_orphaned_tmp_files([os.path.dirname(os.path.abspath(python_module)) 
+                                       for python_module in python_modules])
+            self.build_symbol_index(pdoc_arg_list)
+            if self.pdoc_prep_args['shard'] is not None:
+                if self.page_store is not None:
+                    raise ValueError("A shard holds only part of a version; store the pages after pdoc_merge.")
+                return self.run_shard(pdoc_arg_list, python_modules)
+            
+            # Several modules at once are documented
+            # in a batch:
+            if len(python_modules) > 1:
+                html_paths = self.run_batch(pdoc_arg_list, python_modules)
+            else:
+                html_paths = [self.run_module(pdoc_arg_list)]
+            if self.page_store is not None:
+                self.store_pages(pdoc_arg_list, python_modules, html_paths)
+            return html_paths
+        except Exception as e:
+            self.count('errors_total', error=type(e).__name__)
+            raise
+
+    #-------------------------
+    # unchanged_modules 
+    #--------------
+    
+    def unchanged_modules(self, pdoc_arg_list, python_modules):
+        '''
+        Find the modules that need no new page: those that
+        git reports as unchanged since the 'since' revision,
+        and whose page exists.
+        
+        @param pdoc_arg_list: arguments intended for pdoc
+        @type pdoc_arg_list: [str]
+        @param python_modules: paths of the modules of the run
+        @type python_modules: [str]
+        @return: absolute paths of the unchanged modules
+        @rtype {str}
+        @raise ValueError: if git cannot tell what changed
+        '''
+        python_modules = [os.path.abspath(os.path.expanduser(python_module)) for python_module in python_modules]
+        if len(python_modules) == 0:
+            return set()
+        pdoc_opts = [arg for arg in pdoc_arg_list if not arg.endswith('.py')]
+        changed = git_changed_files(self.pdoc_prep_args['since'], 
+                                    os.path.commonpath([os.path.dirname(python_module) 
+                                                        for python_module in python_modules]))
+        return {python_module for python_module in python_modules
+                if os.path.realpath(python_module) not in changed and 
+                   os.path.exists(self.page_path(pdoc_opts, python_module))}
+
+    #-------------------------
+    # page_path 
+    #--------------
+    
+    def page_path(self, pdoc_opts, python_module):
+        '''
+        Path of the page that pdoc writes for a module.
+        
+        @param pdoc_opts: pdoc options, without the modules
+        @type pdoc_opts: [str]
+        @param python_module: absolute path to the module
+        @type python_module: str
+        @return: path of the page
+        @rtype str
+        '''
+        (html_out_dir, _pdoc_args) = self.ensure_html_dir_spec(list(pdoc_opts), os.path.dirname(python_module))
+        return os.path.join(html_out_dir, self.derive_pdoc_out_file_name(python_module))
+
+    #-------------------------
+    # store_pages 
+    #--------------
+    
+    def store_pages(self, pdoc_arg_list, python_modules, html_paths):
+        '''
+        Add the pages of a run to the page store, as the 
+        version that the 'store_version' option names.
+        
+        @param pdoc_arg_list: arguments intended for pdoc
+        @type pdoc_arg_list: [str]
+        @param python_modules: paths of the modules of the run
+        @type python_modules: [str]
+        @param html_paths: paths of their pages, leaving out
+            those of modules that timed out or failed
+        @type html_paths: [str]
+        @return: path of the version's manifest
+        @rtype str
+        '''
+        module_keys = shard_keys(python_modules)
+        done_modules = [python_module for python_module in python_modules
+                        if self.is_done(os.path.abspath(os.path.expanduser(python_module)))]
+        pages = {module_keys[python_module] : html_path 
+                 for (python_module, html_path) in zip(done_modules, html_paths)}
+        html_dir = None
+        if '--html-dir' in pdoc_arg_list:
+            html_dir = pdoc_arg_list[pdoc_arg_list.index('--html-dir') + 1]
+        elif len(html_paths) > 0:
+            # Pages are next to their modules:
+            html_dir = os.path.commonpath([os.path.dirname(os.path.abspath(html_path)) for html_path in html_paths])
+        
+        version = self.pdoc_prep_args['store_version']
+        if version is None:
+            version = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+        (stored, reused) = (self.page_store.stored, self.page_store.reused)
+        with self.timer('store'):
+            manifest_path = self.page_store.add_version(version, pages, html_dir=html_dir)
+        self.count('cache_hits_total', self.page_store.reused - reused, cache='page_store')
+        self.count('cache_misses_total', self.page_store.stored - stored, cache='page_store')
+        return manifest_path
+
+    #-------------------------
+    # count 
+    #--------------
+    
+    def count(self, name, amount=1, **labels):
+        '''
+        Add to a counter of the metrics, if any.
+        
+        @param name: metric name; a key of BuildMetrics.METRICS
+        @type name: str
+        @param amount: what to add. Default: 1
+        @type amount: int
+        @param labels: label names and values of the series
+        @type labels: {str : str}
+        '''
+        if self.metrics is not None:
+            self.metrics.inc(name, amount, **labels)
+
+    #-------------------------
+    # timer 
+    #--------------
+    
+    def timer(self, phase_name):
+        '''
+        Context manager that times the enclosed code as 
+        the given phase in the metrics, if any.
+        
+        @param phase_name: name of the phase
+        @type phase_name: str
+        '''
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timer(phase_name)
+
+    #-------------------------
+    # build_symbol_index 
+    #--------------
+    
+    def build_symbol_index(self, pdoc_arg_list):
+        '''
+        If type specs are to be linked, build the symbol
+        index of the package, unless already built.
+        
+        @param pdoc_arg_list: arguments intended for pdoc
+        @type pdoc_arg_list: [str]
+        '''
+        package_dir = self.pdoc_prep_args['link_types']
+        if package_dir is None or self.symbol_index is not None:
+            return
+        link_layout = self.pdoc_prep_args['link_layout']
+        if link_layout is None:
+            link_layout = 'flat' if '--html-dir' in pdoc_arg_list else 'tree'
+        if link_layout not in ('flat', 'tree'):
+            raise ValueError("Link layout must be 'flat' or 'tree', not '%s'." % link_layout)
+        self.symbol_index = SymbolIndex(package_dir,
+                                        cache_path=self.pdoc_prep_args['symbol_cache'],
+                                        flat=(link_layout == 'flat')
+                                        )
+        if self.pdoc_prep_args['symbol_cache'] is not None:
+            self.count('cache_hits_total', 
+                       self.symbol_index.num_modules - self.symbol_index.num_parsed, 
+                       cache='symbol_index')
+            self.count('cache_misses_total', self.symbol_index.num_parsed, cache='symbol_index')
+
+    #-------------------------
+    # run_shard 
+    #--------------
+    
+    def run_shard(self, pdoc_arg_list, python_modules):
+        '''
+        Document only the modules that fall into this runner's
+        shard, and write a shard manifest into the --html-dir,
+        for merge_shards() to combine with the other shards.
+        
+        @param pdoc_arg_list: arguments intended for pdoc, including 
+            all module paths of the complete build
+        @type pdoc_arg_list: [str]
+        @param python_modules: paths of all modules of the complete build
+        @type python_modules: [str]
+        @return: paths of the HTML pages of this shard
+        @rtype [str]
+        @raise ValueError: if no --html-dir is given
+        '''
+        shard = self.pdoc_prep_args['shard']
+        (shard_index, num_shards) = parse_shard_spec(shard) if isinstance(shard, str) else shard
+        if '--html-dir' not in pdoc_arg_list:
+            raise ValueError("Sharded builds need an --html-dir to collect the shard's pages in.")
+        
+        pdoc_opts  = [arg for arg in pdoc_arg_list if not arg.endswith('.py')]
+        html_dir   = os.path.abspath(pdoc_opts[pdoc_opts.index('--html-dir') + 1])
+        module_keys = shard_keys(python_modules)
+        shard_modules = [python_module for python_module in python_modules
+                         if shard_of(module_keys[python_module], num_shards) == shard_index]
+        
+        html_paths = []
+        if len(shard_modules) == 1:
+            try:
+                html_paths = [self.run_module(pdoc_opts + shard_modules)]
+            except PdocError as e:
+                # Part of a larger build, which goes on:
+                self.note_failure(shard_modules[0], e)
+        elif len(shard_modules) > 1:
+            html_paths = self.run_batch(pdoc_opts + shard_modules, shard_modules)
+        
+        manifest = {'shard'          : shard_index,
+                    'num_shards'     : num_shards,
+                    'num_modules'    : len(python_modules),
+                    'modules_digest' : modules_digest(module_keys.values()),
+                    'modules'        : sorted(module_keys[python_module] for python_module in shard_modules),
+                    'pages'          : sorted(os.path.relpath(html_path, html_dir).replace(os.sep, '/')
+                                              for html_path in html_paths)
+                    }
+        os.makedirs(html_dir, exist_ok=True)
+        with open(os.path.join(html_dir, SHARD_MANIFEST_NAME % (shard_index, num_shards)), 'w') as out_fd:
+            json.dump(manifest, out_fd, indent=2)
+            out_fd.write('\n')
+        return html_paths
+
+    #-------------------------
+    # run_module 
+    #--------------
+    
+    def run_module(self, pdoc_arg_list):
+        '''
+        Document a single module.
+        
+        @param pdoc_arg_list: arguments intended for pdoc, including 
+            the module path, and optionally a pdoc ident_name
+        @type pdoc_arg_list: [str]
+        @return: path of the HTML page
+        @rtype str
+        '''
+        pdoc_prep_args = self.pdoc_prep_args
+        pdoc_arg_list  = list(pdoc_arg_list)
+
+        # The python module to process:
+        # CLI user may either put the python module
+        # at the end of the pdoc_prep options, or at the
+        # end of the line, i.e. after the pdoc options.
+        
+        (python_module, pymod_pos) = self.get_module_from_args(pdoc_arg_list)
+        
+        python_module = os.path.abspath(os.path.expanduser(python_module))
+        if not os.path.exists(python_module):
+            raise ValueError("Python module %s does not exist." % python_module)
+        
+        python_module_dir = os.path.dirname(python_module)
+        
+        with open(python_module, 'rb') as python_module_fd:
+            python_module_source = python_module_fd.read()
+        
+        # Check whether the caller specified an html target dir.
+        # If not, we specify it as the python module's dir (which is
+        # pdoc's default)
+        (html_out_dir, pdoc_arg_list) = self.ensure_html_dir_spec(pdoc_arg_list, python_module_dir)
+        
+        # With 'since', a module that did not change keeps its page:
+        if python_module in self.unchanged:
+            self.count('modules_processed_total', outcome='skipped')
+            return os.path.join(html_out_dir, self.derive_pdoc_out_file_name(python_module))
+        
+        # Ensure presence of --html option in call to pdoc:
+        try:
+            pdoc_arg_list.index('--html')
+        except ValueError:
+            # No --html specified; add it at the front:
+            pdoc_arg_list.insert(0, '--html')
+        
+        section_grammars = make_section_grammars(self.section_styles)
+        
+        # Profiles of the phases go next to the HTML output:
+        self.profiler = PhaseProfiler(os.path.join(html_out_dir, 
+                                                   os.path.splitext(os.path.basename(python_module))[0]),
+                                      profile=pdoc_prep_args.get('profile', False),
+                                      trace_memory=pdoc_prep_args.get('trace_memory', False)
+                                      )
+        
+        has_directives = ParseInfo(pdoc_prep_args['delimiter'], 
+                                   section_grammars).may_contain_directives(python_module_source)
+        
+        # The module needs decoding only if it is to be transformed, 
+        # or imported from memory. Then it is decoded, and any temp 
+        # file written, in the module's own encoding:
+        encoding = source_encoding(python_module_source, python_module)
+        python_module_text = None
+        if has_directives or pdoc_prep_args.get('in_memory', False):
+            python_module_text = python_module_source.decode(encoding)
+        
+        # With --html-postprocess, pdoc documents the untouched
+        # module, and its HTML output is transformed afterwards:
+        html_output_path = os.path.join(html_out_dir, self.derive_pdoc_out_file_name(python_module))
+        if pdoc_prep_args.get('html_postprocess', False):
+            with self.profiler.phase('pdoc'):
+                if pdoc_prep_args.get('in_memory', False):
+                    html = self.render_in_memory(python_module, python_module_text, pdoc_arg_list, encoding)
+                else:
+                    html = self.run_pdoc_staged(pdoc_arg_list, python_module)
+            if has_directives:
+                html = self.postprocess_html(html, python_module, pdoc_prep_args, section_grammars)
+            self.write_page(html_output_path, html)
+            self.count('modules_processed_total', outcome='prepped' if has_directives else 'original')
+            return html_output_path
+        
+        # With --in-memory, pdoc runs in this process, and imports
+        # the preprocessed text straight from memory. No temp file
+        # is written, read, or removed:
+        if pdoc_prep_args.get('in_memory', False):
+            if pymod_pos != -1:
+                raise ValueError("Option --in-memory cannot be combined with a pdoc ident_name.")
+            prepped_text = python_module_text
+            if has_directives:
+                prepped_fd = StringIO()
+                self.prep_text(python_module_text, prepped_fd, python_module, section_grammars)
+                prepped_text = prepped_fd.getvalue()
+            with self.profiler.phase('pdoc'):
+                html = self.render_in_memory(python_module, prepped_text, pdoc_arg_list, encoding)
+            self.write_page(html_output_path, html)
+            self.count('modules_processed_total', outcome='prepped' if has_directives else 'original')
+            return html_output_path
+        
+        # A module without any directives needs no preprocessing.
+        # Have pdoc work on the original, so that neither a temp
+        # file, nor the renaming of pdoc's output is needed:
+        if not has_directives:
+            with self.profiler.phase('pdoc'):
+                self.run_pdoc_original(pdoc_arg_list, python_module, html_output_path)
+            self.count('modules_processed_total', outcome='original')
+            return html_output_path
+        
+        # Temp file for the output of preprodcessing:
+        prepped_mod_name = self.create_tmp_file(python_module_dir)
+
+        # With a pdoc ident_name, pdoc renders just that class
+        # or function. Only its lines need preprocessing; the 
+        # rest of the module is copied as is:
+        (first_line, end_line) = (0, None)
+        if pymod_pos == -2:
+            (first_line, end_line) = self.ident_line_range(python_module_text, pdoc_arg_list[-1])
+        module_lines = StringIO(python_module_text).readlines()
+        
+        source_map = None
+        if pdoc_prep_args['source_maps']:
+            source_map = SourceMap()
+            source_map.append_identity(0, first_line)
+        
+        # Run the preprocessor, outputting to temp prepped-file:
+        try:
+            with open_source_out(prepped_mod_name, encoding, self.markup, python_module) as out_fd:
+                out_fd.writelines(module_lines[:first_line])
+                # Create temporary file with the necessary HTML transformations:
+                self.prep_text(''.join(module_lines[first_line:end_line]), 
+                               out_fd, 
+                               python_module, 
+                               section_grammars, 
+                               line_offset=first_line,
+                               source_map=source_map)
+                if end_line is not None:
+                    out_fd.writelines(module_lines[end_line:])
+                    if source_map is not None:
+                        source_map.append_identity(end_line, len(module_lines))
+            if source_map is not None:
+                self.source_maps[prepped_mod_name] = (python_module, source_map)
+            
+            # In the pdoc argument list, replace the Python module
+            # name with the preprocessed tmp file name:
+            pdoc_args = self.modify_module_to_pdoc(pdoc_arg_list, prepped_mod_name, pymod_pos)
+    
+            # Run pdoc over the preprocessed file:
+            with self.profiler.phase('pdoc'):
+                self.run_pdoc(pdoc_args)
+            
+            # Now rename pdoc's output file to be the original module name
+            # with the .m. added: foo.py ==> foo.m.html. The current
+            # name reflects the temp name:
+            
+            with self.profiler.phase('rename'):
+                self.finish_html_output(python_module, prepped_mod_name, html_out_dir)
+            
+        finally:
+            self.source_maps.pop(prepped_mod_name, None)
+            if os.path.exists(prepped_mod_name):
+                os.remove(prepped_mod_name)
+        
+        self.count('modules_processed_total', outcome='prepped')
+        return html_output_path
+
+    #-------------------------
+    # prep_text 
+    #--------------
+    
+    def prep_text(self, text, out_fd, python_module, section_grammars, line_offset=0, source_map=None):
+        '''
+        Preprocess the text of a module, or an excerpt of it.
+        With the 'chunk_lines' option, text of more lines than
+        that is preprocessed in chunks on a process pool.
+        
+        @param text: module text
+        @type text: str
+        @param out_fd: destination of the transformed text
+        @type out_fd: file-like
+        @param python_module: path to the module; used in diagnostics
+        @type python_module: str
+        @param section_grammars: section styles to recognize
+        @type section_grammars: [SectionGrammar]
+        @param line_offset: zero-based number, in the module, of
+            the first line of text. Default: 0
+        @type line_offset: int
+        @param source_map: if provided, the original line of each 
+            output line is appended there. Default: None
+        @type source_map: {None | SourceMap}
+        '''
+        pdoc_prep_args = self.pdoc_prep_args
+        prep_kwargs = {'delimiter_char'  : pdoc_prep_args['delimiter'],
+                       'force_type_spec' : pdoc_prep_args['typecheck'],
+                       'section_styles'  : section_grammars,
+                       'diagnostics'     : pdoc_prep_args.get('diagnostics'),
+                       'symbol_index'    : self.symbol_index,
+                       'markup'          : self.markup,
+                       'metrics'         : self.metrics
+                       }
+        chunk_lines = pdoc_prep_args['chunk_lines']
+        with self.timer('preprocess'):
+            if chunk_lines is not None and text.count('\n') > chunk_lines:
+                ChunkedPrep(chunk_lines, **prep_kwargs).run(text, out_fd, 
+                                                            file_name=python_module, 
+                                                            line_offset=line_offset,
+                                                            source_map=source_map)
+            else:
+                PdocPrep(StringIO(text), 
+                         out_fd=out_fd, 
+                         file_name=python_module, 
+                         profiler=self.profiler,
+                         line_offset=line_offset,
+                         source_map=source_map,
+                         **prep_kwargs)
+
+    #-------------------------
+    # run_batch 
+    #--------------
+    
+    def run_batch(self, pdoc_arg_list, python_modules):
+        '''
+        Document several modules. In the default mode, all
+        modules are preprocessed first, with source reads
+        and temp file writes overlapped with the transformation
+        on a thread pool. Then pdoc runs over each module, while
+        renaming of the previous module's HTML output proceeds 
+        on the pool. In the HTML postprocessing mode, pdoc documents
+        each package directory in one run. The in-memory mode, and
+        the HTML postprocessing mode for loose modules, handle one 
+        module after the other.
+        
+        Completed modules are recorded in a journal in the
+        (first) HTML directory. With the 'resume' option, modules 
+        that the journal records, and that did not change since,
+        are skipped. So are modules that the 'since' option finds 
+        unchanged.
+        
+        @param pdoc_arg_list: arguments intended for pdoc, including 
+            the module paths
+        @type pdoc_arg_list: [str]
+        @param python_modules: paths of the modules to document
+        @type python_modules: [str]
+        @return: paths of the HTML pages, in the order of python_modules,
+            except for modules for which pdoc timed out or failed
+        @rtype [str]
+        '''
+        pdoc_prep_args = self.pdoc_prep_args
+        
+        # pdoc options without the modules:
+        pdoc_opts = [arg for arg in pdoc_arg_list if not arg.endswith('.py')]
+        python_modules = [os.path.abspath(os.path.expanduser(python_module)) for python_module in python_modules]
+        for python_module in python_modules:
+            if not os.path.exists(python_module):
+                raise ValueError("Python module %s does not exist." % python_module)
+        
+        # Ensure presence of --html option in call to pdoc:
+        if '--html' not in pdoc_opts:
+            pdoc_opts.insert(0, '--html')
+        
+        (first_html_out_dir, _pdoc_args) = self.ensure_html_dir_spec(list(pdoc_opts), 
+                                                                     os.path.dirname(python_modules[0]))
+        self.profiler = PhaseProfiler(os.path.join(first_html_out_dir, 'pdoc_run_batch'),
+                                      profile=pdoc_prep_args.get('profile', False),
+                                      trace_memory=pdoc_prep_args.get('trace_memory', False)
+                                      )
+        
+        journal = BuildJournal(os.path.join(first_html_out_dir, JOURNAL_NAME),
+                               self.options_digest(pdoc_opts),
+                               resume=pdoc_prep_args.get('resume', False))
+        source_digests = {python_module : PageWriter().file_digest(python_module) 
+                          for python_module in python_modules}
+        html_paths = [self.page_path(pdoc_opts, python_module) for python_module in python_modules]
+        changed_modules = [python_module for python_module in python_modules if python_module not in self.unchanged]
+        todo_modules = [python_module for python_module in changed_modules 
+                        if not journal.is_done(python_module, source_digests[python_module])]
+        self.count('modules_processed_total', len(python_modules) - len(todo_modules), outcome='skipped')
+        if pdoc_prep_args.get('resume', False):
+            self.count('cache_hits_total', len(changed_modules) - len(todo_modules), cache='journal')
+            self.count('cache_misses_total', len(todo_modules), cache='journal')
+        
+        if pdoc_prep_args.get('in_memory', False) or pdoc_prep_args.get('html_postprocess', False):
+            try:
+                single_modules = todo_modules
+                if not pdoc_prep_args.get('in_memory', False):
+                    single_modules = self.run_packages_postprocess(pdoc_opts, 
+                                                                   todo_modules, 
+                                                                   journal, 
+                                                                   source_digests)
+                for python_module in single_modules:
+                    try:
+                        html_path = self.run_module(pdoc_opts + [python_module])
+                    except PdocError as e:
+                        self.note_failure(python_module, e)
+                        continue
+                    journal.record(python_module, source_digests[python_module], html_path)
+            finally:
+                journal.close()
+            return [html_path for (python_module, html_path) in zip(python_modules, html_paths)
+                    if self.is_done(python_module)]
+        
+        def finish_module(python_module, prepped_mod_name, html_out_dir, html_path):
+            self.finish_html_output(python_module, prepped_mod_name, html_out_dir)
+            journal.record(python_module, source_digests[python_module], html_path)
+            self.count('modules_processed_total', outcome='prepped')
+        
+        io_threads = pdoc_prep_args['io_threads']
+        batch_prep = BatchPrep(io_threads=io_threads,
+                               read_ahead=pdoc_prep_args['read_ahead'],
+                               write_behind=pdoc_prep_args['write_behind'],
+                               delimiter_char=pdoc_prep_args['delimiter'],
+                               force_type_spec=pdoc_prep_args['typecheck'],
+                               section_styles=self.section_styles,
+                               diagnostics=pdoc_prep_args.get('diagnostics'),
+                               symbol_index=self.symbol_index,
+                               markup=self.markup,
+                               metrics=self.metrics,
+                               chunk_lines=pdoc_prep_args['chunk_lines'],
+                               source_maps=pdoc_prep_args['source_maps']
+                               )
+        # Temp files created so far, for cleanup even
+        # if preprocessing fails part way:
+        tmp_files  = []
+        def make_tmp_file(python_module):
+            tmp_file = self.create_tmp_file(os.path.dirname(python_module))
+            tmp_files.append(tmp_file)
+            return tmp_file
+        
+        try:
+            with self.profiler.phase('prep'):
+                prepped = batch_prep.run(todo_modules, make_tmp_file)
+            
+            with self.profiler.phase('pdoc'):
+                with ThreadPoolExecutor(max_workers=io_threads) as rename_pool:
+                    renames = []
+                    for (python_module, prepped_mod_name) in prepped:
+                        (html_out_dir, pdoc_args) = self.ensure_html_dir_spec(list(pdoc_opts), 
+                                                                              os.path.dirname(python_module))
+                        html_path = os.path.join(html_out_dir, self.derive_pdoc_out_file_name(python_module))
+                        if prepped_mod_name is None:
+                            # No directives; pdoc can work on the original:
+                            try:
+                                self.run_pdoc_original(pdoc_args + [python_module], 
+                                                       python_module, 
+                                                       html_path)
+                            except PdocError as e:
+                                self.note_failure(python_module, e)
+                                continue
+                            journal.record(python_module, source_digests[python_module], html_path)
+                            self.count('modules_processed_total', outcome='original')
+                            continue
+                        if batch_prep.source_maps is not None and python_module in batch_prep.source_maps:
+                            self.source_maps[prepped_mod_name] = (python_module, 
+                                                                  batch_prep.source_maps.pop(python_module))
+                        try:
+                            self.run_pdoc(pdoc_args + [prepped_mod_name])
+                        except PdocError as e:
+                            # Not journaled, so a resumed run tries again:
+                            self.note_failure(python_module, e)
+                            continue
+                        finally:
+                            self.source_maps.pop(prepped_mod_name, None)
+                        renames.append(rename_pool.submit(finish_module,
+                                                          python_module,
+                                                          prepped_mod_name,
+                                                          html_out_dir,
+                                                          html_path))
+                    for rename in renames:
+                        rename.result()
+        finally:
+            journal.close()
+            for tmp_file in tmp_files:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+        return [html_path for (python_module, html_path) in zip(python_modules, html_paths)
+                if self.is_done(python_module)]
+
+    #-------------------------
+    # run_packages_postprocess 
+    #--------------
+    
+    def run_packages_postprocess(self, pdoc_opts, python_modules, journal, source_digests):
+        '''
+        For the HTML postprocessing mode, have pdoc document each
+        package directory that holds several of the modules in a
+        single run, given the directory, as pdoc's own command line
+        does. The runs of several packages proceed in parallel on 
+        the I/O threads. pdoc writes the pages of all the package's 
+        modules into a staging directory. The pages of python_modules
+        are transformed, and written to their usual places.
+        
+        Loose modules, those alone in their package, modules whose 
+        page pdoc did not write, such as private ones, and the modules
+        of a package that pdoc failed on, are left to be documented 
+        one at a time.
+        
+        @param pdoc_opts: pdoc options, without the modules
+        @type pdoc_opts: [str]
+        @param python_modules: absolute paths of the modules to document
+        @type python_modules: [str]
+        @param journal: journal in which to record completed modules
+        @type journal: BuildJournal
+        @param source_digests: digests of the modules' sources
+        @type source_digests: {str : str}
+        @return: the modules still to be documented, in the order
+            of python_modules
+        @rtype [str]
+        '''
+        pdoc_prep_args = self.pdoc_prep_args
+        package_modules = {}
+        for python_module in python_modules:
+            package_dir = os.path.dirname(python_module)
+            if os.path.exists(os.path.join(package_dir, '__init__.py')):
+                package_modules.setdefault(package_dir, []).append(python_module)
+        package_modules = {package_dir : modules for (package_dir, modules) in package_modules.items()
+                           if len(modules) > 1}
+        if not package_modules:
+            return python_modules
+        
+        section_grammars = make_section_grammars(self.section_styles)
+        staging_root = tempfile.mkdtemp(prefix='tmp_pdoc_stage_')
+        
+        def run_package(package_dir):
+            staging_dir = tempfile.mkdtemp(dir=staging_root)
+            (_html_out_dir, pdoc_args) = self.ensure_html_dir_spec(list(pdoc_opts), package_dir)
+            pdoc_args[pdoc_args.index('--html-dir') + 1] = staging_dir
+            self.run_pdoc(pdoc_args + [package_dir])
+            # pdoc puts a package's pages in a directory of its name:
+            return os.path.join(staging_dir, os.path.basename(package_dir))
+        
+        done_modules = set()
+        try:
+            with self.profiler.phase('pdoc'):
+                with ThreadPoolExecutor(max_workers=pdoc_prep_args['io_threads']) as pdoc_pool:
+                    package_runs = [(pdoc_pool.submit(run_package, package_dir), modules)
+                                    for (package_dir, modules) in package_modules.items()]
+                    package_pages = []
+                    for (package_run, modules) in package_runs:
+                        try:
+                            package_pages.append((package_run.result(), modules))
+                        except PdocError:
+                            # Documented one at a time, the modules 
+                            # show which of them pdoc fails on:
+                            pass
+            for (package_pages_dir, modules) in package_pages:
+                for python_module in modules:
+                    if os.path.basename(python_module) == '__init__.py':
+                        staged_page = os.path.join(package_pages_dir, 'index.html')
+                    else:
+                        staged_page = os.path.join(package_pages_dir, 
+                                                   self.derive_pdoc_out_file_name(python_module))
+                    if not os.path.exists(staged_page):
+                        continue
+                    with open(staged_page, 'r', encoding='utf-8') as in_fd:
+                        html = in_fd.read()
+                    with open(python_module, 'rb') as python_module_fd:
+                        python_module_source = python_module_fd.read()
+                    has_directives = ParseInfo(pdoc_prep_args['delimiter'], 
+                                               section_grammars).may_contain_directives(python_module_source)
+                    if has_directives:
+                        html = self.postprocess_html(html, python_module, pdoc_prep_args, section_grammars)
+                    html_path = self.page_path(pdoc_opts, python_module)
+                    self.write_page(html_path, html)
+                    journal.record(python_module, source_digests[python_module], html_path)
+                    self.count('modules_processed_total', outcome='prepped' if has_directives else 'original')
+                    done_modules.add(python_module)
+        finally:
+            shutil.rmtree(staging_root, ignore_errors=True)
+        return [python_module for python_module in python_modules if python_module not in done_modules]
+
+    #-------------------------
+    # note_failure 
+    #--------------
+    
+    def note_failure(self, python_module, error):
+        '''
+        Record that pdoc timed out on, or failed on a module 
+        of a batch, which goes on with the next module. 
+        
+        @param python_module: path to the module
+        @type python_module: str
+        @param error: what pdoc raised
+        @type error: PdocError
+        '''
+        if isinstance(error, PdocTimeout):
+            self.timed_out.append(python_module)
+            self.count('modules_processed_total', outcome='timed_out')
+        else:
+            self.failed.append(python_module)
+            self.count('modules_processed_total', outcome='failed')
+        self.count('errors_total', error=type(error).__name__)
+
+    #-------------------------
+    # is_done 
+    #--------------
+    
+    def is_done(self, python_module):
+        '''
+        Whether pdoc neither timed out nor failed on a 
+        module of this run.
+        
+        @param python_module: absolute path to the module
+        @type python_module: str
+        @return: True if pdoc documented the module
+        @rtype bool
+        '''
+        return python_module not in self.timed_out and python_module not in self.failed
+
+    #-------------------------
+    # options_digest 
+    #--------------
+    
+    def options_digest(self, pdoc_opts):
+        '''
+        Digest of everything besides the modules themselves
+        that shapes the pages: the pdoc options, the pdoc_prep
+        options that affect the output, and the content of the
+        symbol index that type specs link to.
+        
+        @param pdoc_opts: pdoc options, without the modules
+        @type pdoc_opts: [str]
+        @return: hex digest
+        @rtype str
+        '''
+        pdoc_prep_args = self.pdoc_prep_args
+        options = {'pdoc_opts'   : pdoc_opts,
+                   'symbols'     : None if self.symbol_index is None else self.symbol_index.digest(),
+                   'delimiter'   : pdoc_prep_args['delimiter'],
+                   'typecheck'   : pdoc_prep_args['typecheck'],
+                   'sections'    : [getattr(style, 'style', style) for style in self.section_styles],
+                   'link_types'  : pdoc_prep_args['link_types'],
+                   'link_layout' : pdoc_prep_args['link_layout'],
+                   'markup'      : sorted(vars(self.markup).items())
+                   }
+        return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    #-------------------------
+    # finish_html_output 
+    #--------------
+    
+    def finish_html_output(self, python_module, prepped_mod_name, html_out_dir):
+        '''
+        Rename pdoc's output file to be the original module name
+        with the .m. added: foo.py ==> foo.m.html. The current
+        name reflects the temp name. Then purge the temp name
+        from the HTML.
+        
+        @param python_module: path to the original module
+        @type python_module: str
+        @param prepped_mod_name: path to the preprocessed temp module
+        @type prepped_mod_name: str
+        @param html_out_dir: directory that holds pdoc's output
+        @type html_out_dir: str
+        @return: path of the final HTML file
+        @rtype str
+        '''
+        html_output_name = self.derive_pdoc_out_file_name(python_module)
+        html_output_path = os.path.join(html_out_dir, html_output_name)
+        pdoc_res_file    = os.path.join(html_out_dir, 
+                                        self.derive_pdoc_out_file_name(prepped_mod_name)
+                                        )
+        with open(pdoc_res_file, 'r', encoding='utf-8') as in_fd:
+            html = in_fd.read()
+    
+        # pdoc uses the python module name throughout its
+        # generated HTML. Since we gave it the temp name
+        # of the prepped file, those refs will all use
+        # the temp file name. Fix that:
+        with self.timer('replace_temp_name'):
+            html = self.replace_temp_name(python_module, html, prepped_mod_name)
+        self.write_page(html_output_path, html)
+        os.remove(pdoc_res_file)
+        return html_output_path
+
+    #-------------------------
+    # write_page 
+    #--------------
+    
+    def write_page(self, html_output_path, html):
+        '''
+        Write a finished HTML page through the page writer,
+        creating its directory if needed.
+        
+        @param html_output_path: destination of the page
+        @type html_output_path: str
+        @param html: page content
+        @type html: str
+        '''
+        os.makedirs(os.path.dirname(html_output_path), exist_ok=True)
+        self.page_writer.write(html_output_path, html)
+
+    #-------------------------
+    # run_pdoc_original 
+    #--------------
+    
+    def run_pdoc_original(self, pdoc_arg_list, python_module, html_output_path):
+        '''
+        Run pdoc over a module that needs no preprocessing.
+        Normally pdoc writes the page into place itself. When 
+        unchanged pages are to be left untouched, pdoc works
+        in a staging directory, and the page writer decides.
+        
+        @param pdoc_arg_list: arguments intended for pdoc, including the module
+        @type pdoc_arg_list: [str]
+        @param python_module: path to the module
+        @type python_module: str
+        @param html_output_path: final destination of the page
+        @type html_output_path: str
+        '''
+        if not self.page_writer.skip_unchanged:
+            self.run_pdoc(pdoc_arg_list)
+            return
+        self.write_page(html_output_path, self.run_pdoc_staged(pdoc_arg_list, python_module))
+
+    #-------------------------
+    # run_pdoc_staged 
+    #--------------
+    
+    def run_pdoc_staged(self, pdoc_arg_list, python_module):
+        '''
+        Run pdoc with its --html-dir pointed at a fresh staging
+        directory, and return the HTML it produced for python_module.
+        The staging directory is removed.
+        
+        @param pdoc_arg_list: arguments intended for pdoc; must include --html-dir
+        @type pdoc_arg_list: [str]
+        @param python_module: path to the module whose page to return
+        @type python_module: str
+        @return: the HTML pdoc produced
+        @rtype str
+        '''
+        staging_dir = tempfile.mkdtemp(prefix='tmp_pdoc_stage_')
+        try:
+            pdoc_args = list(pdoc_arg_list)
+            pdoc_args[pdoc_args.index('--html-dir') + 1] = staging_dir
+            self.run_pdoc(pdoc_args)
+            with open(os.path.join(staging_dir, self.derive_pdoc_out_file_name(python_module)),
+                      'r', encoding='utf-8') as in_fd:
+                return in_fd.read()
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    #-------------------------
+    # run_pdoc 
+    #--------------
+    
+    def run_pdoc(self, pdoc_args):
+        '''
+        Run pdoc with the given arguments, again after a failure
+        as the 'retries' and 'retry_on' options allow. If pdoc
+        works on a temp module that has a source map, pdoc's error 
+        output is passed on with line numbers of the original module.
+        
+        @param pdoc_args: complete argument list for pdoc
+        @type pdoc_args: [str]
+        @raise PdocTimeout: if pdoc ran out of time on the last try
+        @raise PdocError: if pdoc fails
+        '''
+        retries = self.pdoc_prep_args['retries']
+        for attempt in range(retries + 1):
+            try:
+                return self.run_pdoc_once(pdoc_args)
+            except PdocError as e:
+                retry = isinstance(e, PdocTimeout) or self.pdoc_prep_args['retry_on'] == 'failure'
+                if not retry or attempt == retries:
+                    raise
+                self.count('pdoc_retries_total', error=type(e).__name__)
+
+    #-------------------------
+    # run_pdoc_once 
+    #--------------
+    
+    def run_pdoc_once(self, pdoc_args):
+        '''
+        Run pdoc once, within the time and memory limits, if any.
+        On timeout, pdoc is killed along with the shell that 
+        started it. The arguments go to pdoc as they are, never
+        through a shell's word splitting. PDOC_PATH may hold 
+        options of its own, split as a POSIX shell would.
+        
+        @param pdoc_args: complete argument list for pdoc
+        @type pdoc_args: [str]
+        @raise PdocTimeout: if pdoc ran out of time
+        @raise PdocError: if pdoc fails
+        '''
+        pdoc_argv = shlex.split(self.pdoc_path()) + list(pdoc_args)
+        mapped = [arg for arg in pdoc_args if arg in self.source_maps]
+        timeout = self.pdoc_prep_args['timeout']
+        memory_limit = self.pdoc_prep_args['memory_limit']
+        if memory_limit is not None:
+            # The shell caps the address space of itself, and so of 
+            # pdoc, which replaces it. A preexec_fn could do the same,
+            # but is unsafe while other threads run, as in run_batch.
+            # pdoc's argv reaches the shell as its positional parameters:
+            pdoc_argv = ['sh', '-c', 'ulimit -v %s && exec "$@"' % (memory_limit * 1024), 'sh'] + pdoc_argv
+        with self.timer('pdoc'):
+            # In a session of its own, the shell and pdoc
+            # can be killed together:
+            try:
+                proc = subprocess.Popen(pdoc_argv, 
+                                        stderr=subprocess.PIPE if mapped else None,
+                                        universal_newlines=True,
+                                        start_new_session=timeout is not None
+                                        )
+            except OSError as e:
+                raise PdocError("Cannot start pdoc: %s" % e)
+            try:
+                (_stdout, stderr) = proc.communicate(timeout=timeout)
+            except BaseException as e:
+                # Timed out, or interrupted, which no longer
+                # reaches pdoc in its own session:
+                if timeout is not None:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                else:
+                    proc.kill()
+                proc.communicate()
+                if isinstance(e, subprocess.TimeoutExpired):
+                    raise PdocTimeout("pdoc did not finish within %s seconds." % timeout)
+                raise
+        if mapped and stderr:
+            err_text = stderr
+            for prepped_mod_name in mapped:
+                (python_module, source_map) = self.source_maps[prepped_mod_name]
+                err_text = source_map.translate(err_text, prepped_mod_name, python_module)
+            sys.stderr.write(err_text)
+        if proc.returncode != 0:
+            if memory_limit is not None:
+                raise PdocError("Error during pdoc run (exit status %s; memory limit %s MiB)." % 
+                                (proc.returncode, memory_limit))
+            raise PdocError("Error during pdoc run (exit status %s)." % proc.returncode)
+
+    #-------------------------
+    # postprocess_html 
+    #--------------
+    
+    def postprocess_html(self, html, python_module, pdoc_prep_args, section_grammars):
+        '''
+        Transform the directives in the docstrings of a
+        pdoc-produced HTML page.
+        
+        @param html: HTML produced by pdoc
+        @type html: str
+        @param python_module: path to the documented module; used in diagnostics
+        @type python_module: str
+        @param pdoc_prep_args: options intended for pdoc_prep
+        @type pdoc_prep_args: {str : Any}
+        @param section_grammars: section styles to recognize
+        @type section_grammars: [SectionGrammar]
+        @return: the transformed HTML
+        @rtype str
+        '''
+        out_fd = StringIO()
+        with self.timer('postprocess'):
+            PdocHtmlPrep(StringIO(html),
+                         out_fd=out_fd,
+                         delimiter_char=pdoc_prep_args['delimiter'],
+                         force_type_spec=pdoc_prep_args['typecheck'],
+                         section_styles=section_grammars,
+                         file_name=python_module,
+                         diagnostics=pdoc_prep_args.get('diagnostics'),
+                         profiler=self.profiler,
+                         symbol_index=self.symbol_index,
+                         markup=self.markup,
+                         metrics=self.metrics
+                         )
+        return out_fd.getvalue()
+
+    #-------------------------
+    # render_in_memory 
+    #--------------
+    
+    def render_in_memory(self, python_module, prepped_text, pdoc_arg_list, encoding='utf-8'):
+        '''
+        Import the preprocessed text of a module from memory, under
+        a private name, and have pdoc render it in this process
+        under the original module's name. Neighbor modules the import
+        pulls in are forgotten afterwards. The pdoc
+        options --external-links, --link-prefix, --html-no-source,
+        and --all-submodules are honored.
+        
+        @param python_module: path to the original module
+        @type python_module: str
+        @param prepped_text: preprocessed module source
+        @type prepped_text: str
+        @param pdoc_arg_list: arguments intended for pdoc
+        @type pdoc_arg_list: [str]
+        @param encoding: encoding of the original module. Default: 'utf-8'
+        @type encoding: str
+        @return: the HTML pdoc produced
+        @rtype str
+        @raise PdocError: if pdoc is not importable, or fails
+        '''
+        try:
+            import pdoc
+        except ImportError:
+            raise PdocError("Option --in-memory needs pdoc to be importable in this Python.")
+        
+        link_prefix = ''
+        if '--link-prefix' in pdoc_arg_list:
+            prefix_pos = pdoc_arg_list.index('--link-prefix') + 1
+            if prefix_pos == len(pdoc_arg_list):
+                raise PdocError("Specified pdoc option --link-prefix without a value.")
+            link_prefix = pdoc_arg_list[prefix_pos]
+        
+        (mod_name, _ext) = os.path.splitext(os.path.basename(python_module))
+        
+        # Let the module import its neighbors, as pdoc's own
+        # command line does, for the duration of the import:
+        python_module_dir = os.path.dirname(python_module)
+        path_added = python_module_dir not in sys.path
+        if path_added:
+            sys.path.insert(0, python_module_dir)
+        
+        # Import under a private name, so that a module named like
+        # one this process uses, such as types, shadows nothing.
+        # Pages still show the module's own name:
+        import_name = '_pdoc_prep_in_memory_%s_%s' % (uuid.uuid4().hex, mod_name)
+        loader = PreppedSourceLoader(python_module, prepped_text, encoding)
+        spec   = importlib.util.spec_from_loader(import_name, loader, origin=python_module)
+        module = importlib.util.module_from_spec(spec)
+        setattr(module, '__pdoc_module_name', mod_name)
+        prev_module_names = set(sys.modules.keys())
+        sys.modules[import_name] = module
+        try:
+            with self.timer('pdoc'):
+                loader.exec_module(module)
+                pdoc_module = pdoc.Module(module, allsubmodules='--all-submodules' in pdoc_arg_list)
+                html = pdoc_module.html(external_links='--external-links' in pdoc_arg_list,
+                                        link_prefix=link_prefix,
+                                        source='--html-no-source' not in pdoc_arg_list)
+        except Exception as e:
+            raise PdocError("Error during in-memory pdoc run (%s)." % repr(e)) from e
+        finally:
+            sys.modules.pop(import_name, None)
+            # Neighbors the module imported would go stale once
+            # their files are prepped or edited; forget them:
+            self.forget_modules_under(python_module_dir, prev_module_names)
+            if path_added and python_module_dir in sys.path:
+                sys.path.remove(python_module_dir)
+        return html
+
+    #-------------------------
+    # forget_modules_under 
+    #--------------
+    
+    def forget_modules_under(self, directory, prev_module_names):
+        '''
+        Remove from sys.modules the modules that were imported
+        since prev_module_names was taken, and whose files lie
+        in or below the given directory.
+        
+        @param directory: directory whose modules are to be forgotten
+        @type directory: str
+        @param prev_module_names: names in sys.modules before the import
+        @type prev_module_names: {str}
+        '''
+        directory = os.path.realpath(directory)
+        for name in set(sys.modules.keys()) - prev_module_names:
+            module_file = getattr(sys.modules.get(name), '__file__', None)
+            if module_file is None:
+                continue
+            module_file = os.path.realpath(module_file)
+            if os.path.commonpath([directory, module_file]) == directory:
+                del sys.modules[name]
+
+    #-------------------------
+    # create_tmp_file 
+    #--------------
+    
+    def create_tmp_file(self, directory):
+        '''
+        Given a directory, create a temp file there
+        to use as destination for the preprocessed .py file.
+        
+        @param directory: target directory for tmp file
+        @type directory: str
+        @return: the full pathname of the new temp file
+        @rtype str
+        '''
+        
+        # Temp file for the output of preprodcessing:
+        # The file is reopened for writing in the
+        # encoding of the module it stands in for:
+        # Host tag and pid in the name identify files of 
+        # killed runs, for remove_orphaned_tmp_files():
+        prepped_mod_tmp_file_obj  = tempfile.NamedTemporaryFile(prefix='%sh%s_%s_' % (TMP_FILE_PREFIX, 
+                                                                                    HOST_TAG, 
+                                                                                    os.getpid()),
+                                                           suffix='.py',
+                                                           dir=directory,
+                                                           mode='wb',
+                                                           delete=False
+                                                           )
+        prepped_mod_tmp_file_obj.close()
+        return prepped_mod_tmp_file_obj.name
+        
+
+    #-------------------------
+    # derive_pdoc_out_file_name 
+    #--------------
+        
+    def derive_pdoc_out_file_name(self, python_file_name):
+        '''
+        Given a path, such as /foo/bar/fum.py, return
+        fum.m.py, which is the pdoc standard
+        HTML module file convention
+        
+        @param python_file_name: full path to work with
+        @type python_file_name: str
+        @return modified path string
+        @rtype str
+        '''
+        (_dir, file_name) = os.path.split(python_file_name)
+        
+        (name, _ext) = os.path.splitext(file_name)
+        return name + '.m' + '.html'
+
+    
+    #-------------------------
+    # ensure_html_dir_spec 
+    #--------------
+
+    def ensure_html_dir_spec(self, pdoc_arg_list, python_module_dir):
+
+        try:
+            html_out_dir_pos = pdoc_arg_list.index('--html-dir')
+            html_out_dir     = os.path.abspath(pdoc_arg_list[html_out_dir_pos + 1])
+        except ValueError:
+            # No html out dir specified for pdoc. No problem,
+            # make it same dir as the python module being documented:
+            html_out_dir = python_module_dir
+            pdoc_arg_list = ['--html-dir', html_out_dir] + pdoc_arg_list 
+        except IndexError:
+            # A pdoc --html-dir option without a subsequent
+            # value for the option:
+            raise ValueError("Specified option --html-dir without a value.")
+        
+        return (html_out_dir, pdoc_arg_list)
+
+    #-------------------------
+    # get_module_from_args
+    #--------------
+    
+    def get_module_from_args(self, pdoc_arg_list):
+        '''
+        # Unfortunately, pdoc has an optional positional arg
+        # *after* the module name (i.e. ident_name). So, need to
+        # pick out the python module name fromn the pdoc 
+        # parameter list.
+        #
+        # Parm list could be something like:
+        #    o ['--html', 'foo.py']
+        # or o ['--html', 'foo.py' 'myFunc']
+        #
+        # In the first case return -1, in the second,
+        # return -2. We spec relative to to list's end,
+        # b/c args may be prepended in this list further on.
+        
+        @param pdoc_arg_list: list of arguments intended for pdoc
+        @type pdoc_arg_list: [str]
+        @return tuple with Python module to document and its position in the args list
+        @rtype (str,int)
+        @raise ValueError
+        '''
+        
+        if pdoc_arg_list is None or len(pdoc_arg_list) == 0:
+            raise ValueError("Missing name of Python module to document.")
+        
+        if pdoc_arg_list[-1].endswith('.py'):
+            return (pdoc_arg_list[-1], -1)
+        
+        # Must have been given pdoc args with a trailing ident_name:
+        if len(pdoc_arg_list) < 2:
+            raise ValueError("Missing name of Python module to document (no arg with '.py' extension).")
+        
+        return (pdoc_arg_list[-2], -2)
+    
+    #-------------------------
+    # ident_line_range 
+    #--------------
+    
+    def ident_line_range(self, python_module_text, ident_name):
+        '''
+        Find the lines of the class or function that a pdoc
+        ident_name, such as 'MyClass' or 'MyClass.my_method', 
+        names in a module. Found with ast, without importing
+        the module.
+        
+        @param python_module_text: source of the module
+        @type python_module_text: str
+        @param ident_name: dotted name of the class or function
+        @type ident_name: str
+        @return: zero-based first line, and the line after the last. 
+            (0, None), i.e. the whole module, if the name is not found 
+            or the module does not parse
+        @rtype (int, {None | int})
+        '''
+        def_types = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+        try:
+            nodes = ast.parse(python_module_text).body
+        except (SyntaxError, ValueError):
+            return (0, None)
+        node = None
+        for name in ident_name.split('.'):
+            node = next((child for child in nodes 
+                         if isinstance(child, def_types) and child.name == name), None)
+            if node is None:
+                return (0, None)
+            nodes = node.body
+        # Decorators precede the def line:
+        first_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list]) - 1
+        return (first_line, node.end_lineno)
+
+    #-------------------------
+    # pdoc_path 
+    #--------------
+
+    def pdoc_path(self):
+        '''
+        When debugging in Eclipse the PATH variable
+        is not set to what it would be in a shell.
+        When starting pdoc with subprocess the
+        proper path is not set either. So the pdoc
+        executable won't be found, even though it
+        will be when this script is run in a shell.
+        
+        A clumsy workaround: In the Eclipse run/debug
+        configuration Environment tab, create a variable
+        like PDOC_PATH.
+        
+        '''
+        provided_path = os.getenv('PDOC_PATH')
+        return 'pdoc' if provided_path is None else provided_path 
+    
+    
+    #-------------------------
+    # modify_module_to_pdoc 
+    #--------------
+    
+    def modify_module_to_pdoc(self, pdoc_arg_list, tmp_module_name, mod_name_pos):
+        
+        pdoc_arg_list[mod_name_pos] = tmp_module_name
+        return pdoc_arg_list
+    
+    #-------------------------
+    # tmp_html_name 
+    #--------------
+    
+    def tmp_html_name(self, python_module_name):
+        return python_module_name[0:-3] + '.m' + '.html'
+
+
+    #-------------------------
+    # replace_temp_name 
+    #--------------
+    
+    def replace_temp_name(self, python_module, html, prepped_mod_name):
+        '''
+        Given the path to the intermediate (i.e. prepped) file,
+        and the html pdoc produced from it, purge uses of the
+        temp file name from the html.
+        
+        Ex.: assuming the temp file name was tmp_pdoc_prep_g3g5hxni.py,
+             and the original python module was test_doc.py, 
+             the pdoc output html will contain lines like:
+
+            <span class="class_name"><a href="#tmp_pdoc_prep_g3g5hxni.Foo">Foo</a></span>
+            
+        We replace lines like that to be:
+        
+            <span class="class_name"><a href="#test_doc.Foo">Foo</a></span>
+        
+        @param python_module path to original module that was to be documented
+        @type python_module str
+        @param html: html produced by pdoc from the intermediate file
+        @type html: str
+        @param prepped_mod_name: path to the intermediate file
+        @type prepped_mod_name: str
+        @return: the cleaned html
+        @rtype str
+        '''
+        # Extract the root of the original python module, i.e.
+        # 'test_doc' in the example above:
+        (_orig_dir, orig_basename) = os.path.split(python_module)
+        (orig_root, _ext) = os.path.splitext(orig_basename)
+        
+        # Same for the intermediate file name:
+        (_prepped_dir, prepped_basename) = os.path.split(prepped_mod_name)
+        (prepped_mod_root, _ext) = os.path.splitext(prepped_basename)
+        
+        pat = re.compile(prepped_mod_root)
+        return pat.sub(orig_root, html)
+
+
+#-------------------------
+# render_module 
+#--------------
+
+def render_module(python_module, html_dir=None, pdoc_args=None, **options):
+    '''
+    Preprocess a module, and have pdoc render it to HTML.
+    
+    @param python_module: path to the module
+    @type python_module: str
+    @param html_dir: directory for the HTML page. Default: the module's directory
+    @type html_dir: {None | str}
+    @param pdoc_args: further pdoc options, such as '--html-no-source'
+    @type pdoc_args: {None | [str]}
+    @param options: pdoc_prep options, as in PdocRunner.DEFAULT_OPTIONS
+    @type options: {str : Any}
+    @return: path of the HTML page
+    @rtype str
+    @raise ValueError: if the module does not exist
+    @raise PdocError: if pdoc fails
+    '''
+    pdoc_arg_list = list(pdoc_args or [])
+    if html_dir is not None:
+        pdoc_arg_list += ['--html-dir', html_dir]
+    return PdocRunner(options).run(pdoc_arg_list + [python_module])[0]
+
+#-------------------------
+# render_package 
+#--------------
+
+def render_package(package_dir, html_dir=None, pdoc_args=None, **options):
+    '''
+    Render each module below package_dir to HTML. The modules of 
+    each directory are documented as one batch. Under html_dir,
+    the pages are placed in the same subdirectories as their 
+    modules below package_dir.
+    
+    @param package_dir: root directory of the package
+    @type package_dir: str
+    @param html_dir: root directory for the HTML pages. Default: 
+        each page goes next to its module
+    @type html_dir: {None | str}
+    @param pdoc_args: further pdoc options, such as '--html-no-source'
+    @type pdoc_args: {None | [str]}
+    @param options: pdoc_prep options, as in PdocRunner.DEFAULT_OPTIONS
+    @type options: {str : Any}
+    @return: paths of the HTML pages
+    @rtype [str]
+    @raise PdocError: if pdoc fails
+    '''
+    # Pages mirror the package, so links
+    # between them are relative paths:
+    options.setdefault('link_layout', 'tree')
+    runner     = PdocRunner(options)
+    html_paths = []
+    for (dir_path, dir_names, file_names) in os.walk(package_dir):
+        dir_names[:] = sorted(dir_name for dir_name in dir_names 
+                              if not dir_name.startswith('.') and dir_name != '__pycache__')
+        python_modules = [os.path.join(dir_path, file_name) for file_name in sorted(file_names)
+                          if file_name.endswith('.py') and not file_name.startswith('tmp_pdoc_')]
+        if len(python_modules) == 0:
+            continue
+        pdoc_arg_list = list(pdoc_args or [])
+        if html_dir is not None:
+            pdoc_arg_list += ['--html-dir', 
+                              os.path.normpath(os.path.join(html_dir, 
+                                                            os.path.relpath(dir_path, package_dir)))]
+        html_paths.extend(runner.run(pdoc_arg_list + python_modules))
+    return html_paths
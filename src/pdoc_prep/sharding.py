@@ -0,0 +1,207 @@
+'''
+Created on Oct 18, 2026
+
+Splitting a pdoc_run build across CI workers, and
+merging the shards' HTML directories into one tree. Each
+shard leaves a manifest of its modules and pages, which
+merge_shards() checks before anything is copied.
+
+@author: Andreas Paepcke
+'''
+import hashlib
+import json
+import os
+import re
+
+from .store import PageWriter
+
+# ---------------------------------- Exceptions -----------------
+
+class ShardMergeError(Exception):
+    pass
+
+# ---------------------------------- Sharding -----------------
+
+# A sharded build leaves one manifest per shard in its HTML
+# directory; merging writes a single manifest for the whole build:
+SHARD_MANIFEST_NAME  = 'pdoc_shard_%s_of_%s.json'
+SHARD_MANIFEST_PAT   = re.compile(r'^pdoc_shard_[0-9]+_of_[0-9]+\.json$')
+MERGED_MANIFEST_NAME = 'pdoc_manifest.json'
+
+#-------------------------
+# parse_shard_spec 
+#--------------
+
+def parse_shard_spec(shard_spec):
+    '''
+    Turn a shard spec such as '2/8' into (2, 8). Shards
+    are numbered from 0 through N-1.
+    
+    @param shard_spec: spec of the form i/N
+    @type shard_spec: str
+    @return: shard index and number of shards
+    @rtype (int, int)
+    @raise ValueError: if the spec is malformed or out of range
+    '''
+    try:
+        (shard_index, num_shards) = [int(part) for part in shard_spec.split('/')]
+    except ValueError:
+        raise ValueError("Shard spec must look like i/N, such as 0/4; got '%s'." % shard_spec)
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError("Shard index must be between 0 and N-1; got '%s'." % shard_spec)
+    return (shard_index, num_shards)
+
+#-------------------------
+# shard_keys 
+#--------------
+
+def shard_keys(python_modules):
+    '''
+    Map each module path to a key that is the same on every
+    machine: its path relative to the modules' common directory,
+    with forward slashes. 
+    
+    @param python_modules: paths of all modules of a build
+    @type python_modules: [str]
+    @return: module path to key
+    @rtype {str : str}
+    '''
+    abs_paths = [os.path.abspath(os.path.expanduser(python_module)) for python_module in python_modules]
+    if len(abs_paths) == 0:
+        return {}
+    root = os.path.commonpath([os.path.dirname(abs_path) for abs_path in abs_paths])
+    return {python_module : os.path.relpath(abs_path, root).replace(os.sep, '/')
+            for (python_module, abs_path) in zip(python_modules, abs_paths)}
+
+#-------------------------
+# shard_of 
+#--------------
+
+def shard_of(module_key, num_shards):
+    '''
+    Deterministically assign a module to one of num_shards
+    shards by hashing its key. Unlike hash(), the result
+    does not vary between processes.
+    
+    @param module_key: key from shard_keys()
+    @type module_key: str
+    @param num_shards: number of shards
+    @type num_shards: int
+    @return: shard index between 0 and num_shards-1
+    @rtype int
+    '''
+    digest = hashlib.sha1(module_key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+#-------------------------
+# modules_digest 
+#--------------
+
+def modules_digest(module_keys):
+    '''
+    Fingerprint of a build's complete module list, so that
+    merging can tell whether shards belong to the same build.
+    
+    @param module_keys: keys of all modules of the build
+    @type module_keys: [str]
+    @return: hex digest
+    @rtype str
+    '''
+    return hashlib.sha256('\n'.join(sorted(module_keys)).encode('utf-8')).hexdigest()
+
+#-------------------------
+# merge_shards 
+#--------------
+
+def merge_shards(shard_dirs, out_dir, page_writer=None):
+    '''
+    Combine the HTML directories of a sharded build into 
+    out_dir, and write a manifest of the whole build there.
+    Before anything is copied, the shard manifests are checked:
+    all shards of the build must be present exactly once, no
+    module or page may appear in more than one shard, and every
+    page a manifest lists must exist.
+    
+    @param shard_dirs: HTML directories of the shards
+    @type shard_dirs: [str]
+    @param out_dir: directory for the combined output
+    @type out_dir: str
+    @param page_writer: writer for the pages, e.g. one that skips
+        unchanged pages. Default: a plain PageWriter
+    @type page_writer: {None | PageWriter}
+    @return: paths of the pages in out_dir
+    @rtype [str]
+    @raise ShardMergeError: listing every problem found
+    '''
+    if page_writer is None:
+        page_writer = PageWriter()
+    
+    manifests = []
+    for shard_dir in shard_dirs:
+        for file_name in sorted(os.listdir(shard_dir)):
+            if SHARD_MANIFEST_PAT.match(file_name):
+                with open(os.path.join(shard_dir, file_name), 'r') as in_fd:
+                    manifests.append((shard_dir, json.load(in_fd)))
+    if len(manifests) == 0:
+        raise ShardMergeError("No shard manifests found in %s." % ', '.join(shard_dirs))
+    
+    problems = []
+    (_shard_dir, first) = manifests[0]
+    build_id = (first['num_shards'], first['num_modules'], first['modules_digest'])
+    for (shard_dir, manifest) in manifests:
+        if (manifest['num_shards'], manifest['num_modules'], manifest['modules_digest']) != build_id:
+            problems.append("Shard %s in %s belongs to a different build." % (manifest['shard'], shard_dir))
+    
+    shards_seen = {}
+    for (shard_dir, manifest) in manifests:
+        if manifest['shard'] in shards_seen:
+            problems.append("Shard %s appears in both %s and %s." % (manifest['shard'], 
+                                                                     shards_seen[manifest['shard']], 
+                                                                     shard_dir))
+        shards_seen[manifest['shard']] = shard_dir
+    for shard_index in range(first['num_shards']):
+        if shard_index not in shards_seen:
+            problems.append("Shard %s of %s is missing." % (shard_index, first['num_shards']))
+    
+    modules_seen = {}
+    pages_seen   = {}
+    for (shard_dir, manifest) in manifests:
+        for module_key in manifest['modules']:
+            if module_key in modules_seen:
+                problems.append("Module %s was documented by shards %s and %s." % (module_key,
+                                                                                   modules_seen[module_key],
+                                                                                   manifest['shard']))
+            modules_seen[module_key] = manifest['shard']
+        for page in manifest['pages']:
+            if page in pages_seen:
+                problems.append("Page %s was produced by shards %s and %s." % (page, 
+                                                                               pages_seen[page][1], 
+                                                                               manifest['shard']))
+            elif not os.path.exists(os.path.join(shard_dir, page)):
+                problems.append("Page %s of shard %s is missing from %s." % (page, manifest['shard'], shard_dir))
+            pages_seen[page] = (shard_dir, manifest['shard'])
+    if len(modules_seen) != first['num_modules']:
+        problems.append("Shards documented %s of %s modules." % (len(modules_seen), first['num_modules']))
+    
+    if len(problems) > 0:
+        raise ShardMergeError('\n'.join(problems))
+    
+    page_paths = []
+    for (page, (shard_dir, _shard_index)) in sorted(pages_seen.items()):
+        with open(os.path.join(shard_dir, page), 'r', encoding='utf-8') as in_fd:
+            html = in_fd.read()
+        page_path = os.path.join(out_dir, page)
+        os.makedirs(os.path.dirname(page_path), exist_ok=True)
+        page_writer.write(page_path, html)
+        page_paths.append(page_path)
+    
+    with open(os.path.join(out_dir, MERGED_MANIFEST_NAME), 'w') as out_fd:
+        json.dump({'num_shards'     : first['num_shards'],
+                   'num_modules'    : first['num_modules'],
+                   'modules_digest' : first['modules_digest'],
+                   'modules'        : sorted(modules_seen),
+                   'pages'          : sorted(pages_seen)
+                   }, 
+                  out_fd, indent=2)
+        out_fd.write('\n')
+    return page_paths
@@ -0,0 +1,186 @@
+'''
+Created on Oct 18, 2026
+
+Source maps from the lines of a transformed module
+back to the lines of the original.
+
+@author: Andreas Paepcke
+'''
+from array import array
+import json
+import os
+import re
+
+# ---------------------------------- Source Maps -----------------
+
+class SourceMap(object):
+    '''
+    Maps each line of a transformed module back to the line
+    of the original module that it starts on. PdocPrep joins
+    the lines of multiline descriptions, and of docstring
+    paragraphs with blank lines, so later lines shift.
+
+    Kept as an array with one unsigned int per output line,
+    the zero-based number of its original line. Line numbers
+    taken and returned by the methods count from 1, as in
+    tracebacks.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, lines=None):
+        '''
+        @param lines: zero-based original line of each output line. Default: none yet
+        @type lines: {None | [int]}
+        '''
+        self.lines = array('I', [] if lines is None else lines)
+
+    #-------------------------
+    # append_identity
+    #--------------
+
+    def append_identity(self, first_line, end_line):
+        '''
+        Append output lines that are the original lines
+        first_line up to, not including, end_line.
+
+        @param first_line: zero-based first original line
+        @type first_line: int
+        @param end_line: zero-based end of the original lines
+        @type end_line: int
+        '''
+        self.lines.extend(range(first_line, end_line))
+
+    #-------------------------
+    # original_line
+    #--------------
+
+    def original_line(self, out_line):
+        '''
+        @param out_line: line in the transformed module, counting from 1
+        @type out_line: int
+        @return: the original line it starts on, counting from 1;
+            out_line itself if the map does not cover it
+        @rtype int
+        '''
+        if 1 <= out_line <= len(self.lines):
+            return self.lines[out_line - 1] + 1
+        return out_line
+
+    #-------------------------
+    # translate
+    #--------------
+
+    def translate(self, text, prepped_path, python_module):
+        '''
+        Rewrite references to lines of the transformed module,
+        such as in tracebacks or error messages, to refer to the
+        original module instead. Recognizes 'File "<path>", line <n>'
+        and '<path>:<n>'. Remaining mentions of the transformed
+        module's name are replaced by the original's.
+
+        @param text: output of a tool that read the transformed module
+        @type text: str
+        @param prepped_path: path of the transformed module
+        @type prepped_path: str
+        @param python_module: path of the original module
+        @type python_module: str
+        @return: the rewritten text
+        @rtype str
+        '''
+        line_ref_pat = re.compile(r'%s(", line |:)(\d+)' % re.escape(prepped_path))
+        text = line_ref_pat.sub(lambda match: '%s%s%s' % (python_module,
+                                                         match.group(1),
+                                                         self.original_line(int(match.group(2)))),
+                                text)
+        prepped_root = os.path.splitext(os.path.basename(prepped_path))[0]
+        orig_root    = os.path.splitext(os.path.basename(python_module))[0]
+        return text.replace(prepped_root, orig_root)
+
+    #-------------------------
+    # write
+    #--------------
+
+    def write(self, path, source=None):
+        '''
+        Write the map as JSON.
+
+        @param path: destination file
+        @type path: str
+        @param source: name of the original module to record. Default: None
+        @type source: {None | str}
+        '''
+        with open(path, 'w') as out_fd:
+            json.dump({'version' : SourceMap.VERSION,
+                       'source'  : source,
+                       'lines'   : self.lines.tolist()
+                       }, out_fd, separators=(',', ':'))
+            out_fd.write('\n')
+
+    #-------------------------
+    # load
+    #--------------
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Read a map that write() wrote.
+
+        @param path: map file
+        @type path: str
+        @return: the map
+        @rtype SourceMap
+        @raise ValueError: if the file is not a source map of this version
+        '''
+        with open(path, 'r') as in_fd:
+            content = json.load(in_fd)
+        if not isinstance(content, dict) or content.get('version') != SourceMap.VERSION:
+            raise ValueError("File %s is not a version %s source map." % (path, SourceMap.VERSION))
+        return cls(content['lines'])
+
+#-------------------------
+# SourceMapWriter
+#--------------
+
+class SourceMapWriter(object):
+    '''
+    Stands in for the output stream of a PdocPrep, and
+    records in a SourceMap the original line that is being
+    worked on whenever an output line starts. The engine
+    keeps src_line current.
+    '''
+
+    def __init__(self, out_fd, source_map, src_line=0):
+        self.out_fd        = out_fd
+        self.source_map    = source_map
+        self.src_line      = src_line
+        self.at_line_start = True
+
+    def write(self, text):
+        if len(text) == 0:
+            return
+        self.out_fd.write(text)
+        lines = self.source_map.lines
+        if self.at_line_start:
+            lines.append(self.src_line)
+        num_newlines = text.count('\n')
+        if num_newlines == 0:
+            self.at_line_start = False
+            return
+        self.at_line_start = text[-1] == '\n'
+        # Lines started within text:
+        num_started = num_newlines - 1 if self.at_line_start else num_newlines
+        if num_started > 0:
+            lines.extend([self.src_line] * num_started)
+
+    def copy(self, text):
+        '''
+        Write original lines, starting at src_line, unchanged.
+        '''
+        if len(text) == 0:
+            return
+        self.out_fd.write(text)
+        num_lines = text.count('\n') + (0 if text[-1] == '\n' else 1)
+        self.source_map.append_identity(self.src_line, self.src_line + num_lines)
+        self.src_line += num_lines
+        self.at_line_start = text[-1] == '\n'
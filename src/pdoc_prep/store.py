@@ -0,0 +1,292 @@
+'''
+Created on Oct 18, 2026
+
+Output side of pdoc_run: PageWriter, which leaves pages
+whose content did not change untouched, and PageStore, a
+content-addressed store of compressed pages that keeps 
+several versions of the docs.
+
+@author: Andreas Paepcke
+'''
+import gzip
+import hashlib
+from io import BytesIO
+import json
+import os
+import posixpath
+import tempfile
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    # Only needed for brotli-compressed page stores:
+    brotli = None
+
+# ---------------------------------- Class PageWriter -----------------
+
+class PageWriter(object):
+    '''
+    Writes finished HTML pages. With skip_unchanged, a page
+    whose content hashes the same as the file already on disk
+    is not written, so the file's mtime stays put, and caches
+    or rsync runs downstream see no change.
+    
+    Pages are written as UTF-8 bytes without newline translation,
+    so the same content always yields the same bytes.
+    
+    Safe to share between threads.
+    '''
+    
+    def __init__(self, skip_unchanged=False):
+        '''
+        @param skip_unchanged: if True, leave files whose content
+            would not change untouched. Default: False
+        @type skip_unchanged: bool
+        '''
+        self.skip_unchanged = skip_unchanged
+        self.changed   = []
+        self.unchanged = []
+        self.lock      = threading.Lock()
+
+    #-------------------------
+    # write 
+    #--------------
+    
+    def write(self, path, text):
+        '''
+        Write text to path, unless skip_unchanged is in force,
+        and the file already holds exactly this text.
+        
+        @param path: destination file
+        @type path: str
+        @param text: page content
+        @type text: str
+        @return: True if the file was written, else False
+        @rtype bool
+        '''
+        content = text.encode('utf-8')
+        if self.skip_unchanged and self.file_digest(path) == hashlib.sha256(content).hexdigest():
+            with self.lock:
+                self.unchanged.append(path)
+            return False
+        
+        with open(path, 'wb') as out_fd:
+            out_fd.write(content)
+        with self.lock:
+            self.changed.append(path)
+        return True
+
+    #-------------------------
+    # file_digest 
+    #--------------
+    
+    def file_digest(self, path):
+        '''
+        Return the SHA-256 hex digest of a file's content,
+        or None if the file does not exist.
+        
+        @param path: file to hash
+        @type path: str
+        @return: hex digest, or None
+        @rtype {None | str}
+        '''
+        try:
+            with open(path, 'rb') as in_fd:
+                return hashlib.sha256(in_fd.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    #-------------------------
+    # summary 
+    #--------------
+    
+    def summary(self):
+        '''
+        One line report of how many pages changed.
+        
+        @return: the report
+        @rtype str
+        '''
+        num_pages = len(self.changed) + len(self.unchanged)
+        return "%s of %s pages changed; %s left untouched." % (len(self.changed), 
+                                                               num_pages, 
+                                                               len(self.unchanged))
+
+
+# ---------------------------------- Page Store -----------------
+
+class PageStore(object):
+    '''
+    Content-addressed store of finished pages, for hosting
+    many versions of the docs. Each distinct page is kept
+    once, as a blob named by the SHA-256 of its content, 
+    optionally precompressed so a web server can send it 
+    as is with a Content-Encoding header. Each version of 
+    the docs is a small manifest that maps module keys
+    (see shard_keys()) to their page's name and blob:
+    <pre>
+        <store_dir>/blobs/3f/3fa9...c1.html.gz
+        <store_dir>/manifests/<version>.json
+    </pre>
+    A page that an earlier version already stored costs
+    nothing but its hash. Blobs and manifests are written
+    to a temp file first, and renamed into place.
+    
+    Safe to share between threads.
+    '''
+    
+    # Compression to blob file name suffix:
+    COMPRESSIONS = {'none'   : '.html',
+                    'gzip'   : '.html.gz',
+                    'brotli' : '.html.br'
+                    }
+    
+    def __init__(self, store_dir, compression='gzip'):
+        '''
+        @param store_dir: root directory of the store
+        @type store_dir: str
+        @param compression: a key of COMPRESSIONS. Default: 'gzip'
+        @type compression: str
+        @raise ValueError: if the compression is unknown, or is
+            'brotli' while the brotli package is not installed
+        '''
+        if compression not in PageStore.COMPRESSIONS:
+            raise ValueError("Compression must be one of %s, not '%s'." % 
+                             (', '.join(PageStore.COMPRESSIONS), compression))
+        if compression == 'brotli' and brotli is None:
+            raise ValueError("Compression 'brotli' needs the brotli package; try 'pip install brotli'.")
+        self.store_dir   = store_dir
+        self.compression = compression
+        self.stored = 0
+        self.reused = 0
+        self.lock   = threading.Lock()
+
+    #-------------------------
+    # put 
+    #--------------
+    
+    def put(self, content):
+        '''
+        Add a page to the store, unless already there.
+        
+        @param content: the page's bytes
+        @type content: bytes
+        @return: path of the blob, relative to the store directory
+        @rtype str
+        '''
+        digest = hashlib.sha256(content).hexdigest()
+        blob = posixpath.join('blobs', digest[:2], digest + PageStore.COMPRESSIONS[self.compression])
+        blob_path = os.path.join(self.store_dir, *blob.split('/'))
+        if os.path.exists(blob_path):
+            with self.lock:
+                self.reused += 1
+            return blob
+        self.write_atomic(blob_path, self.compress(content))
+        with self.lock:
+            self.stored += 1
+        return blob
+
+    #-------------------------
+    # compress 
+    #--------------
+    
+    def compress(self, content):
+        '''
+        Compress a page. The gzip header carries neither
+        name nor time, so equal pages compress to equal bytes.
+        
+        @param content: the page's bytes
+        @type content: bytes
+        @return: the compressed bytes
+        @rtype bytes
+        '''
+        if self.compression == 'gzip':
+            buffer = BytesIO()
+            with gzip.GzipFile(filename='', mode='wb', fileobj=buffer, mtime=0) as gzip_fd:
+                gzip_fd.write(content)
+            return buffer.getvalue()
+        if self.compression == 'brotli':
+            return brotli.compress(content, mode=brotli.MODE_TEXT)
+        return content
+
+    #-------------------------
+    # add_version 
+    #--------------
+    
+    def add_version(self, version, pages, html_dir=None):
+        '''
+        Store the pages of one version of the docs, and
+        write its manifest, replacing any of the same name.
+        
+        @param version: name of the version, such as '1.4.2'
+        @type version: str
+        @param pages: module key to path of its page
+        @type pages: {str : str}
+        @param html_dir: if provided, page names in the manifest
+            are relative to it; else they are the pages' file names
+        @type html_dir: {None | str}
+        @return: path of the manifest
+        @rtype str
+        @raise ValueError: if the version name is not a plain file name
+        '''
+        if version in ('', '.', '..') or '/' in version or os.sep in version:
+            raise ValueError("Store version must be a plain name, such as '1.4.2'; got '%s'." % version)
+        entries = {}
+        for (module_key, page_path) in sorted(pages.items()):
+            with open(page_path, 'rb') as in_fd:
+                content = in_fd.read()
+            page = os.path.basename(page_path) if html_dir is None else os.path.relpath(page_path, html_dir)
+            entries[module_key] = {'page' : page.replace(os.sep, '/'),
+                                   'blob' : self.put(content),
+                                   'size' : len(content)
+                                   }
+        manifest = {'version'     : version,
+                    'compression' : self.compression,
+                    'created'     : time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'modules'     : entries
+                    }
+        manifest_path = os.path.join(self.store_dir, 'manifests', version + '.json')
+        self.write_atomic(manifest_path, (json.dumps(manifest, indent=2) + '\n').encode('utf-8'))
+        return manifest_path
+
+    #-------------------------
+    # write_atomic 
+    #--------------
+    
+    def write_atomic(self, path, content):
+        '''
+        Write a file in one step, so readers never see
+        part of it.
+        
+        @param path: destination file
+        @type path: str
+        @param content: what to write
+        @type content: bytes
+        '''
+        out_dir = os.path.dirname(path)
+        os.makedirs(out_dir, exist_ok=True)
+        (tmp_fd, tmp_path) = tempfile.mkstemp(prefix='.tmp_store_', dir=out_dir)
+        try:
+            with os.fdopen(tmp_fd, 'wb') as out_fd:
+                out_fd.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    #-------------------------
+    # summary 
+    #--------------
+    
+    def summary(self):
+        '''
+        One line report of how many pages were new to the store.
+        
+        @return: the report
+        @rtype str
+        '''
+        return "%s of %s pages stored; %s already in the store." % (self.stored,
+                                                                    self.stored + self.reused,
+                                                                    self.reused)
@@ -0,0 +1,264 @@
+'''
+Created on Oct 18, 2026
+
+Package-wide index from class and function names to
+the pdoc pages that document them, for linking the names
+in type specs.
+
+@author: Andreas Paepcke
+'''
+import ast
+import hashlib
+import json
+import os
+import posixpath
+import tempfile
+
+# ---------------------------------- Cross References -----------------
+
+class SymbolIndex(object):
+    '''
+    Package-wide index from class and function names to the
+    pdoc pages and anchors that document them. Built by parsing
+    each module with ast, without importing anything. With a
+    cache file, only modules whose size or mtime changed since
+    the cache was written are parsed again.
+    
+    Each definition is found under its fully qualified name,
+    such as pkg.mod.Foo, under its module-qualified name, mod.Foo,
+    and under its qualified name within the module, Foo, or 
+    Foo.bar for a method. A name that several modules define
+    is ambiguous and is not linked, except from within the 
+    module that defines it.
+    
+    Pages are assumed to lie in one directory (flat), as 
+    pdoc_run with an --html-dir places them, or in the same
+    directory tree as the modules (not flat). 
+    '''
+    
+    CACHE_VERSION = 1
+    
+    def __init__(self, package_dir, cache_path=None, flat=True):
+        '''
+        @param package_dir: root directory of the package to index
+        @type package_dir: str
+        @param cache_path: file to keep the index in between runs. Default: no cache
+        @type cache_path: {None | str}
+        @param flat: whether all pages lie in one directory. Default: True
+        @type flat: bool
+        '''
+        self.package_dir = os.path.abspath(package_dir)
+        self.flat        = flat
+        # Name to (module path relative to package_dir, anchor),
+        # or to None if ambiguous:
+        self.symbols     = {}
+        # Number of modules indexed, and of those parsed,
+        # rather than taken from the cache:
+        self.num_modules = 0
+        self.num_parsed  = 0
+        self.build(cache_path)
+
+    #-------------------------
+    # build 
+    #--------------
+    
+    def build(self, cache_path):
+        '''
+        Collect the definitions of every module below package_dir,
+        from the cache where it is current, and update the cache.
+        
+        @param cache_path: cache file, or None
+        @type cache_path: {None | str}
+        '''
+        cached = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as in_fd:
+                    cache = json.load(in_fd)
+                if cache.get('version') == SymbolIndex.CACHE_VERSION and \
+                   cache.get('package_dir') == self.package_dir:
+                    cached = cache['modules']
+            except ValueError:
+                # Corrupt cache; rebuild:
+                cached = {}
+        
+        modules = {}
+        for (dir_path, dir_names, file_names) in os.walk(self.package_dir):
+            dir_names[:] = sorted(dir_name for dir_name in dir_names 
+                                  if not dir_name.startswith('.') and dir_name != '__pycache__')
+            for file_name in sorted(file_names):
+                if not file_name.endswith('.py') or file_name.startswith('tmp_pdoc_'):
+                    continue
+                path     = os.path.join(dir_path, file_name)
+                rel_path = os.path.relpath(path, self.package_dir).replace(os.sep, '/')
+                stat     = os.stat(path)
+                entry    = cached.get(rel_path)
+                if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                    entry = {'mtime_ns' : stat.st_mtime_ns,
+                             'size'     : stat.st_size,
+                             'defs'     : self.module_defs(path)
+                             }
+                    self.num_parsed += 1
+                modules[rel_path] = entry
+        
+        if cache_path is not None and (self.num_parsed > 0 or len(modules) != len(cached)):
+            # Replaced in one step, so that a concurrent
+            # or interrupted run never leaves half a cache:
+            cache_dir = os.path.dirname(os.path.abspath(cache_path))
+            (tmp_fd, tmp_path) = tempfile.mkstemp(prefix='.tmp_symbols_', dir=cache_dir)
+            try:
+                with os.fdopen(tmp_fd, 'w') as out_fd:
+                    json.dump({'version'     : SymbolIndex.CACHE_VERSION,
+                               'package_dir' : self.package_dir,
+                               'modules'     : modules
+                               }, out_fd)
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        
+        self.num_modules = len(modules)
+        for (rel_path, entry) in modules.items():
+            self.add_module(rel_path, entry['defs'])
+
+    #-------------------------
+    # digest 
+    #--------------
+    
+    def digest(self):
+        '''
+        Digest of the index's content: which names link
+        where. Pages with type links are current only while 
+        it stays the same.
+        
+        @return: hex digest
+        @rtype str
+        '''
+        content = json.dumps([self.flat, sorted(self.symbols.items())])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    #-------------------------
+    # module_defs 
+    #--------------
+    
+    def module_defs(self, path):
+        '''
+        Qualified names of the classes and functions a module
+        defines at top level, and of the members of those classes.
+        
+        @param path: path to the module
+        @type path: str
+        @return: names such as 'Foo', 'Foo.bar', and 'fum'
+        @rtype [str]
+        '''
+        def_types = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+        try:
+            with open(path, 'rb') as in_fd:
+                tree = ast.parse(in_fd.read(), path)
+        except (SyntaxError, ValueError):
+            return []
+        defs = []
+        for node in tree.body:
+            if not isinstance(node, def_types):
+                continue
+            defs.append(node.name)
+            if isinstance(node, ast.ClassDef):
+                defs.extend(node.name + '.' + member.name for member in node.body 
+                            if isinstance(member, def_types))
+        return defs
+
+    #-------------------------
+    # add_module 
+    #--------------
+    
+    def add_module(self, rel_path, defs):
+        '''
+        Enter a module's definitions under all their names.
+        
+        @param rel_path: module path relative to package_dir
+        @type rel_path: str
+        @param defs: qualified names within the module
+        @type defs: [str]
+        '''
+        mod_name   = self.dotted_name(rel_path)
+        (base, _ext) = os.path.splitext(os.path.basename(rel_path))
+        for qual_name in defs:
+            # pdoc names a module after its file:
+            target = (rel_path, base + '.' + qual_name)
+            for name in (mod_name + '.' + qual_name, base + '.' + qual_name, qual_name):
+                if name in self.symbols and self.symbols[name] != target:
+                    self.symbols[name] = None
+                else:
+                    self.symbols[name] = target
+
+    #-------------------------
+    # dotted_name 
+    #--------------
+    
+    def dotted_name(self, rel_path):
+        '''
+        Module name of a module path relative to package_dir:
+        pkg/mod.py becomes pkg.mod, and pkg/__init__.py pkg.
+        
+        @param rel_path: module path relative to package_dir
+        @type rel_path: str
+        @return: dotted module name
+        @rtype str
+        '''
+        (mod_path, _ext) = os.path.splitext(rel_path)
+        if mod_path.endswith('/__init__'):
+            mod_path = mod_path[:-len('/__init__')]
+        return mod_path.replace('/', '.')
+
+    #-------------------------
+    # module_rel_path 
+    #--------------
+    
+    def module_rel_path(self, file_name):
+        '''
+        Path of a module relative to package_dir, or None if 
+        the module is not below package_dir.
+        
+        @param file_name: path of the module
+        @type file_name: {None | str}
+        @return: relative path, or None
+        @rtype {None | str}
+        '''
+        if file_name is None:
+            return None
+        rel_path = os.path.relpath(os.path.abspath(file_name), self.package_dir).replace(os.sep, '/')
+        return None if rel_path.startswith('../') else rel_path
+
+    #-------------------------
+    # lookup 
+    #--------------
+    
+    def lookup(self, name, from_rel_path=None):
+        '''
+        Find the href that documents name. A name the
+        referring module defines itself is preferred.
+        
+        @param name: name as written in a type spec, such as Foo or pkg.mod.Foo
+        @type name: str
+        @param from_rel_path: path of the referring module relative to package_dir
+        @type from_rel_path: {None | str}
+        @return: href, or None if name is unknown or ambiguous
+        @rtype {None | str}
+        '''
+        target = None
+        if from_rel_path is not None:
+            target = self.symbols.get(self.dotted_name(from_rel_path) + '.' + name)
+        if target is None:
+            target = self.symbols.get(name)
+        if target is None:
+            return None
+        
+        (rel_path, anchor) = target
+        (mod_path, _ext)   = os.path.splitext(rel_path)
+        if self.flat:
+            page = os.path.basename(mod_path) + '.m.html'
+        else:
+            page = mod_path + '.m.html'
+            if from_rel_path is not None:
+                page = posixpath.relpath(page, posixpath.dirname(from_rel_path) or '.')
+        return page + '#' + anchor
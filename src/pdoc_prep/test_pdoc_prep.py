@@ -3,16 +3,70 @@ Created on Dec 20, 2018
 
 @author: paepcke
 '''
+from contextlib import redirect_stderr
+import gzip
+import hashlib
 from io import StringIO
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
 import unittest
 from unittest import skipIf
+from unittest.mock import patch
 
 from .pdoc_prep import PdocPrep , ParseInfo
 from .pdoc_prep import NoParamError, NoTypeError, ParamTypeMismatch
+from .pdoc_prep import transform_text, transform_file
+from .grammars import SectionGrammar, GoogleGrammar
+from .diagnostics import DiagnosticsCollector, DiagnosticsError
+from .profiling import PhaseProfiler
+from .htmlprep import PdocHtmlPrep
+from .batch import BatchPrep
+from .chunked import ChunkedPrep
+from .sourcemap import SourceMap
+from .symbols import SymbolIndex
+from .markup import Markup, make_markup
+from .encoding import source_encoding
+from .runner import render_module, render_package, PdocError, PdocTimeout, PdocRunner
+from .runner import JOURNAL_NAME, HOST_TAG, remove_orphaned_tmp_files
+from .store import PageWriter, PageStore
+from .metrics import BuildMetrics
+from .sharding import ShardMergeError, merge_shards, parse_shard_spec
 
 RUN_ALL = True
 #RUN_ALL = False
 
+# Stand-in for the pdoc command line: writes the module
+# source into the page pdoc would produce:
+FAKE_PDOC = '''import os, sys
+args = sys.argv[1:]
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_pdoc.log'), 'a') as log_fd:
+    log_fd.write(args[-1] + '\\n')
+html_dir = args[args.index('--html-dir') + 1]
+pages = {}
+if os.path.isdir(args[-1]):
+    # A package gets a directory of pages; private modules none:
+    html_dir = os.path.join(html_dir, os.path.basename(args[-1]))
+    for file_name in os.listdir(args[-1]):
+        if file_name == '__init__.py':
+            pages[os.path.join(args[-1], file_name)] = 'index.html'
+        elif file_name.endswith('.py') and not file_name.startswith('_'):
+            pages[os.path.join(args[-1], file_name)] = file_name[:-3] + '.m.html'
+else:
+    module = [arg for arg in args if arg.endswith('.py')][-1]
+    pages[module] = os.path.basename(module)[:-3] + '.m.html'
+os.makedirs(html_dir, exist_ok=True)
+for (module, page) in pages.items():
+    with open(module) as in_fd:
+        src = in_fd.read()
+    with open(os.path.join(html_dir, page), 'w') as out_fd:
+        out_fd.write('<div class="desc"><p>' + src + '</p></div>')
+'''
+
 class TestPdocPostProd(unittest.TestCase):
 
     content_good = \
@@ -103,6 +157,59 @@ class TestPdocPostProd(unittest.TestCase):
        :type foo: int
        """'''
 
+    content_google = \
+    '''"""Foo is bar
+       Args:
+           tableName (String): name of new table
+               that I created just for you.
+           colName: name of column
+       Returns:
+           int: a number between 1 and 10
+       Raises:
+           ValueError: if no table
+       """'''
+
+    content_numpy = \
+    '''"""Foo is bar
+       Parameters
+       ----------
+       tableName : String
+           name of new table
+           that I created just for you.
+       Returns
+       -------
+       int
+           a number between 1 and 10
+       Raises
+       ------
+       ValueError
+       """'''
+
+    content_html = \
+    '''  <header id="section-intro">
+  <h1 class="title"><span class="name">foo</span> module</h1>
+  <p>Foo is bar</p>
+  <div class="source_cont">
+  </div>
+  </header>
+    <div class="desc"><p>Foo is bar</p>
+<p>:param tableName: name of new table
+    that I created just for you.
+:type tableName: String
+:return: a number between 1 and 10</p>
+<div class="codehilite"><pre>x = 1</pre></div>
+<p>:rtype int</p></div>
+    <div class="desc"><p>Blue is green</p></div>
+'''
+
+    content_no_directives = \
+    '''def foo(bar):
+       """Foo is bar
+
+       Blue is green
+       """
+       return bar
+    '''
     
     #-------------------------
     # setUp 
@@ -320,6 +427,1155 @@ class TestPdocPostProd(unittest.TestCase):
             # Clean out the capture stream:
             self.capture_stream = StringIO()           
             
+    #-------------------------
+    # testGoogleSections 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testGoogleSections(self):
+        in_stream = StringIO(TestPdocPostProd.content_google)
+        PdocPrep(in_stream, self.capture_stream)
+        
+        res = self.capture_stream.getvalue()
+        expected = '"""Foo is bar\n' +\
+                   '           <b>tableName</b> (<b></i>String</i></b>): name of new table that I created just for you.</br>' +\
+                   '           <b>colName</b> name of column</br>' +\
+                   '           <b>returns:</b> a number between 1 and 10</br>' +\
+                   '           <b>return type:</b> int</br>' +\
+                   '           <b>raises:</b> ValueError: if no table</br>' +\
+                   '       """'
+        self.assertEqual(res, expected)
+
+    #-------------------------
+    # testNumpySections 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testNumpySections(self):
+        in_stream = StringIO(TestPdocPostProd.content_numpy)
+        PdocPrep(in_stream, self.capture_stream)
+        
+        res = self.capture_stream.getvalue()
+        expected = '"""Foo is bar\n' +\
+                   '       <b>tableName</b> (<b></i>String</i></b>): name of new table that I created just for you.</br>' +\
+                   '       <b>returns:</b> a number between 1 and 10</br>' +\
+                   '       <b>return type:</b> int</br>' +\
+                   '       <b>raises:</b> ValueError</br>' +\
+                   '       """'
+        self.assertEqual(res, expected)
+
+    #-------------------------
+    # testSectionsTypecheck 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSectionsTypecheck(self):
+        in_stream = StringIO(TestPdocPostProd.content_google)
+        with self.assertRaises(NoTypeError):
+            PdocPrep(in_stream, self.capture_stream, force_type_spec=True)
+
+    #-------------------------
+    # testSectionStylesOff 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSectionStylesOff(self):
+        for content in [TestPdocPostProd.content_google, TestPdocPostProd.content_numpy]:
+            in_stream = StringIO(content)
+            PdocPrep(in_stream, self.capture_stream, section_styles=[])
+            self.assertEqual(self.capture_stream.getvalue(), content)
+            # Clean out the capture stream:
+            self.capture_stream = StringIO()
+
+    #-------------------------
+    # testSectionGrammarAbstract 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSectionGrammarAbstract(self):
+        with self.assertRaises(TypeError):
+            SectionGrammar()
+        
+        # A style must implement all three line checks:
+        class HalfGrammar(SectionGrammar):
+            def section_header(self, stripped, next_line):
+                return None
+        with self.assertRaises(TypeError):
+            HalfGrammar()
+        self.assertIsInstance(GoogleGrammar(), SectionGrammar)
+
+    #-------------------------
+    # testDiagnosticsCollected 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testDiagnosticsCollected(self):
+        diagnostics = DiagnosticsCollector()
+        for (file_name, content) in [('no_param.py', TestPdocPostProd.content_no_param),
+                                     ('mismatch.py', TestPdocPostProd.content_param_type_mismatch),
+                                     ('no_rtype.py', TestPdocPostProd.content_return_no_rtype),
+                                     # Each irregularity is reported once:
+                                     ('two_params.py', "def f(a, b):\n    '''\n    :param a: the a\n" +\
+                                                       "    :param b: the b\n    :type b: int\n    '''\n"),
+                                     ('two_returns.py', "def f():\n    '''\n    :return: the x\n" +\
+                                                        "    :return: the y\n    :rtype: int\n    '''\n")
+                                     ]:
+            # Would raise at the first irregularity without the collector:
+            PdocPrep(StringIO(content), 
+                     StringIO(), 
+                     delimiter_char=':',
+                     force_type_spec=True,
+                     file_name=file_name,
+                     diagnostics=diagnostics)
+        
+        records = [(diagnostic.file_name, diagnostic.line, diagnostic.error_class, diagnostic.parm_name)
+                   for diagnostic in diagnostics.diagnostics]
+        self.assertEqual(records, [('no_param.py', 2, 'NoParamError', 'tableName'),
+                                   ('mismatch.py', 3, 'ParamTypeMismatch', 'tableName'),
+                                   ('mismatch.py', 5, 'NoTypeError', 'tableName'),
+                                   ('no_rtype.py', 6, 'NoTypeError', None),
+                                   ('two_params.py', 4, 'NoTypeError', 'a'),
+                                   ('two_returns.py', 4, 'DoubleReturnError', None)
+                                   ])
+        
+        as_dict = json.loads(diagnostics.to_json())
+        self.assertEqual(as_dict['total'], 6)
+        self.assertEqual(as_dict['counts'], {'NoParamError' : 1, 'ParamTypeMismatch' : 1, 'NoTypeError' : 3,
+                                             'DoubleReturnError' : 1})
+        
+        # No fail-at-end policy was requested:
+        diagnostics.check()
+
+    #-------------------------
+    # testDiagnosticsCapsAndFailAtEnd 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testDiagnosticsCapsAndFailAtEnd(self):
+        diagnostics = DiagnosticsCollector(max_per_file=1, fail_at_end=True)
+        PdocPrep(StringIO(TestPdocPostProd.content_param_type_mismatch), 
+                 StringIO(), 
+                 delimiter_char=':',
+                 force_type_spec=True,
+                 diagnostics=diagnostics)
+        self.assertEqual(len(diagnostics.diagnostics), 1)
+        self.assertEqual(diagnostics.num_dropped, 1)
+        self.assertEqual(diagnostics.num_found(), 2)
+        with self.assertRaises(DiagnosticsError):
+            diagnostics.check()
+
+    #-------------------------
+    # testProfileParse 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testProfileParse(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_base = os.path.join(tmp_dir, 'prof', 'mymod')
+            profiler = PhaseProfiler(out_base, profile=True, trace_memory=True)
+            PdocPrep(StringIO(TestPdocPostProd.content_good), 
+                     self.capture_stream, 
+                     delimiter_char=':',
+                     profiler=profiler)
+            self.assertEqual(sorted(os.path.basename(path) for path in profiler.files_written),
+                             ['mymod.parse.mem.txt', 'mymod.parse.prof', 'mymod.parse.prof.txt'])
+            for path in profiler.files_written:
+                self.assertTrue(os.path.getsize(path) > 0)
+
+    #-------------------------
+    # testHtmlPostprocess 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testHtmlPostprocess(self):
+        for delimiter_char in [':', '@']:
+            adjusted_content = self.set_delimiter_char(TestPdocPostProd.content_html, delimiter_char)
+            PdocHtmlPrep(StringIO(adjusted_content), self.capture_stream, delimiter_char=delimiter_char)
+            
+            res = self.capture_stream.getvalue()
+            expected = TestPdocPostProd.content_html.replace(
+                '<p>:param tableName: name of new table\n' +\
+                '    that I created just for you.\n' +\
+                ':type tableName: String\n' +\
+                ':return: a number between 1 and 10</p>',
+                '<p><b>tableName</b> (<b></i>String</i></b>): name of new table that I created just for you.</br>' +\
+                '<b>returns:</b> a number between 1 and 10</br></p>').replace(
+                '<p>:rtype int</p>',
+                '<p><b>return type:</b> int</br></p>')
+            self.assertEqual(res, expected)
+            # Clean out the capture stream:
+            self.capture_stream = StringIO()
+
+    #-------------------------
+    # testHtmlSpecsAcrossParagraphs 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testHtmlSpecsAcrossParagraphs(self):
+        # The :return: and :rtype: of content_html are split 
+        # by a code block; under typecheck that is no error:
+        PdocHtmlPrep(StringIO(TestPdocPostProd.content_html), self.capture_stream, 
+                     delimiter_char=':', force_type_spec=True)
+        self.assertIn('<p><b>return type:</b> int</br></p>', self.capture_stream.getvalue())
+        
+        # Same for a parameter and its type:
+        split_param = '<div class="desc"><p>:param tableName: name of new table</p>\n' +\
+                      '<div class="codehilite"><pre>x = 1</pre></div>\n' +\
+                      '<p>:type tableName: String</p></div>\n'
+        self.capture_stream = StringIO()
+        PdocHtmlPrep(StringIO(split_param), self.capture_stream, 
+                     delimiter_char=':', force_type_spec=True)
+        self.assertEqual(self.capture_stream.getvalue(),
+                         '<div class="desc"><p><b>tableName</b> name of new table</br></p>\n' +\
+                         '<div class="codehilite"><pre>x = 1</pre></div>\n' +\
+                         '<p>(<b></i>String</i></b>): </p></div>\n')
+        
+        # A description continued in the next paragraph stays 
+        # there, and a type missing from the whole block is 
+        # still reported:
+        no_rtype = '<div class="desc"><p>:return: a number</p>\n' +\
+                   '<p>between 1 and 10</p></div>\n'
+        self.capture_stream = StringIO()
+        PdocHtmlPrep(StringIO(no_rtype), self.capture_stream, delimiter_char=':')
+        self.assertEqual(self.capture_stream.getvalue(),
+                         '<div class="desc"><p><b>returns:</b> a number</br></p>\n' +\
+                         '<p>between 1 and 10</br></p></div>\n')
+        with self.assertRaises(NoTypeError):
+            PdocHtmlPrep(StringIO(no_rtype), StringIO(), 
+                         delimiter_char=':', force_type_spec=True)
+        self.capture_stream = StringIO()
+
+    #-------------------------
+    # testNoDirectivesPassThrough 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testNoDirectivesPassThrough(self):
+        for delimiter_char in [':', '@']:
+            in_stream = StringIO(TestPdocPostProd.content_no_directives)
+            PdocPrep(in_stream, self.capture_stream, delimiter_char=delimiter_char)
+            
+            # Not even the blank docstring line may be touched:
+            res = self.capture_stream.getvalue()
+            self.assertEqual(res, TestPdocPostProd.content_no_directives)
+            # Clean out the capture stream:
+            self.capture_stream = StringIO()
+
+    #-------------------------
+    # testMayContainDirectives 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testMayContainDirectives(self):
+        parse_info = ParseInfo(':')
+        self.assertFalse(parse_info.may_contain_directives(TestPdocPostProd.content_no_directives))
+        self.assertTrue(parse_info.may_contain_directives(TestPdocPostProd.content_good))
+        self.assertTrue(parse_info.may_contain_directives('  :raised ValueError'))
+        # Directives with the other delimiter do not count:
+        self.assertFalse(parse_info.may_contain_directives('  @param foo: bar'))
+        
+    #-------------------------
+    # testBatchPrep 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testBatchPrep(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_no_directives,
+                                           TestPdocPostProd.content_good]):
+                src_path = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            
+            # Queues smaller than the batch exercise the back pressure:
+            batch_prep = BatchPrep(io_threads=2, read_ahead=1, write_behind=1, delimiter_char=':')
+            res = batch_prep.run(src_paths, lambda src_path: src_path + '.prepped')
+            
+            self.assertEqual([src_path for (src_path, _dst_path) in res], src_paths)
+            # Module without directives is not written:
+            self.assertIsNone(res[1][1])
+            self.assertFalse(os.path.exists(src_paths[1] + '.prepped'))
+            
+            in_stream = StringIO(TestPdocPostProd.content_good)
+            PdocPrep(in_stream, self.capture_stream, delimiter_char=':')
+            for (_src_path, dst_path) in (res[0], res[2]):
+                with open(dst_path, 'r') as fd:
+                    self.assertEqual(fd.read(), self.capture_stream.getvalue())
+
+    #-------------------------
+    # testPageWriterSkipUnchanged 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testPageWriterSkipUnchanged(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            page_path = os.path.join(tmp_dir, 'foo.m.html')
+            page_writer = PageWriter(skip_unchanged=True)
+            self.assertTrue(page_writer.write(page_path, '<p>Foo \u00e9</p>\n'))
+            
+            # Backdate the file to see whether it is touched:
+            os.utime(page_path, (1000, 1000))
+            self.assertFalse(page_writer.write(page_path, '<p>Foo \u00e9</p>\n'))
+            self.assertEqual(os.stat(page_path).st_mtime, 1000)
+            
+            self.assertTrue(page_writer.write(page_path, '<p>Bar</p>\n'))
+            with open(page_path, 'rb') as fd:
+                self.assertEqual(fd.read(), b'<p>Bar</p>\n')
+            self.assertEqual(page_writer.summary(), 
+                             "2 of 3 pages changed; 1 left untouched.")
+            
+            # Without skip_unchanged, pages are always written:
+            self.assertTrue(PageWriter().write(page_path, '<p>Bar</p>\n'))
+
+    #-------------------------
+    # testTransformText 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testTransformText(self):
+        in_stream = StringIO(TestPdocPostProd.content_good)
+        PdocPrep(in_stream, self.capture_stream, delimiter_char=':')
+        self.assertEqual(transform_text(TestPdocPostProd.content_good, delimiter_char=':'),
+                         self.capture_stream.getvalue())
+        
+        # Errors are raised, not exited on:
+        with self.assertRaises(NoTypeError):
+            transform_text(TestPdocPostProd.content_no_type, delimiter_char=':', force_type_spec=True)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_path = os.path.join(tmp_dir, 'foo.py')
+            dst_path = os.path.join(tmp_dir, 'foo_prepped.py')
+            with open(src_path, 'w') as fd:
+                fd.write(TestPdocPostProd.content_good)
+            res = transform_file(src_path, dst_path, delimiter_char=':')
+            self.assertEqual(res, self.capture_stream.getvalue())
+            with open(dst_path, 'r') as fd:
+                self.assertEqual(fd.read(), res)
+
+    #-------------------------
+    # testRenderModuleAndPackage 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testRenderModuleAndPackage(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            pkg_dir = os.path.join(tmp_dir, 'pkg')
+            os.makedirs(os.path.join(pkg_dir, 'sub'))
+            for (rel_path, content) in [('foo.py', TestPdocPostProd.content_good),
+                                        ('bar.py', TestPdocPostProd.content_no_directives),
+                                        ('sub/fum.py', TestPdocPostProd.content_good)]:
+                with open(os.path.join(pkg_dir, rel_path), 'w') as fd:
+                    fd.write(content)
+            html_dir = os.path.join(tmp_dir, 'docs')
+            
+            page = render_module(os.path.join(pkg_dir, 'foo.py'), html_dir=html_dir, delimiter=':')
+            self.assertEqual(page, os.path.join(html_dir, 'foo.m.html'))
+            with open(page, 'r') as fd:
+                self.assertIn('<b>tableName</b>', fd.read())
+            # No temp module is left behind:
+            self.assertEqual(sorted(os.listdir(pkg_dir)), ['bar.py', 'foo.py', 'sub'])
+            
+            pages = render_package(pkg_dir, html_dir=html_dir, delimiter=':')
+            self.assertEqual(pages, [os.path.join(html_dir, 'bar.m.html'),
+                                     os.path.join(html_dir, 'foo.m.html'),
+                                     os.path.join(html_dir, 'sub', 'fum.m.html')])
+            for page in pages:
+                self.assertTrue(os.path.exists(page))
+            
+            # Paths reach pdoc as they are, not through a shell:
+            odd_dir = os.path.join(tmp_dir, 'my docs')
+            os.makedirs(odd_dir)
+            odd_module = os.path.join(odd_dir, 'odd;touch pwned;.py')
+            shutil.copy(os.path.join(pkg_dir, 'foo.py'), odd_module)
+            for options in [{}, {'memory_limit' : 512}]:
+                page = render_module(odd_module, html_dir=odd_dir, delimiter=':', **options)
+                self.assertEqual(page, os.path.join(odd_dir, 'odd;touch pwned;.m.html'))
+                self.assertTrue(os.path.exists(page))
+            self.assertFalse(os.path.exists('pwned'))
+            self.assertFalse(os.path.exists(os.path.join(odd_dir, 'pwned')))
+            
+            # A failing pdoc is raised, not exited on:
+            os.environ['PDOC_PATH'] = sys.executable + ' -c "import sys; sys.exit(3)"'
+            with self.assertRaises(PdocError):
+                render_module(os.path.join(pkg_dir, 'foo.py'), html_dir=html_dir, delimiter=':')
+
+    #-------------------------
+    # testShardAndMerge 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testShardAndMerge(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            python_modules = []
+            for i in range(8):
+                python_module = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(python_module, 'w') as fd:
+                    fd.write(TestPdocPostProd.content_good)
+                python_modules.append(python_module)
+            
+            shard_dirs = [os.path.join(tmp_dir, 'shard%s' % i) for i in range(3)]
+            num_pages  = 0
+            for (shard_index, shard_dir) in enumerate(shard_dirs):
+                runner = PdocRunner({'delimiter' : ':', 'shard' : '%s/3' % shard_index})
+                num_pages += len(runner.run(['--html-dir', shard_dir] + python_modules))
+            self.assertEqual(num_pages, len(python_modules))
+            
+            out_dir = os.path.join(tmp_dir, 'docs')
+            pages = merge_shards(shard_dirs, out_dir)
+            self.assertEqual(sorted(os.path.basename(page) for page in pages),
+                             ['mod%s.m.html' % i for i in range(8)])
+            with open(os.path.join(out_dir, 'pdoc_manifest.json'), 'r') as fd:
+                self.assertEqual(len(json.load(fd)['modules']), 8)
+            
+            # Missing and duplicated shards are reported:
+            with self.assertRaises(ShardMergeError) as context:
+                merge_shards(shard_dirs[:2] + shard_dirs[1:2], out_dir)
+            self.assertIn('Shard 2 of 3 is missing.', str(context.exception))
+            self.assertIn('Shard 1 appears in both', str(context.exception))
+            
+            with self.assertRaises(ValueError):
+                parse_shard_spec('3/3')
+
+    #-------------------------
+    # install_fake_pdoc 
+    #--------------
+
+    def install_fake_pdoc(self, tmp_dir):
+        '''
+        Point PDOC_PATH to a stand-in for pdoc for 
+        the duration of the test.
+        
+        @param tmp_dir: directory for the stand-in
+        @type tmp_dir: str
+        '''
+        fake_pdoc = os.path.join(tmp_dir, 'fake_pdoc.py')
+        with open(fake_pdoc, 'w') as fd:
+            fd.write(FAKE_PDOC)
+        prev_pdoc_path = os.environ.get('PDOC_PATH')
+        if prev_pdoc_path is None:
+            self.addCleanup(os.environ.pop, 'PDOC_PATH', None)
+        else:
+            self.addCleanup(os.environ.__setitem__, 'PDOC_PATH', prev_pdoc_path)
+        os.environ['PDOC_PATH'] = sys.executable + ' ' + fake_pdoc
+
+    #-------------------------
+    # testSymbolIndexLinks 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSymbolIndexLinks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'pkg', 'sub'))
+            with open(os.path.join(tmp_dir, 'pkg', 'tables.py'), 'w') as fd:
+                fd.write("class MyTable(object):\n    def row(self):\n        pass\n")
+            with open(os.path.join(tmp_dir, 'pkg', 'sub', 'user.py'), 'w') as fd:
+                fd.write("def use(tbl):\n" +\
+                         "    '''\n" +\
+                         "    @param tbl: the table\n" +\
+                         "    @type tbl: {MyTable | int}\n" +\
+                         "    @return: a row\n" +\
+                         "    @rtype: tables.MyTable.row\n" +\
+                         "    '''\n")
+            cache_path = os.path.join(tmp_dir, 'symbols.json')
+            
+            index = SymbolIndex(tmp_dir, cache_path=cache_path, flat=False)
+            self.assertEqual(index.num_parsed, 2)
+            self.assertEqual(index.lookup('pkg.tables.MyTable'), 'pkg/tables.m.html#tables.MyTable')
+            self.assertIsNone(index.lookup('int'))
+            
+            # Unchanged modules come from the cache:
+            index = SymbolIndex(tmp_dir, cache_path=cache_path, flat=False)
+            self.assertEqual(index.num_parsed, 0)
+            
+            # The cache is replaced in one step; a failed write
+            # leaves the earlier cache, and no temp file:
+            with open(cache_path, 'r') as fd:
+                cache = fd.read()
+            with open(os.path.join(tmp_dir, 'pkg', 'more.py'), 'w') as fd:
+                fd.write("class MoreTable(object):\n    pass\n")
+            with patch('json.dump', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    SymbolIndex(tmp_dir, cache_path=cache_path, flat=False)
+            with open(cache_path, 'r') as fd:
+                self.assertEqual(fd.read(), cache)
+            self.assertEqual([file_name for file_name in os.listdir(tmp_dir) if file_name.startswith('.tmp_')], [])
+            os.remove(os.path.join(tmp_dir, 'pkg', 'more.py'))
+            
+            user_path = os.path.join(tmp_dir, 'pkg', 'sub', 'user.py')
+            with open(user_path, 'r') as fd:
+                res = transform_text(fd.read(), file_name=user_path, symbol_index=index)
+            self.assertIn('{<a href="../tables.m.html#tables.MyTable">MyTable</a> | int}', res)
+            self.assertIn('<a href="../tables.m.html#tables.MyTable.row">tables.MyTable.row</a>', res)
+            
+            # Flat layout, and no links without an index:
+            index = SymbolIndex(tmp_dir, flat=True)
+            self.assertEqual(index.lookup('MyTable', 'pkg/sub/user.py'), 'tables.m.html#tables.MyTable')
+            with open(user_path, 'r') as fd:
+                self.assertNotIn('<a href', transform_text(fd.read()))
+
+    #-------------------------
+    # testMarkupTemplates 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testMarkupTemplates(self):
+        text = "def foo(bar):\n" +\
+               "    '''\n" +\
+               "    Foo is bar.\n" +\
+               "    @param bar: the bar\n" +\
+               "    @type bar: int\n" +\
+               "    @return: the fum\n" +\
+               "    @rtype: str\n" +\
+               "    '''\n"
+        
+        # Default is the HTML markup of old:
+        self.assertEqual(transform_text(text), transform_text(text, markup='html'))
+        self.assertIn('<b>bar</b> (<b></i>int</i></b>): the bar</br>', transform_text(text))
+        
+        self.assertEqual(transform_text(text, markup='markdown'),
+                         "def foo(bar):\n" +\
+                         "    '''\n" +\
+                         "    Foo is bar.\n" +\
+                         "    **bar** (*int*): the bar  \n" +\
+                         "    **returns:** the fum  \n" +\
+                         "    **return type:** str  \n" +\
+                         "    '''\n")
+        
+        # Templates from a file override those of their base:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            template_path = os.path.join(tmp_dir, 'markup.json')
+            with open(template_path, 'w') as fd:
+                json.dump({'base' : 'html', 'param' : '<code>{name}</code> ', 'link' : '{name}@{href}'}, fd)
+            markup = make_markup(template_path)
+        self.assertIn('<code>bar</code> (<b></i>int</i></b>): the bar</br>', transform_text(text, markup=markup))
+        self.assertEqual(markup.link('x.m.html#x.Foo', 'Foo'), 'Foo@x.m.html#x.Foo')
+        self.assertEqual(Markup().link('x.m.html#x.Foo', 'Foo'), '<a href="x.m.html#x.Foo">Foo</a>')
+        
+        with self.assertRaises(ValueError):
+            Markup({'param' : '<b>{nam}</b>'})
+        with self.assertRaises(ValueError):
+            Markup({'params' : '<b>{name}</b>'})
+        with self.assertRaises(ValueError):
+            make_markup('rst')
+
+    #-------------------------
+    # testSourceEncoding 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSourceEncoding(self):
+        text = "# -*- coding: latin-1 -*-\n" +\
+               "def foo(bar):\n" +\
+               "    '''\n" +\
+               "    @param bar: Gr\u00fc\u00dfe\n" +\
+               "    @type bar: str\n" +\
+               "    '''\n"
+        latin_source = text.encode('latin-1')
+        self.assertEqual(source_encoding(latin_source), 'iso-8859-1')
+        self.assertEqual(source_encoding(b'x = 1\n'), 'utf-8')
+        self.assertEqual(source_encoding(b'\xef\xbb\xbfx = 1\n'), 'utf-8-sig')
+        with self.assertRaises(ValueError):
+            source_encoding(b'# coding: no-such-codec\n')
+        
+        expected = transform_text(text)
+        self.assertIn('Gr\u00fc\u00dfe', expected)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_path = os.path.join(tmp_dir, 'legacy.py')
+            with open(src_path, 'wb') as fd:
+                fd.write(latin_source)
+            
+            # Results are written in the source's encoding:
+            dst_path = os.path.join(tmp_dir, 'legacy_prepped.py')
+            self.assertEqual(transform_file(src_path, dst_path), expected)
+            with open(dst_path, 'rb') as fd:
+                self.assertEqual(fd.read(), expected.encode('latin-1'))
+            
+            res = BatchPrep().run([src_path], lambda src_path: src_path + '.prepped')
+            with open(res[0][1], 'rb') as fd:
+                self.assertEqual(fd.read(), expected.encode('latin-1'))
+            
+            # So is stdout of pdoc_prep.py:
+            res = subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), 'pdoc_prep.py'),
+                                  '-f', src_path],
+                                 stdout=subprocess.PIPE, check=True)
+            self.assertEqual(res.stdout, expected.encode('latin-1'))
+            
+            # HTML markup the encoding lacks is written as character
+            # references; other markup cannot be written:
+            arrow_markup = {'param' : '\u2192 <b>{name}</b> '}
+            res = transform_file(src_path, dst_path, markup=Markup(arrow_markup))
+            with open(dst_path, 'rb') as fd:
+                self.assertEqual(fd.read(), res.replace('\u2192', '&#8594;').encode('latin-1'))
+            res = BatchPrep(markup=Markup(arrow_markup)).run([src_path], lambda src_path: src_path + '.prepped')
+            with open(res[0][1], 'rb') as fd:
+                self.assertIn(b'&#8594; <b>bar</b>', fd.read())
+            with self.assertRaisesRegex(ValueError, 'legacy.py in its encoding iso-8859-1'):
+                transform_file(src_path, dst_path, markup=Markup(arrow_markup, base='markdown'))
+
+    #-------------------------
+    # testIdentNameExcerpt 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testIdentNameExcerpt(self):
+        text = "def other(fum):\n" +\
+               "    '''\n" +\
+               "    @param fum: the fum\n" +\
+               "    '''\n" +\
+               "\n" +\
+               "class Foo(object):\n" +\
+               "    @staticmethod\n" +\
+               "    def bar(baz):\n" +\
+               "        '''\n" +\
+               "        @param baz: the baz\n" +\
+               "        @type blue: int\n" +\
+               "        '''\n" +\
+               "        return baz\n"
+        runner = PdocRunner({'diagnostics' : DiagnosticsCollector()})
+        self.assertEqual(runner.ident_line_range(text, 'Foo.bar'), (6, 13))
+        self.assertEqual(runner.ident_line_range(text, 'Foo'), (5, 13))
+        self.assertEqual(runner.ident_line_range(text, 'Foo.fum'), (0, None))
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            src_path = os.path.join(tmp_dir, 'mod.py')
+            with open(src_path, 'w') as fd:
+                fd.write(text)
+            html_dir = os.path.join(tmp_dir, 'docs')
+            [page] = runner.run(['--html-dir', html_dir, src_path, 'Foo.bar'])
+            with open(page, 'r') as fd:
+                html = fd.read()
+            # Only the named function's docstring is transformed:
+            self.assertIn('<b>baz</b>', html)
+            self.assertIn('@param fum: the fum', html)
+            # Line numbers count from the start of the module:
+            [diagnostic] = runner.pdoc_prep_args['diagnostics'].diagnostics
+            self.assertEqual(diagnostic.line, 11)
+
+    #-------------------------
+    # testPostprocessPackages 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testPostprocessPackages(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            pdoc_log = os.path.join(tmp_dir, 'fake_pdoc.log')
+            pkg_dir = os.path.join(tmp_dir, 'pkg')
+            os.makedirs(pkg_dir)
+            src_paths = []
+            for (file_name, content) in [('__init__.py', TestPdocPostProd.content_no_directives),
+                                         ('mod_a.py', TestPdocPostProd.content_good),
+                                         ('mod_b.py', TestPdocPostProd.content_no_directives),
+                                         ('_private.py', TestPdocPostProd.content_good),
+                                         (os.path.join('..', 'loose.py'), TestPdocPostProd.content_good)]:
+                src_path = os.path.normpath(os.path.join(pkg_dir, file_name))
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            html_dir = os.path.join(tmp_dir, 'docs')
+            pdoc_args = ['--html-dir', html_dir] + src_paths
+            expected_pages = [os.path.join(html_dir, page_name) 
+                              for page_name in ['__init__.m.html', 'mod_a.m.html', 'mod_b.m.html', 
+                                                '_private.m.html', 'loose.m.html']]
+            
+            # One pdoc run covers the package; the private module,
+            # which pdoc leaves out, and the loose one get runs of
+            # their own:
+            runner = PdocRunner({'delimiter' : ':', 'html_postprocess' : True})
+            self.assertEqual(runner.run(pdoc_args), expected_pages)
+            with open(pdoc_log, 'r') as fd:
+                self.assertEqual(fd.read().splitlines(), [pkg_dir, src_paths[3], src_paths[4]])
+            for page in expected_pages:
+                with open(page, 'r') as fd:
+                    html = fd.read()
+                self.assertNotIn(':param', html)
+            with open(expected_pages[1], 'r') as fd:
+                self.assertIn('<b>tableName</b>', fd.read())
+            with open(os.path.join(html_dir, JOURNAL_NAME), 'r') as fd:
+                self.assertEqual(len(fd.read().splitlines()), 1 + len(src_paths))
+            
+            # When pdoc fails on the package, its modules 
+            # are documented one at a time:
+            failing_dir_pdoc = os.path.join(tmp_dir, 'failing_dir_pdoc.py')
+            with open(failing_dir_pdoc, 'w') as fd:
+                fd.write("import os, runpy, sys\n" +\
+                         "if os.path.isdir(sys.argv[-1]):\n" +\
+                         "    sys.exit(3)\n" +\
+                         "sys.argv = sys.argv[1:]\n" +\
+                         "runpy.run_path(sys.argv[0], run_name='__main__')\n")
+            os.environ['PDOC_PATH'] = ' '.join([sys.executable, failing_dir_pdoc, 
+                                                os.path.join(tmp_dir, 'fake_pdoc.py')])
+            os.remove(pdoc_log)
+            shutil.rmtree(html_dir)
+            runner = PdocRunner({'delimiter' : ':', 'html_postprocess' : True})
+            self.assertEqual(runner.run(pdoc_args), expected_pages)
+            self.assertEqual(runner.failed, [])
+            with open(pdoc_log, 'r') as fd:
+                self.assertEqual(fd.read().splitlines(), src_paths)
+
+    #-------------------------
+    # testResumeAndOrphans 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testResumeAndOrphans(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_no_directives,
+                                           TestPdocPostProd.content_good]):
+                src_path = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            html_dir = os.path.join(tmp_dir, 'docs')
+            pdoc_args = ['--html-dir', html_dir] + src_paths
+            
+            fake_pdoc = os.environ['PDOC_PATH']
+            failing_pdoc = sys.executable + ' -c "import sys; sys.exit(3)"'
+            pages = PdocRunner({'delimiter' : ':'}).run(pdoc_args)
+            with open(os.path.join(html_dir, JOURNAL_NAME), 'r') as fd:
+                self.assertEqual(len(fd.read().splitlines()), 1 + len(src_paths))
+            
+            # Resuming a completed run needs no pdoc:
+            os.environ['PDOC_PATH'] = failing_pdoc
+            self.assertEqual(PdocRunner({'delimiter' : ':', 'resume' : True}).run(pdoc_args), pages)
+            
+            # Also when postprocessing pdoc's HTML:
+            os.environ['PDOC_PATH'] = fake_pdoc
+            post_args = ['--html-dir', os.path.join(tmp_dir, 'post')] + src_paths
+            post_pages = PdocRunner({'delimiter' : ':', 'html_postprocess' : True}).run(post_args)
+            os.environ['PDOC_PATH'] = failing_pdoc
+            self.assertEqual(PdocRunner({'delimiter' : ':', 'html_postprocess' : True, 'resume' : True}).run(post_args), 
+                             post_pages)
+            
+            # A new definition in the package may change type links:
+            os.environ['PDOC_PATH'] = fake_pdoc
+            link_opts = {'delimiter' : ':', 'link_types' : tmp_dir}
+            PdocRunner(link_opts).run(pdoc_args)
+            os.environ['PDOC_PATH'] = failing_pdoc
+            PdocRunner(dict(link_opts, resume=True)).run(pdoc_args)
+            with open(os.path.join(tmp_dir, 'types_mod.py'), 'w') as fd:
+                fd.write('class String(object):\n    pass\n')
+            # (pdoc fails on each module done again, and the batch 
+            # goes on past it):
+            runner = PdocRunner(dict(link_opts, resume=True))
+            self.assertEqual(runner.run(pdoc_args), [])
+            self.assertEqual(runner.failed, src_paths)
+            
+            # A changed module, or other options, are done again:
+            os.environ['PDOC_PATH'] = fake_pdoc
+            PdocRunner({'delimiter' : ':'}).run(pdoc_args)
+            os.environ['PDOC_PATH'] = failing_pdoc
+            with open(src_paths[2], 'a') as fd:
+                fd.write('\n')
+            runner = PdocRunner({'delimiter' : ':', 'resume' : True})
+            self.assertEqual(runner.run(pdoc_args), pages[:2])
+            self.assertEqual(runner.failed, src_paths[2:])
+            runner = PdocRunner({'delimiter' : '@', 'resume' : True})
+            runner.run(pdoc_args[:-1])
+            self.assertEqual(runner.failed, src_paths[:2])
+            
+            # Temp modules of dead processes on this host, and old 
+            # ones of other hosts or without host tag are orphans:
+            orphans = [os.path.join(tmp_dir, 'tmp_pdoc_prep_h%s_%s_abc.py' % (HOST_TAG, 2**22 + 1)),
+                       os.path.join(tmp_dir, 'tmp_pdoc_prep_h0000ffff_%s_abc.py' % os.getpid()),
+                       os.path.join(tmp_dir, 'tmp_pdoc_prep_abc.py')]
+            live    = [os.path.join(tmp_dir, 'tmp_pdoc_prep_h%s_%s_abc.py' % (HOST_TAG, os.getpid())),
+                       os.path.join(tmp_dir, 'tmp_pdoc_prep_h0000ffff_%s_abc.py' % (2**22 + 1)),
+                       os.path.join(tmp_dir, 'tmp_pdoc_prep_%s_abc.py' % (2**22 + 1)),
+                       os.path.join(tmp_dir, 'tmp_pdoc_prep_xyz.py')]
+            for path in orphans + live:
+                open(path, 'w').close()
+            for path in orphans[1:]:
+                os.utime(path, (0, 0))
+            self.assertEqual(sorted(remove_orphaned_tmp_files([tmp_dir, tmp_dir])), sorted(orphans))
+            for path in live:
+                self.assertTrue(os.path.exists(path))
+
+    #-------------------------
+    # testBuildMetrics 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testBuildMetrics(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_no_directives]):
+                src_path = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            metrics = BuildMetrics()
+            PdocRunner({'delimiter' : ':', 'metrics' : metrics}).run(['--html-dir', os.path.join(tmp_dir, 'docs')] + src_paths)
+            
+            metrics_path = os.path.join(tmp_dir, 'metrics', 'pdoc_run.prom')
+            metrics.write(metrics_path)
+            with open(metrics_path, 'r') as fd:
+                text = fd.read()
+        
+        self.assertIn('# TYPE pdoc_prep_phase_duration_seconds histogram\n', text)
+        self.assertIn('pdoc_prep_modules_processed_total{outcome="prepped"} 1\n', text)
+        self.assertIn('pdoc_prep_modules_processed_total{outcome="original"} 1\n', text)
+        self.assertIn('pdoc_prep_directives_total{kind="param"} 1\n', text)
+        self.assertIn('pdoc_prep_directives_total{kind="type"} 1\n', text)
+        self.assertIn('pdoc_prep_phase_duration_seconds_count{phase="pdoc"} 2\n', text)
+        self.assertIn('pdoc_prep_phase_duration_seconds_count{phase="replace_temp_name"} 1\n', text)
+        self.assertIn('pdoc_prep_phase_duration_seconds_bucket{phase="preprocess",le="+Inf"} 1\n', text)
+        
+        # Collected irregularities are counted where they
+        # are found, raised ones where they are caught:
+        metrics = BuildMetrics()
+        PdocPrep(StringIO(TestPdocPostProd.content_no_type), StringIO(),
+                 delimiter_char=':', force_type_spec=True, 
+                 diagnostics=DiagnosticsCollector(), metrics=metrics)
+        self.assertIn('pdoc_prep_errors_total{error="NoTypeError"} 1\n', metrics.render())
+        metrics.observe('phase_duration_seconds', 0.02, phase='pdoc')
+        self.assertIn('pdoc_prep_phase_duration_seconds_bucket{phase="pdoc",le="0.01"} 0\n', metrics.render())
+        self.assertIn('pdoc_prep_phase_duration_seconds_bucket{phase="pdoc",le="0.025"} 1\n', metrics.render())
+
+    #-------------------------
+    # testChunkedPrep 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testChunkedPrep(self):
+        # One large module from all test docstrings, each followed by
+        # code. content_no_type leaves its parameter open into the 
+        # next docstring:
+        contents = [value for (name, value) in vars(TestPdocPostProd).items() 
+                    if name.startswith('content_') and name != 'content_html']
+        text = ''.join(content + '\nx = 1\n\n' for content in contents)
+        for chunk_lines in [1, 5, 40]:
+            expected_fd = StringIO()
+            expected_diagnostics = DiagnosticsCollector()
+            PdocPrep(StringIO(text), expected_fd, delimiter_char=':', diagnostics=expected_diagnostics)
+            out_fd = StringIO()
+            diagnostics = DiagnosticsCollector()
+            ChunkedPrep(chunk_lines, processes=2, delimiter_char=':', diagnostics=diagnostics).run(text, out_fd)
+            self.assertEqual(out_fd.getvalue(), expected_fd.getvalue())
+            # Line numbers are those within the whole module:
+            self.assertEqual(diagnostics.to_dict(), expected_diagnostics.to_dict())
+        self.assertTrue(expected_diagnostics.num_found() > 0)
+        
+        # Without directives, the text passes through unchanged:
+        plain_text = ''.join(TestPdocPostProd.content_no_directives + '\n\nx = 1\n\n' for _i in range(5))
+        out_fd = StringIO()
+        ChunkedPrep(7, processes=2, delimiter_char=':').run(plain_text, out_fd)
+        self.assertEqual(out_fd.getvalue(), plain_text)
+        
+        # Raised errors are the first that a single pass meets:
+        with self.assertRaises(ParamTypeMismatch) as expected:
+            PdocPrep(StringIO(text), StringIO(), delimiter_char=':')
+        with self.assertRaises(ParamTypeMismatch) as raised:
+            ChunkedPrep(5, processes=2, delimiter_char=':').run(text, StringIO())
+        self.assertEqual(str(raised.exception), str(expected.exception))
+
+    #-------------------------
+    # testSourceMap 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSourceMap(self):
+        module_text = TestPdocPostProd.content_long_parm_line + '\n\nx = 1 / 0\n'
+        source_map = SourceMap()
+        prepped_text = transform_text(module_text, delimiter_char=':', source_map=source_map)
+        self.assertEqual(len(source_map.lines), len(prepped_text.splitlines()))
+        # The parameter's lines were joined:
+        self.assertLess(len(prepped_text.splitlines()), len(module_text.splitlines()))
+        self.assertEqual(source_map.original_line(len(source_map.lines)), len(module_text.splitlines()))
+        self.assertEqual(source_map.translate('File "/d/tmp_x.py", line %s, in <module>' % len(source_map.lines), 
+                                              '/d/tmp_x.py', '/d/mod.py'),
+                         'File "/d/mod.py", line %s, in <module>' % len(module_text.splitlines()))
+        with self.assertRaises(ValueError):
+            transform_text(TestPdocPostProd.content_html, html=True, source_map=SourceMap())
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            map_path = os.path.join(tmp_dir, 'mod.map.json')
+            source_map.write(map_path)
+            self.assertEqual(SourceMap.load(map_path).lines, source_map.lines)
+            
+            # The runner reports pdoc's failure at the original line:
+            self.install_fake_pdoc(tmp_dir)
+            os.environ['PDOC_PATH'] = sys.executable + ' -c "import runpy, sys; runpy.run_path(sys.argv[-1])"'
+            python_module = os.path.join(tmp_dir, 'mod.py')
+            with open(python_module, 'w') as fd:
+                fd.write(module_text)
+            err_fd = StringIO()
+            with redirect_stderr(err_fd), self.assertRaises(PdocError):
+                PdocRunner({'delimiter' : ':', 'source_maps' : True}).run(['--html-dir', tmp_dir, python_module])
+        self.assertIn('File "%s", line %s' % (python_module, len(module_text.splitlines())), err_fd.getvalue())
+
+    #-------------------------
+    # testPdocLimits 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testPdocLimits(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            fake_pdoc = os.environ['PDOC_PATH']
+            # Hangs on modules that mention 'hang':
+            hang_pdoc = os.path.join(tmp_dir, 'hang_pdoc.py')
+            with open(hang_pdoc, 'w') as fd:
+                fd.write("import runpy, sys, time\n" +\
+                         "if 'hang' in open(sys.argv[-1]).read():\n" +\
+                         "    time.sleep(60)\n" +\
+                         "runpy.run_path(%r, run_name='__main__')\n" % fake_pdoc.split()[-1])
+            os.environ['PDOC_PATH'] = sys.executable + ' ' + hang_pdoc
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_good + '\n# hang',
+                                           TestPdocPostProd.content_no_directives + '\n# hang',
+                                           TestPdocPostProd.content_no_directives]):
+                src_path = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            html_dir = os.path.join(tmp_dir, 'docs')
+            
+            # The batch goes on past the modules that time out:
+            metrics = BuildMetrics()
+            runner = PdocRunner({'delimiter' : ':', 'timeout' : 0.5, 'retries' : 1, 'metrics' : metrics})
+            pages = runner.run(['--html-dir', html_dir] + src_paths)
+            self.assertEqual(runner.timed_out, src_paths[1:3])
+            self.assertEqual(pages, [os.path.join(html_dir, 'mod%s.m.html' % i) for i in (0, 3)])
+            self.assertEqual(sorted(os.listdir(html_dir)), ['mod0.m.html', 'mod3.m.html', JOURNAL_NAME])
+            self.assertEqual(metrics.counters['pdoc_retries_total'][(('error', 'PdocTimeout'),)], 2)
+            self.assertEqual(metrics.counters['modules_processed_total'][(('outcome', 'timed_out'),)], 2)
+            with self.assertRaises(PdocTimeout):
+                PdocRunner({'delimiter' : ':', 'timeout' : 0.5}).run(['--html-dir', html_dir, src_paths[1]])
+            
+            # Only timeouts are retried, unless failures are too:
+            flaky_pdoc = os.path.join(tmp_dir, 'flaky_pdoc.py')
+            with open(flaky_pdoc, 'w') as fd:
+                fd.write("import os, runpy, sys\n" +\
+                         "if not os.path.exists(%r):\n" % (flaky_pdoc + '.failed') +\
+                         "    open(%r, 'w').close()\n" % (flaky_pdoc + '.failed') +\
+                         "    sys.exit(1)\n" +\
+                         "runpy.run_path(%r, run_name='__main__')\n" % fake_pdoc.split()[-1])
+            os.environ['PDOC_PATH'] = sys.executable + ' ' + flaky_pdoc
+            with self.assertRaises(PdocError):
+                PdocRunner({'delimiter' : ':', 'retries' : 1}).run(['--html-dir', html_dir, src_paths[0]])
+            os.remove(flaky_pdoc + '.failed')
+            PdocRunner({'delimiter' : ':', 'retries' : 1, 'retry_on' : 'failure'}).run(['--html-dir', html_dir, 
+                                                                                       src_paths[0]])
+            for bad_options in [{'retry_on' : 'always'}, {'retries' : -1}, {'timeout' : 0}, {'memory_limit' : 0}]:
+                with self.assertRaises(ValueError):
+                    PdocRunner(bad_options)
+            
+            # Allocations beyond the memory limit fail:
+            os.environ['PDOC_PATH'] = sys.executable + ' -c "x = bytearray(2 ** 32)"'
+            with self.assertRaises(PdocError) as raised:
+                PdocRunner({'delimiter' : ':', 'memory_limit' : 512}).run(['--html-dir', html_dir, src_paths[0]])
+            self.assertIn('memory limit', str(raised.exception))
+            
+            # In a batch, such failures are listed, and not journaled,
+            # and the other modules are documented:
+            with open(src_paths[1], 'w') as fd:
+                fd.write(TestPdocPostProd.content_good + '\nx = bytearray(2 ** 32)\n')
+            os.environ['PDOC_PATH'] = sys.executable + ' -c "import runpy, sys; runpy.run_path(sys.argv[-1]); ' +\
+                                      'runpy.run_path(%r, run_name=\'__main__\')"' % fake_pdoc.split()[-1]
+            shutil.rmtree(html_dir)
+            metrics = BuildMetrics()
+            runner = PdocRunner({'delimiter' : ':', 'memory_limit' : 512, 'metrics' : metrics})
+            pages = runner.run(['--html-dir', html_dir, src_paths[0], src_paths[1], src_paths[3]])
+            self.assertEqual(runner.failed, [src_paths[1]])
+            self.assertEqual(runner.timed_out, [])
+            self.assertEqual(pages, [os.path.join(html_dir, 'mod%s.m.html' % i) for i in (0, 3)])
+            self.assertEqual(metrics.counters['modules_processed_total'][(('outcome', 'failed'),)], 1)
+            with open(os.path.join(html_dir, JOURNAL_NAME), 'r') as fd:
+                self.assertNotIn('mod1.py', fd.read())
+
+    #-------------------------
+    # testPageStore 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testPageStore(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_no_directives]):
+                src_path = os.path.join(tmp_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            html_dir  = os.path.join(tmp_dir, 'docs')
+            store_dir = os.path.join(tmp_dir, 'store')
+            pdoc_args = ['--html-dir', html_dir] + src_paths
+            
+            runner = PdocRunner({'delimiter' : ':', 'store' : store_dir, 'store_version' : '1.0'})
+            runner.run(pdoc_args)
+            with open(os.path.join(store_dir, 'manifests', '1.0.json'), 'r') as fd:
+                manifest = json.load(fd)
+            self.assertEqual(sorted(manifest['modules']), ['mod0.py', 'mod1.py'])
+            entry = manifest['modules']['mod0.py']
+            self.assertEqual(entry['page'], 'mod0.m.html')
+            with gzip.open(os.path.join(store_dir, entry['blob']), 'rb') as fd:
+                with open(os.path.join(html_dir, 'mod0.m.html'), 'rb') as page_fd:
+                    self.assertEqual(fd.read(), page_fd.read())
+            self.assertEqual(runner.page_store.summary(), '2 of 2 pages stored; 0 already in the store.')
+            
+            # The next version stores only the changed page:
+            with open(src_paths[1], 'a') as fd:
+                fd.write('\n# changed\n')
+            runner = PdocRunner({'delimiter' : ':', 'store' : store_dir, 'store_version' : '1.1'})
+            runner.run(pdoc_args)
+            self.assertEqual(runner.page_store.summary(), '1 of 2 pages stored; 1 already in the store.')
+            with open(os.path.join(store_dir, 'manifests', '1.1.json'), 'r') as fd:
+                self.assertEqual(json.load(fd)['modules']['mod0.py']['blob'], entry['blob'])
+            num_blobs = sum(len(file_names) for (_dir, _dirs, file_names) in os.walk(os.path.join(store_dir, 'blobs')))
+            self.assertEqual(num_blobs, 3)
+            
+            # Equal pages compress to equal bytes:
+            page_store = PageStore(os.path.join(tmp_dir, 'other'))
+            self.assertEqual(page_store.compress(b'<html/>'), runner.page_store.compress(b'<html/>'))
+            self.assertEqual(PageStore(store_dir, 'none').put(b'<html/>'), 
+                             'blobs/%s/%s.html' % (hashlib.sha256(b'<html/>').hexdigest()[:2],
+                                                   hashlib.sha256(b'<html/>').hexdigest()))
+            with self.assertRaises(ValueError):
+                page_store.add_version('../1.2', {})
+            with self.assertRaises(ValueError):
+                PageStore(store_dir, 'zip')
+            with self.assertRaises(ValueError):
+                PdocRunner({'store' : store_dir, 'shard' : (0, 2)}).run(pdoc_args)
+
+    #-------------------------
+    # testSinceRevision 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testSinceRevision(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.install_fake_pdoc(tmp_dir)
+            pkg_dir = os.path.join(tmp_dir, 'pkg')
+            os.makedirs(pkg_dir)
+            src_paths = []
+            for (i, content) in enumerate([TestPdocPostProd.content_good,
+                                           TestPdocPostProd.content_no_directives,
+                                           TestPdocPostProd.content_good]):
+                src_path = os.path.join(pkg_dir, 'mod%s.py' % i)
+                with open(src_path, 'w') as fd:
+                    fd.write(content)
+                src_paths.append(src_path)
+            # The modules lie below the root of the repository:
+            git = ['git', '-C', tmp_dir, '-c', 'user.name=Test', '-c', 'user.email=test@example.com']
+            subprocess.run(git + ['init', '-q'], check=True)
+            subprocess.run(git + ['add', 'pkg/mod0.py', 'pkg/mod1.py'], check=True)
+            subprocess.run(git + ['commit', '-q', '-m', 'Start'], check=True)
+            
+            html_dir  = os.path.join(tmp_dir, 'docs')
+            pdoc_args = ['--html-dir', html_dir] + src_paths
+            pages = PdocRunner({'delimiter' : ':'}).run(pdoc_args)
+            for page in pages:
+                with open(page, 'a') as fd:
+                    fd.write('kept')
+            
+            # Only the changed module gets a new page:
+            with open(src_paths[1], 'a') as fd:
+                fd.write('\n# changed\n')
+            runner = PdocRunner({'delimiter' : ':', 'since' : 'HEAD'})
+            self.assertEqual(runner.run(pdoc_args), pages)
+            # The untracked module counts as changed, though its page exists:
+            self.assertEqual(runner.unchanged, {src_paths[0]})
+            kept = []
+            for page in pages:
+                with open(page, 'r') as fd:
+                    kept.append(fd.read().endswith('kept'))
+            self.assertEqual(kept, [True, False, False])
+            
+            # A module without a page is documented, changed or not:
+            os.remove(pages[0])
+            runner = PdocRunner({'delimiter' : ':', 'since' : 'HEAD'})
+            runner.run(['--html-dir', html_dir, src_paths[0]])
+            self.assertEqual(runner.unchanged, set())
+            self.assertTrue(os.path.exists(pages[0]))
+            
+            with self.assertRaises(ValueError):
+                PdocRunner({'since' : 'no_such_rev'}).run(pdoc_args)
+
+    #-------------------------
+    # testInMemoryRestoresModules 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testInMemoryRestoresModules(self):
+        # Stand-in for the pdoc package:
+        fake_pdoc = types.ModuleType('pdoc')
+        class FakeModule(object):
+            def __init__(self, module, allsubmodules=False):
+                self.module = module
+            def html(self, **_kwargs):
+                name = getattr(self.module, '__pdoc_module_name', self.module.__name__)
+                return '<h1>%s</h1><div class="desc"><p>%s</p></div>' % (name, self.module.__doc__)
+        fake_pdoc.Module = FakeModule
+        
+        with tempfile.TemporaryDirectory() as tmp_dir, patch.dict(sys.modules, {'pdoc' : fake_pdoc}):
+            # Shares its name with a module this process uses,
+            # and imports a neighbor:
+            python_module = os.path.join(tmp_dir, 'types.py')
+            with open(python_module, 'w') as fd:
+                fd.write(TestPdocPostProd.content_good)
+                fd.write('\nimport neighbor\nimport string\nassert string.digits\n')
+            with open(os.path.join(tmp_dir, 'neighbor.py'), 'w') as fd:
+                fd.write('import types\nassert types.ModuleType\n')
+            sys_path = list(sys.path)
+            types_module = sys.modules['types']
+            module_names = set(sys.modules.keys())
+            
+            runner = PdocRunner({'delimiter' : ':', 'in_memory' : True})
+            page = runner.run(['--html-dir', tmp_dir, python_module])[0]
+            with open(page, 'r') as fd:
+                html = fd.read()
+            self.assertIn('<h1>types</h1>', html)
+            self.assertIn('tableName', html)
+            self.assertIs(sys.modules['types'], types_module)
+            self.assertNotIn('neighbor', sys.modules)
+            self.assertFalse([name for name in set(sys.modules.keys()) - module_names
+                              if 'types' in name])
+            self.assertEqual(sys.path, sys_path)
+            
+            with self.assertRaises(PdocError):
+                runner.render_in_memory(python_module, TestPdocPostProd.content_good, ['--html', '--link-prefix'])
+
+    #-------------------------
+    # testEnginesAgree 
+    #--------------
+
+    @skipIf(not RUN_ALL, 'Temporarily disabled')
+    def testEnginesAgree(self):
+        contents = [value for (name, value) in vars(TestPdocPostProd).items() 
+                    if name.startswith('content_') and name != 'content_html']
+        for content in contents:
+            for delimiter_char in [':', '@']:
+                for force_type_spec in [False, True]:
+                    text = self.set_delimiter_char(content, delimiter_char)
+                    results = []
+                    for engine in PdocPrep.ENGINES:
+                        out_fd = StringIO()
+                        diagnostics = DiagnosticsCollector()
+                        PdocPrep(StringIO(text), out_fd, 
+                                 delimiter_char=delimiter_char,
+                                 force_type_spec=force_type_spec,
+                                 diagnostics=diagnostics,
+                                 engine=engine)
+                        results.append((out_fd.getvalue(), diagnostics.to_dict()))
+                    self.assertEqual(results[0], results[1])
+        
+        with self.assertRaises(ValueError):
+            PdocPrep(StringIO(''), self.capture_stream, engine='turbo')
+
     #-------------------------
     # testDocStrDetection 
     #--------------